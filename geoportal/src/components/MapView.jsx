@@ -33,13 +33,13 @@ function VectorLayer({ layer, visible, onFeatureClick }) {
             return;
         }
         
-        const url = `${GEOSERVER_WFS}?service=WFS&version=1.1.0&request=GetFeature&typeName=${layer.geoserver_layer_name}&outputFormat=application/json&srsName=EPSG:4326`;
+        const url = layer.wfs_url || `${GEOSERVER_WFS}?service=WFS&version=1.1.0&request=GetFeature&typeName=${layer.geoserver_layer_name}&outputFormat=application/json&srsName=EPSG:4326`;
         
         fetch(url)
             .then(r => r.json())
             .then(setGeojson)
             .catch(err => console.error('WFS error:', err));
-    }, [visible, layer.geoserver_layer_name]);
+    }, [visible, layer.geoserver_layer_name, layer.wfs_url]);
     
     const getStyle = useCallback((feature) => {
         const base = {
@@ -51,8 +51,21 @@ function VectorLayer({ layer, visible, onFeatureClick }) {
         
         if (layer.styles?.length > 0) {
             const field = layer.styles[0].attribute_field;
-            const val = String(feature.properties?.[field] || '');
-            const matched = layer.styles.find(s => s.attribute_value === val);
+            const raw = feature.properties?.[field];
+            const val = String(raw ?? '');
+            const num = Number(raw);
+            const matched =
+                layer.styles.find((s) => {
+                    if (s.is_default) return false;
+                    if (s.value_min != null || s.value_max != null) {
+                        return (
+                            raw != null && raw !== '' && !isNaN(num) &&
+                            (s.value_min == null || num >= s.value_min) &&
+                            (s.value_max == null || num < s.value_max)
+                        );
+                    }
+                    return s.attribute_value === val;
+                }) || layer.styles.find((s) => s.is_default);
             if (matched) {
                 return {
                     fillColor: matched.fill_color,
@@ -102,7 +115,7 @@ function RasterLayer({ layer, visible }) {
     
     return (
         <WMSTileLayer
-            url={GEOSERVER_WMS}
+            url={layer.wms_url || GEOSERVER_WMS}
             layers={layer.geoserver_layer_name}
             format="image/png"
             transparent
@@ -1,7 +1,7 @@
 // API
 export const API_BASE = '';
 export const GEOSERVER_WMS = '/geoserver/wms';
-export const GEOSERVER_WFS = '/geoserver/wfs';
+export const GEOSERVER_WFS = '/api/wfs';
 
 // Map defaults
 export const MAP_CENTER = [64, 69];
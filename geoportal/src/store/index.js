@@ -68,7 +68,11 @@ const useStore = create((set, get) => ({
             sidebarCollapsed: false,
         });
         
-        // Fetch rich content
+        // Fetch rich content (the feature stream flags features that have it)
+        if (props.has_content === false) {
+            set({ featureLoading: false });
+            return;
+        }
         try {
             const res = await fetch(`${API_BASE}/api/features/${layer.slug}/${featureId}/`);
             if (res.ok) {
@@ -112,7 +116,7 @@ const useStore = create((set, get) => ({
         });
 
         try {
-            const url = `${GEOSERVER_WFS}?service=WFS&version=1.1.0&request=GetFeature&typeName=${layer.geoserver_layer_name}&outputFormat=application/json&srsName=EPSG:4326`;
+            const url = layer.wfs_url || `${GEOSERVER_WFS}?service=WFS&version=1.1.0&request=GetFeature&typeName=${layer.geoserver_layer_name}&outputFormat=application/json&srsName=EPSG:4326`;
             const res = await fetch(url);
             const geojson = await res.json();
             const geometries = {};
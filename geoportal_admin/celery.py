@@ -3,10 +3,44 @@ Celery configuration for geoportal_admin project.
 """
 
 import os
+import time
 from celery import Celery
+from celery.signals import before_task_publish, task_postrun, task_prerun
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'geoportal_admin.settings')
 
 app = Celery('geoportal_admin')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+
+@before_task_publish.connect
+def stamp_sent_at(headers=None, **kwargs):
+    """Stamp every message with its publish time for queue latency stats."""
+    if headers is not None:
+        headers.setdefault('sent_at', time.time())
+
+
+@task_prerun.connect
+def record_queue_latency(task=None, **kwargs):
+    """Record how long the task waited in its queue."""
+    request = task.request
+    sent_at = getattr(request, 'sent_at', None) or (request.headers or {}).get('sent_at')
+    queue = (request.delivery_info or {}).get('routing_key')
+    if sent_at and queue:
+        from layers.queue_stats import record_latency
+        record_latency(queue, sent_at)
+
+
+@task_prerun.connect
+def start_task_metrics(task_id=None, **kwargs):
+    """Start timing the task and its SQL queries."""
+    from layers.metrics import task_started
+    task_started(task_id)
+
+
+@task_postrun.connect
+def record_task_metrics(task_id=None, task=None, state=None, **kwargs):
+    """Record the task duration by task name and queue."""
+    from layers.metrics import task_finished
+    task_finished(task_id, task, state)
@@ -45,12 +45,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'layers.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'layers.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -116,13 +118,43 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'layers.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# --- Metrics (Prometheus text at /api/metrics, Server-Timing headers) ---
+METRICS_ENABLED = True
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']   # direct scrapes of gunicorn, not via nginx
+
+# --- Slow layer-table queries and index advisor ---
+SLOW_QUERY_THRESHOLD_MS = 200    # search/bbox/legend/tile/content-import queries slower than this are logged
+INDEX_ADVISOR_MIN_HITS = 20      # slow queries filtering an attribute before an index is advised
+INDEX_ADVISOR_UNUSED_DAYS = 14   # advisor indexes without scans for this long are dropped
+INDEX_ADVISOR_AUTO = False       # create/drop indexes from the daily task instead of only reporting
+
+# --- Benchmarks (generate_bench_data / benchmark_layers) ---
+BENCHMARK_RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks')   # one JSON per run, named by time and commit
+
+# --- Request profiler (staff: ?_profile=1, reports in the admin) ---
+PROFILE_STATS_LIMIT = 60        # cProfile rows stored, by cumulative time
+PROFILE_EXPLAIN_LIMIT = 5       # slowest SELECTs run through EXPLAIN (ANALYZE, BUFFERS)
+PROFILE_EXPLAIN_TIMEOUT = 10000 # statement_timeout for EXPLAIN, ms
+PROFILE_KEEP = 200              # newest reports kept
+# Tables (name prefixes) whose query parameters are redacted from reports
+PROFILE_REDACTED_TABLES = ('django_session', 'auth_user', 'authtoken_token')
+
 # --- GeoServer ---
 GEOSERVER_URL = 'http://localhost:8080/geoserver'
 GEOSERVER_USER = 'admin'
 GEOSERVER_PASSWORD = 'geoserver'  # CHANGE if you updated it
 GEOSERVER_WORKSPACE = 'geoportal'
+GEOSERVER_TIMEOUT = (5, 60)     # (connect, read) seconds
+GEOSERVER_RETRIES = 3           # backoff retries for idempotent requests
+GEOSERVER_CACHE_TTL = 300       # seconds to memoize workspace/datastore checks
+GEOSERVER_STYLE_SYNC = True     # compile LayerStyle rules to SLD and upload on change
+GEOSERVER_STYLE_DELAY = 5       # seconds to collapse bursts of style edits
 
 # --- Celery ---
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
@@ -132,6 +164,64 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Moscow'
 
+# Queues: heavy loads, serialized GeoServer publishes, light housekeeping, media jobs.
+# Each queue gets its own worker (see config/celery-*.service) with its own
+# concurrency, prefetch and memory limits.
+CELERY_TASK_DEFAULT_QUEUE = 'maintenance'
+CELERY_TASK_ROUTES = {
+    'layers.tasks.import_layer_task': {'queue': 'import'},
+    'layers.tasks.load_layer_task': {'queue': 'import'},
+    'layers.tasks.import_project_source_task': {'queue': 'import'},
+    'layers.tasks.publish_batch_task': {'queue': 'publish'},
+    'layers.tasks.delete_layer_data_task': {'queue': 'maintenance'},
+    'layers.tasks.seed_layer_cache_task': {'queue': 'maintenance'},
+    'layers.tasks.track_layer_seed_task': {'queue': 'maintenance'},
+    'layers.tasks.reconcile_layers_task': {'queue': 'maintenance'},
+    'layers.tasks.refresh_legend_counts_task': {'queue': 'maintenance'},
+    'layers.tasks.publish_layer_style_task': {'queue': 'publish'},
+    'layers.tasks.import_feature_contents_task': {'queue': 'media'},
+    'layers.tasks.advise_indexes_task': {'queue': 'maintenance'},
+}
+CELERY_QUEUE_NAMES = ['import', 'publish', 'maintenance', 'media']
+CELERY_TASK_ANNOTATIONS = {
+    'layers.tasks.import_layer_task': {'soft_time_limit': 900, 'time_limit': 960},
+    'layers.tasks.load_layer_task': {'soft_time_limit': 900, 'time_limit': 960},
+    'layers.tasks.import_project_source_task': {'soft_time_limit': 3600, 'time_limit': 3660},
+    'layers.tasks.publish_batch_task': {'soft_time_limit': 600, 'time_limit': 660},
+    'layers.tasks.delete_layer_data_task': {'soft_time_limit': 120, 'time_limit': 180},
+    'layers.tasks.seed_layer_cache_task': {'soft_time_limit': 120, 'time_limit': 180},
+    'layers.tasks.track_layer_seed_task': {'soft_time_limit': 60, 'time_limit': 90},
+    'layers.tasks.reconcile_layers_task': {'soft_time_limit': 300, 'time_limit': 360},
+    'layers.tasks.refresh_legend_counts_task': {'soft_time_limit': 300, 'time_limit': 360},
+    'layers.tasks.publish_layer_style_task': {'soft_time_limit': 120, 'time_limit': 180},
+    'layers.tasks.import_feature_contents_task': {'soft_time_limit': 3600, 'time_limit': 3660},
+    'layers.tasks.advise_indexes_task': {'soft_time_limit': 1800, 'time_limit': 1860},
+}
+# Long imports must not be redelivered to another worker while still running
+CELERY_TASK_ACKS_LATE = True
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 4 * 60 * 60}
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-layers': {
+        'task': 'layers.tasks.reconcile_layers_task',
+        'schedule': 6 * 60 * 60,  # every 6 hours, report only
+        'kwargs': {'fix': False},
+    },
+    'advise-indexes': {
+        'task': 'layers.tasks.advise_indexes_task',
+        'schedule': 24 * 60 * 60,  # daily; creates/drops indexes only with INDEX_ADVISOR_AUTO
+    },
+}
+
+# --- GeoWebCache seeding ---
+GWC_SEED_ENABLED = True
+GWC_SEED_THREADS = 2
+GWC_GRIDSET = 'EPSG:900913'
+GWC_SEED_FORMAT = 'image/png'
+GWC_SEED_MAX_ZOOM = 12          # upper bound on top of Layer.max_zoom
+GWC_SEED_DELAY = 30             # seconds to collapse bursts of style edits
+GWC_SEED_POLL_INTERVAL = 10     # seconds between re-scheduled status checks
+GWC_SEED_TIMEOUT = 3600         # stop tracking a seed after this many seconds
+
 # --- Upload settings ---
 FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600   # 100 MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600
@@ -143,6 +233,60 @@ LAYER_UPLOAD_DIR = os.path.join(MEDIA_ROOT, 'layers',
 RASTER_STORAGE_DIR = os.path.join(MEDIA_ROOT, 'layers',
     'stories',
     'home', 'rasters')
+# Repair invalid geometries with ST_MakeValid after import
+LAYER_IMPORT_REPAIR_GEOMETRY = True
+# Build an ST_Subdivide companion table (<table>_subdivided) for heavy geometries;
+# vector tiles and the admin bbox search pick features through its parts
+LAYER_IMPORT_SUBDIVIDE = True
+LAYER_SUBDIVIDE_MAX_VERTICES = 256
+# Reference bbox (west, south, east, north) for import benchmarks; None = layer extent centre
+LAYER_REFERENCE_BBOX = None
+# Max parallel ogr2ogr loads within one multi-layer import job
+LAYER_IMPORT_MAX_WORKERS = 4
+# Max concurrent ogr2ogr/gdal_translate loads across all Celery workers
+LAYER_IMPORT_CONCURRENCY = 2
+LAYER_IMPORT_SLOT_TIMEOUT = 900  # seconds before a crashed worker's slot expires
+LAYER_IMPORT_SLOT_RETRY = 15     # seconds to wait for a free slot
+LAYER_IMPORT_SLOT_POLL = 2       # seconds between slot checks of project import threads
+# Sources with at least this many features are loaded by several parallel
+# ogr2ogr processes (FID ranges) into an unlogged staging table
+LAYER_PARTITIONED_THRESHOLD = 500000
+# Upper bound: each loader beyond the first takes a free import slot, so
+# the real count is also capped by LAYER_IMPORT_CONCURRENCY
+LAYER_PARTITIONED_PROCESSES = 4
+# Narrow imported numeric columns to the narrowest type (int2/int4, real)
+LAYER_IMPORT_TIGHTEN_TYPES = True
+# Also convert text columns of numbers, dates and yes/no values; this rewrites
+# the values ('да' -> true, '01.02.2020' -> 2020-02-01) style rules match on
+LAYER_IMPORT_TIGHTEN_TEXT = False
+# Dictionary-encode repetitive text columns as PostgreSQL enum types
+# (columns that style rules of the layer match on stay text)
+LAYER_IMPORT_DICT_ENCODE = True
+# Text columns with at most this many distinct values are categories
+LAYER_CATEGORY_MAX_VALUES = 100
+# Keep an EPSG:3857 copy of layer geometries for tiles and measurements
+LAYER_IMPORT_MERCATOR = True
+# Random sample size for Jenks natural breaks classification
+LAYER_CLASSIFY_SAMPLE = 3000
+
+# --- Bulk FeatureContent import (XLSX/CSV + zip of images) ---
+CONTENT_IMPORT_BATCH_SIZE = 500    # rows per bulk upsert
+
+# --- Raster tiles ---
+RASTER_TILE_SIZE = 256
+RASTER_TILE_CACHE_DIR = os.path.join(MEDIA_ROOT, 'tiles')
+
+# --- Vector tiles (ST_AsMVT) ---
+VECTOR_TILE_EXTENT = 4096
+VECTOR_TILE_BUFFER = 64
+VECTOR_TILE_CLUSTER_MAX_ZOOM = 12   # point layers are clustered below this zoom
+VECTOR_TILE_CLUSTER_GRID = 64       # cluster cells per tile side
+
+# --- WFS proxy (cached GetFeature) ---
+WFS_CACHE_DIR = os.path.join(MEDIA_ROOT, 'wfs-cache')
+WFS_PROXY_WAIT = 30       # seconds to wait for a concurrent fetch of the same query
+WFS_PROXY_MAX_AGE = 60    # browser Cache-Control max-age, seconds
+VERSIONED_CACHE_MAX_AGE = 31536000   # tile/WFS URLs whose ?v= matches the layer version are immutable
 
 # --- CKEditor 5 ---
 INSTALLED_APPS += ['django_ckeditor_5']
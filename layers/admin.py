@@ -5,21 +5,31 @@ Admin configuration for geoportal layers.
 
 from django.contrib import admin
 from django.contrib import messages
-from django.utils.html import format_html
+from django.db.models import Count
+from django.http import JsonResponse
+from django.urls import path
+from django.utils.html import format_html, format_html_join
 from django import forms
 from django_ckeditor_5.widgets import CKEditor5Widget
-from .models import MapProject, Layer, LayerAttribute, FeatureContent, FeatureImage, LayerStyle
+from .models import (
+    MapProject, Layer, LayerAttribute, FeatureContent, FeatureImage, LayerStyle, FeatureContentImport,
+    RequestProfile,
+)
+from .admin_forms import LayerActionForm
+from .widgets import FeaturePickerWidget
 
 
 class LayerAttributeInline(admin.TabularInline):
     model = LayerAttribute
     extra = 0
-    fields = ('field_name', 'display_name', 'show_in_popup', 'sort_order')
+    fields = ('field_name', 'display_name', 'show_in_popup', 'sort_order', 'data_type', 'distinct_count')
+    readonly_fields = ('distinct_count',)
 
 
 class LayerInline(admin.TabularInline):
     model = Layer.projects.through
     extra = 0
+    autocomplete_fields = ('layer',)
     verbose_name = 'Слой'
     verbose_name_plural = 'Слои проекта'
 
@@ -40,6 +50,9 @@ class FeatureContentAdminForm(forms.ModelForm):
     class Meta:
         model = FeatureContent
         fields = '__all__'
+        widgets = {
+            'feature_id': FeaturePickerWidget(),
+        }
 
 
 @admin.register(MapProject)
@@ -50,6 +63,7 @@ class MapProjectAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
     prepopulated_fields = {'slug': ('title',)}
     inlines = [LayerInline]
+    actions = ['import_project_source']
 
     fieldsets = (
         (None, {
@@ -58,14 +72,40 @@ class MapProjectAdmin(admin.ModelAdmin):
         ('Параметры карты', {
             'fields': ('center_lat', 'center_lon', 'default_zoom', 'default_basemap'),
         }),
+        ('Многослойный импорт', {
+            'fields': ('source_file',),
+            'description': 'GeoPackage или zip с несколькими shapefile. '
+                           'Каждый слой файла станет отдельным слоем проекта.',
+            'classes': ('collapse',),
+        }),
         ('Сортировка', {
             'fields': ('sort_order',),
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_layer_count=Count('layers', distinct=True))
+
     def layer_count(self, obj):
-        return obj.layers.count()
+        return obj._layer_count
     layer_count.short_description = 'Слоёв'
+    layer_count.admin_order_field = '_layer_count'
+
+    @admin.action(description='Импортировать слои из многослойного файла')
+    def import_project_source(self, request, queryset):
+        from .tasks import import_project_source_task
+        started = 0
+        skipped = 0
+        for project in queryset:
+            if not project.source_file:
+                skipped += 1
+                continue
+            import_project_source_task.delay(project.id)
+            started += 1
+        if started:
+            self.message_user(request, f"Запущен импорт слоёв для {started} проектов.", messages.SUCCESS)
+        if skipped:
+            self.message_user(request, f"Пропущено {skipped} проектов без файлов.", messages.WARNING)
 
 
 @admin.register(Layer)
@@ -80,7 +120,8 @@ class LayerAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
     filter_horizontal = ('projects',)
     inlines = [LayerAttributeInline]
-    actions = ['import_selected_layers', 'delete_layer_data']
+    actions = ['import_selected_layers', 'delete_layer_data', 'classify_styles', 'publish_styles']
+    action_form = LayerActionForm
 
     fieldsets = (
         (None, {
@@ -95,7 +136,8 @@ class LayerAdmin(admin.ModelAdmin):
         }),
         ('Загрузка данных', {
             'fields': ('source_file', 'raster_file'),
-            'description': 'Загрузите shapefile (.zip) или GeoJSON.'
+            'description': 'Загрузите shapefile (.zip), GeoJSON или GeoTIFF. '
+                           'Растры при импорте конвертируются в Cloud-Optimized GeoTIFF.'
         }),
         ('Отображение', {
             'fields': (
@@ -112,19 +154,25 @@ class LayerAdmin(admin.ModelAdmin):
             'classes': ('collapse',),
         }),
         ('Статистика', {
-            'fields': ('feature_count', 'bbox_west', 'bbox_south', 'bbox_east', 'bbox_north'),
+            'fields': (
+                'feature_count', 'bbox_west', 'bbox_south', 'bbox_east', 'bbox_north',
+                'raster_stats',
+            ),
         }),
         ('Публикация', {
             'fields': ('is_published',),
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_content_count=Count('feature_contents', distinct=True))
+
     def content_count(self, obj):
-        count = obj.feature_contents.count()
-        if count > 0:
-            return format_html('<span style="color: #28a745;">{}</span>', count)
+        if obj._content_count > 0:
+            return format_html('<span style="color: #28a745;">{}</span>', obj._content_count)
         return '-'
     content_count.short_description = 'Контент'
+    content_count.admin_order_field = '_content_count'
 
     def import_status_badge(self, obj):
         if obj.geoserver_layer_name and obj.postgis_table:
@@ -146,17 +194,21 @@ class LayerAdmin(admin.ModelAdmin):
 
     @admin.action(description='Импортировать выбранные слои в PostGIS и GeoServer')
     def import_selected_layers(self, request, queryset):
-        from .tasks import import_layer_task
-        imported = 0
+        from .tasks import import_layer_task, import_layers_batch
+        to_import = []
         skipped = 0
         for layer in queryset:
-            if not layer.source_file:
+            if not (layer.source_file or (layer.layer_type == 'raster' and layer.raster_file)):
                 skipped += 1
                 continue
-            import_layer_task.delay(layer.id)
-            imported += 1
-        if imported:
-            self.message_user(request, f"Запущен импорт {imported} слоёв.", messages.SUCCESS)
+            to_import.append(layer)
+        if len(to_import) == 1:
+            import_layer_task.delay(to_import[0].id)
+        elif to_import:
+            batch = import_layers_batch(to_import)
+            self.message_user(request, f"ID пакетного импорта: {batch.id}", messages.INFO)
+        if to_import:
+            self.message_user(request, f"Запущен импорт {len(to_import)} слоёв.", messages.SUCCESS)
         if skipped:
             self.message_user(request, f"Пропущено {skipped} слоёв без файлов.", messages.WARNING)
 
@@ -166,7 +218,7 @@ class LayerAdmin(admin.ModelAdmin):
         deleted = 0
         for layer in queryset:
             if layer.postgis_table or layer.geoserver_layer_name:
-                delete_layer_data_task.delay(layer.postgis_table, layer.geoserver_layer_name)
+                table_name, geoserver_layer_name = layer.postgis_table, layer.geoserver_layer_name
                 layer.postgis_table = ''
                 layer.geoserver_layer_name = ''
                 layer.feature_count = 0
@@ -175,10 +227,63 @@ class LayerAdmin(admin.ModelAdmin):
                 layer.bbox_east = None
                 layer.bbox_north = None
                 layer.save()
+                # Queued after the save so it cannot overwrite the bumped data_version
+                delete_layer_data_task.delay(
+                    table_name, geoserver_layer_name, layer.layer_type, layer.id
+                )
                 deleted += 1
         if deleted:
             self.message_user(request, f"Запущено удаление данных {deleted} слоёв.", messages.SUCCESS)
 
+    @admin.action(description='Опубликовать стиль (SLD) в GeoServer')
+    def publish_styles(self, request, queryset):
+        from .tasks import schedule_style_publish
+        queued = 0
+        for layer in queryset.exclude(geoserver_layer_name=''):
+            schedule_style_publish(layer.id, force=True)
+            queued += 1
+        if queued:
+            self.message_user(request, f"Запущена публикация стилей {queued} слоёв.", messages.SUCCESS)
+        else:
+            self.message_user(request, "Нет опубликованных слоёв среди выбранных.", messages.WARNING)
+
+    @admin.action(description='Создать стили по полю (классификация)')
+    def classify_styles(self, request, queryset):
+        from .classify import ClassificationError, classify_layer
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            errors = '; '.join(
+                f"{form.fields[name].label or name}: {' '.join(field_errors)}"
+                for name, field_errors in form.errors.items()
+            )
+            self.message_user(request, f"Неверные параметры классификации: {errors}", messages.ERROR)
+            return
+        field = form.cleaned_data['classify_field'].strip()
+        if not field:
+            self.message_user(request, "Укажите поле для классификации.", messages.ERROR)
+            return
+        method = form.cleaned_data['classify_method'] or 'unique'
+        classes = form.cleaned_data['classify_classes'] or 5
+        ramp = form.cleaned_data['classify_ramp'] or 'green'
+        push_sld = form.cleaned_data['classify_push_sld']
+        for layer in queryset:
+            if not layer.postgis_table:
+                self.message_user(request, f"{layer.title}: слой не импортирован.", messages.WARNING)
+                continue
+            try:
+                result = classify_layer(
+                    layer, field, method, classes=classes, top_n=classes, ramp=ramp, push_sld=push_sld
+                )
+            except ClassificationError as e:
+                self.message_user(request, f"{layer.title}: {e}", messages.ERROR)
+                continue
+            self.message_user(
+                request, f"{layer.title}: создано {len(result['styles'])} правил стиля.", messages.SUCCESS
+            )
+            if result['sld'] and not result['sld']['success']:
+                self.message_user(request, f"{layer.title}: {result['sld']['message']}", messages.WARNING)
+
 
 @admin.register(FeatureContent)
 class FeatureContentAdmin(admin.ModelAdmin):
@@ -186,7 +291,12 @@ class FeatureContentAdmin(admin.ModelAdmin):
     list_display = ('layer', 'feature_id', 'title', 'has_image', 'is_published', 'updated_at')
     list_filter = ('layer', 'is_published')
     list_editable = ('is_published',)
+    list_select_related = ('layer',)
     search_fields = ('title', 'subtitle', 'description')
+    autocomplete_fields = ('layer',)
+    # The (layer, feature_id) unique index serves this order without a join on Layer
+    ordering = ('layer_id', 'feature_id')
+    show_full_result_count = False
     inlines = [FeatureImageInline]
     
     fieldsets = (
@@ -211,14 +321,67 @@ class FeatureContentAdmin(admin.ModelAdmin):
         return '-'
     has_image.short_description = 'Фото'
 
+    def get_urls(self):
+        return [
+            path(
+                'feature-search/',
+                self.admin_site.admin_view(self.feature_search_view),
+                name='layers_featurecontent_feature_search',
+            ),
+        ] + super().get_urls()
+
+    def feature_search_view(self, request):
+        """
+        JSON search of a layer's PostGIS table for the feature picker:
+        ?layer=<id>&q=<text or gid>&field=<attribute>&bbox=<w,s,e,n>
+        """
+        from .import_utils import search_features
+
+        if not self.has_view_permission(request):
+            return JsonResponse({'error': 'Нет доступа'}, status=403)
+        layer_id = request.GET.get('layer', '')
+        layer = Layer.objects.filter(pk=layer_id).first() if layer_id.isdigit() else None
+        if layer is None or not layer.postgis_table:
+            return JsonResponse({'error': 'Слой не найден или не импортирован'}, status=400)
+
+        bbox = None
+        if request.GET.get('bbox'):
+            try:
+                bbox = [float(v) for v in request.GET['bbox'].split(',')]
+            except ValueError:
+                bbox = []
+            if len(bbox) != 4:
+                return JsonResponse({'error': 'bbox: west,south,east,north'}, status=400)
+
+        try:
+            rows = search_features(
+                layer.postgis_table, request.GET.get('q', ''),
+                field=request.GET.get('field') or None, bbox=bbox,
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        with_content = set(
+            FeatureContent.objects.filter(layer=layer, feature_id__in=[gid for gid, _ in rows])
+            .values_list('feature_id', flat=True)
+        )
+        return JsonResponse({
+            'results': [
+                {'id': gid, 'label': label or '', 'has_content': gid in with_content}
+                for gid, label in rows
+            ],
+        })
+
 
 @admin.register(LayerStyle)
 
 class LayerStyleAdmin(admin.ModelAdmin):
     # form = LayerStyleForm
-    list_display = ('layer', 'attribute_field', 'attribute_value', 'fill_color_preview', 'legend_label', 'sort_order')
+    list_display = ('layer', 'attribute_field', 'attribute_value', 'fill_color_preview', 'legend_label', 'feature_count', 'sort_order')
     list_filter = ('layer', 'attribute_field')
     list_editable = ('sort_order',)
+    list_select_related = ('layer',)
+    autocomplete_fields = ('layer',)
     ordering = ('layer', 'sort_order')
 
     def formfield_for_dbfield(self, db_field, request, **kwargs):
@@ -229,15 +392,16 @@ class LayerStyleAdmin(admin.ModelAdmin):
     
     fieldsets = (
         (None, {
-            'fields': ('layer', 'attribute_field', 'attribute_value')
+            'fields': ('layer', 'attribute_field', 'attribute_value', 'value_min', 'value_max', 'is_default')
         }),
         ('Стиль', {
             'fields': ('fill_color', 'stroke_color', 'stroke_width', 'fill_opacity', 'radius')
         }),
         ('Легенда', {
-            'fields': ('legend_label', 'sort_order')
+            'fields': ('legend_label', 'sort_order', 'feature_count', 'total_area', 'total_length')
         }),
     )
+    readonly_fields = ('feature_count', 'total_area', 'total_length')
     
     def fill_color_preview(self, obj):
         return format_html(
@@ -245,3 +409,106 @@ class LayerStyleAdmin(admin.ModelAdmin):
             obj.fill_color, obj.fill_color
         )
     fill_color_preview.short_description = 'Цвет'
+
+
+@admin.register(FeatureContentImport)
+class FeatureContentImportAdmin(admin.ModelAdmin):
+    list_display = ('layer', 'created_at', 'status', 'report_summary', 'finished_at')
+    list_filter = ('status',)
+    list_select_related = ('layer',)
+    autocomplete_fields = ('layer',)
+    actions = ['run_import']
+    readonly_fields = ('status', 'report_summary', 'report_errors', 'created_at', 'finished_at')
+
+    fieldsets = (
+        (None, {
+            'fields': ('layer', 'data_file', 'images_zip'),
+            'description': 'Колонки таблицы: ключ, title, subtitle, description, image_url, '
+                           'gdrive_folder_id, image_caption, is_published, images (имена файлов '
+                           'из архива через «;»). Остальные колонки попадут в extra_data. '
+                           'Импорт запускается после сохранения.',
+        }),
+        ('Связь с объектами', {
+            'fields': ('key_column', 'key_field', 'replace_gallery'),
+        }),
+        ('Результат', {
+            'fields': ('status', 'report_summary', 'report_errors', 'created_at', 'finished_at'),
+        }),
+    )
+
+    def report_summary(self, obj):
+        report = obj.report or {}
+        if 'rows' not in report:
+            return report.get('message', '-')
+        return (
+            f"строк {report['rows']}: создано {report['created']}, обновлено {report['updated']}, "
+            f"ошибок {report['failed']}, изображений {report['images']}"
+        )
+    report_summary.short_description = 'Итог'
+
+    def report_errors(self, obj):
+        errors = (obj.report or {}).get('errors', [])
+        if not errors:
+            return '-'
+        return format_html(
+            '<ul style="margin: 0;">{}</ul>',
+            format_html_join('', '<li>Строка {}: {}</li>', ((e['row'], e['message']) for e in errors)),
+        )
+    report_errors.short_description = 'Ошибки'
+
+    def save_model(self, request, obj, form, change):
+        from django.db import transaction
+        from .tasks import import_feature_contents_task
+        super().save_model(request, obj, form, change)
+        if not change:
+            transaction.on_commit(lambda: import_feature_contents_task.delay(obj.pk))
+            self.message_user(request, "Импорт контента запущен.", messages.SUCCESS)
+
+    @admin.action(description='Запустить импорт повторно')
+    def run_import(self, request, queryset):
+        from .tasks import import_feature_contents_task
+        started = 0
+        for job in queryset.exclude(status='running'):
+            import_feature_contents_task.delay(job.pk)
+            started += 1
+        self.message_user(request, f"Запущено импортов: {started}.", messages.SUCCESS)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'sql_ms', 'user')
+    list_filter = ('method', 'status_code')
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    fields = (
+        'created_at', 'method', 'path', 'user', 'status_code',
+        'duration_ms', 'query_count', 'sql_ms', 'queries_table', 'stats_text',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def queries_table(self, obj):
+        """SQL statements, slowest first, with the captured plans."""
+        queries = sorted(obj.queries or [], key=lambda q: q['duration_ms'], reverse=True)
+        if not queries:
+            return '-'
+        return format_html(
+            '<table><tr><th>мс</th><th>SQL</th></tr>{}</table>',
+            format_html_join('', '<tr><td>{}</td><td><pre style="white-space: pre-wrap;">{}\n{}</pre>{}</td></tr>', (
+                (
+                    q['duration_ms'], q['sql'], q['params'],
+                    format_html('<pre style="background: #f6f6f6;">{}</pre>', q['explain']) if q['explain'] else '',
+                )
+                for q in queries
+            )),
+        )
+    queries_table.short_description = 'SQL-запросы'
+
+    def stats_text(self, obj):
+        return format_html('<pre>{}</pre>', obj.stats or '-')
+    stats_text.short_description = 'cProfile'
@@ -1,4 +1,6 @@
 from django import forms
+from django.contrib.admin.helpers import ActionForm
+from .classify import METHODS, RAMPS
 from .models import LayerStyle
 from .widgets import ColorPickerWidget
 
@@ -10,3 +12,13 @@ class LayerStyleForm(forms.ModelForm):
             'fill_color': ColorPickerWidget(),
             'stroke_color': ColorPickerWidget(),
         }
+
+
+class LayerActionForm(ActionForm):
+    """Extra inputs for the layer admin actions (style classification)."""
+    classify_field = forms.CharField(label='Поле', required=False)
+    classify_method = forms.ChoiceField(label='Метод', choices=list(METHODS.items()), required=False)
+    classify_classes = forms.IntegerField(label='Классов', min_value=2, max_value=15, initial=5, required=False)
+    classify_ramp = forms.ChoiceField(label='Палитра', choices=[(r, r) for r in RAMPS], required=False)
+    classify_push_sld = forms.BooleanField(label='Отправить SLD в GeoServer', required=False)
+
@@ -5,3 +5,6 @@ class LayersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'layers'
     verbose_name = 'Слои геопортала'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,349 @@
+"""
+Benchmark harness for the layers API: synthetic West Siberia layers,
+latency/query-count measurement and stored results for comparing
+commits. Used by the generate_bench_data and benchmark_layers commands.
+"""
+
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .import_utils import (
+    create_mercator_table, drop_table, post_import_stage, quote_ident, table_exists,
+)
+from .queue_stats import percentile
+
+# Synthetic layers are recognised (and cleared) by this slug prefix
+SLUG_PREFIX = 'bench-'
+PROJECT_SLUG = 'bench'
+
+# West Siberian Plain: lon 60..90, lat 52..72
+EXTENT = (60.0, 52.0, 90.0, 72.0)
+
+NAME_PREFIXES = ['Озеро', 'Урочище', 'Гряда', 'Болото', 'Холм', 'Увал', 'Ложбина', 'Останец']
+LANDFORMS = [
+    'морена', 'конечно-моренная гряда', 'зандр', 'оз', 'кам',
+    'флювиогляциальная терраса', 'термокарстовая котловина', 'ложбина стока',
+    'озёрно-ледниковая равнина', 'аллювиальная терраса',
+]
+AGES_KA = [18, 45, 60, 90, 130, 250]
+
+GEOM_SQL = {
+    'point': 'ST_Multi(ST_SetSRID(ST_MakePoint(p.lon, p.lat), 4326))::geometry(MultiPoint, 4326)',
+    # A short random walk of four vertices, ~5 km per step
+    'line': '''ST_Multi(ST_SetSRID(ST_MakeLine(ARRAY[
+            ST_MakePoint(p.lon, p.lat),
+            ST_MakePoint(p.lon + p.dx, p.lat + p.dy),
+            ST_MakePoint(p.lon + 2 * p.dx + p.dy / 2, p.lat + 2 * p.dy),
+            ST_MakePoint(p.lon + 3 * p.dx, p.lat + 3 * p.dy - p.dx / 2)
+        ]), 4326))::geometry(MultiLineString, 4326)''',
+    # Irregular 16-vertex blobs from 0.5 to 5 km across
+    'polygon': '''ST_Multi(ST_SetSRID(ST_Translate(ST_Scale(
+            ST_Buffer(ST_MakePoint(0, 0), 0.005 + abs(p.dx) / 2, 4),
+            1 + abs(p.dy) * 20, 1
+        ), p.lon, p.lat), 4326))::geometry(MultiPolygon, 4326)''',
+}
+
+
+def generate_table(table_name, geom_type, count, seed=0):
+    """
+    Create a layer table of synthetic features in one CREATE TABLE AS
+    over generate_series, with the attributes of a geomorphological map:
+    name, landform, elevation, age_ka, survey_date, verified and the map
+    sheet (1:100 000 nomenclature) the feature falls on.
+    """
+    west, south, east, north = EXTENT
+    geom = GEOM_SQL[geom_type]
+    drop_table(table_name)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT setseed(%s)', [(seed % 1000) / 1000])
+        cursor.execute(f'''
+            CREATE TABLE {quote_ident(table_name)} AS
+            SELECT
+                p.g AS gid,
+                (%s::text[])[1 + floor(random() * %s)::int] || ' ' || p.g AS name,
+                (%s::text[])[1 + floor(power(random(), 2) * %s)::int] AS landform,
+                round((30 + random() * 250)::numeric, 1)::real AS elevation,
+                ((%s::int[])[1 + floor(random() * %s)::int] + floor(random() * 10))::int AS age_ka,
+                (date '1960-01-01' + floor(random() * 23000)::int) AS survey_date,
+                random() < 0.7 AS verified,
+                chr(65 + floor(p.lat / 4)::int) || '-' || (31 + floor(p.lon / 6)::int) || '-'
+                    || (1 + (11 - floor(mod(p.lat::numeric, 4) * 3)::int) * 12
+                        + floor(mod(p.lon::numeric, 6) * 2)::int) AS sheet,
+                {geom} AS geom
+            FROM (
+                SELECT g,
+                       {west} + random() * {east - west} AS lon,
+                       {south} + random() * {north - south} AS lat,
+                       (random() - 0.5) * 0.1 AS dx,
+                       (random() - 0.5) * 0.1 AS dy
+                FROM generate_series(1, %s) g
+            ) p
+        ''', [
+            NAME_PREFIXES, len(NAME_PREFIXES), LANDFORMS, len(LANDFORMS),
+            AGES_KA, len(AGES_KA), count,
+        ])
+        cursor.execute(f'ALTER TABLE {quote_ident(table_name)} ADD PRIMARY KEY (gid)')
+
+
+def generate_layer(geom_type, count, seed=0, contents=2000, styles=1000):
+    """
+    Generate a synthetic layer: PostGIS table, Layer with attributes and
+    legend, FeatureContent rows and LayerStyle rules (one per map sheet).
+
+    Returns:
+        Layer
+    """
+    from .models import FeatureContent, Layer, LayerStyle
+    from .tasks import refresh_legend_counts, save_import_metadata
+
+    slug = f'{SLUG_PREFIX}{geom_type}-{count}'
+    table_name = slug.replace('-', '_')
+    generate_table(table_name, geom_type, count, seed)
+    info = post_import_stage(table_name)
+    if info is None:
+        raise RuntimeError(f"Failed to analyze generated table '{table_name}'")
+    if getattr(settings, 'LAYER_IMPORT_MERCATOR', True):
+        create_mercator_table(table_name)
+
+    layer, _ = Layer.objects.update_or_create(slug=slug, defaults={
+        'title': f'Бенчмарк: {geom_type} × {count}',
+        'layer_type': 'vector',
+        'is_published': True,
+        'description': 'Синтетический слой для бенчмарков',
+    })
+    save_import_metadata(layer, table_name, info)
+
+    rng = random.Random(seed)
+    gids = rng.sample(range(1, count + 1), min(contents, count))
+    FeatureContent.objects.filter(layer=layer).delete()
+    FeatureContent.objects.bulk_create([
+        FeatureContent(
+            layer=layer,
+            feature_id=gid,
+            title=f'Объект {gid}',
+            subtitle=rng.choice(LANDFORMS),
+            description='<p>' + ' '.join(rng.choices(LANDFORMS, k=40)) + '</p>',
+            extra_data={'source': 'synthetic', 'rank': rng.randint(1, 5)},
+            is_published=rng.random() < 0.9,
+        )
+        for gid in gids
+    ], batch_size=1000)
+    layer.bump_version('data_version', 'content_version')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT sheet FROM {quote_ident(table_name)} ORDER BY 1 LIMIT %s', [styles]
+        )
+        sheets = [row[0] for row in cursor.fetchall()]
+    LayerStyle.objects.filter(layer=layer).delete()
+    LayerStyle.objects.bulk_create([
+        LayerStyle(
+            layer=layer, attribute_field='sheet', attribute_value=sheet,
+            fill_color=f'#{rng.randrange(0x1000000):06x}', sort_order=i,
+        )
+        for i, sheet in enumerate(sheets)
+    ], batch_size=1000)
+    refresh_legend_counts(layer)
+    return layer
+
+
+def clear_bench_data():
+    """
+    Delete the synthetic layers, their tables and the benchmark project.
+
+    Returns:
+        number of deleted layers
+    """
+    from .models import Layer, MapProject
+
+    layers = list(Layer.objects.filter(slug__startswith=SLUG_PREFIX))
+    for layer in layers:
+        if layer.postgis_table:
+            drop_table(layer.postgis_table)
+        layer.delete()
+    MapProject.objects.filter(slug=PROJECT_SLUG).delete()
+    return len(layers)
+
+
+def bench_project(layers):
+    """Published MapProject holding the synthetic layers."""
+    from .models import MapProject
+
+    project, _ = MapProject.objects.update_or_create(slug=PROJECT_SLUG, defaults={
+        'title': 'Бенчмарк',
+        'is_published': True,
+    })
+    project.layers.add(*layers)
+    return project
+
+
+def measure(func, iterations=20, warmup=2, count_queries=True):
+    """
+    Run a callable repeatedly and summarise its latency.
+
+    The SQL query count is taken from the first warmup run, so capturing
+    queries does not slow down the timed runs.
+
+    Returns:
+        dict with 'n', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'
+        and 'queries' (None without a warmup run)
+    """
+    queries = None
+    for i in range(warmup):
+        if i == 0 and count_queries:
+            with CaptureQueriesContext(connection) as captured:
+                func()
+            queries = len(captured)
+        else:
+            func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'n': len(samples),
+        'mean_ms': round(statistics.mean(samples), 2),
+        'p50_ms': round(percentile(samples, 0.5), 2),
+        'p95_ms': round(percentile(samples, 0.95), 2),
+        'p99_ms': round(percentile(samples, 0.99), 2),
+        'max_ms': round(samples[-1], 2),
+        'queries': queries,
+    }
+
+
+def git_revision():
+    """Short commit hash of the working tree ('-dirty' if modified), or ''."""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    return f'{revision}-dirty' if revision and dirty else revision
+
+
+def results_dir():
+    return getattr(settings, 'BENCHMARK_RESULTS_DIR', os.path.join(settings.BASE_DIR, 'benchmarks'))
+
+
+def save_results(results, label=''):
+    """
+    Store a benchmark run as JSON named by time and commit.
+
+    Returns:
+        path of the results file
+    """
+    revision = git_revision()
+    run = {
+        'revision': revision,
+        'label': label,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'results': results,
+    }
+    directory = results_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S}-{revision or 'norev'}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_results(ref=None, exclude=None):
+    """
+    A stored benchmark run: a file path, a commit hash prefix, or the
+    latest run (other than `exclude`) if ref is None.
+
+    Returns:
+        run dict with its 'path', or None
+    """
+    if ref and os.path.isfile(ref):
+        path = ref
+    else:
+        directory = results_dir()
+        names = sorted(os.listdir(directory), reverse=True) if os.path.isdir(directory) else []
+        paths = [
+            os.path.join(directory, name) for name in names
+            if name.endswith('.json') and (not ref or name.split('-', 2)[-1].startswith(ref))
+        ]
+        paths = [p for p in paths if p != exclude]
+        if not paths:
+            return None
+        path = paths[0]
+    with open(path, encoding='utf-8') as f:
+        run = json.load(f)
+    run['path'] = path
+    return run
+
+
+def compare_results(current, baseline, metric='p50_ms'):
+    """
+    Relative change of a metric per case against a baseline run.
+
+    Returns:
+        list of (case, baseline value, current value, change or None)
+    """
+    rows = []
+    for case, stats in current.items():
+        before = baseline.get('results', {}).get(case, {}).get(metric)
+        after = stats.get(metric)
+        change = (after - before) / before if before and after is not None else None
+        rows.append((case, before, after, change))
+    return rows
+
+
+def export_gpkg(table_name, path):
+    """Export a layer table to a GeoPackage with ogr2ogr (import benchmark source)."""
+    db = settings.DATABASES['default']
+    pg_conn = f"PG:host={db['HOST']} port={db['PORT']} dbname={db['NAME']} user={db['USER']} password={db['PASSWORD']}"
+    subprocess.run(
+        ['/usr/bin/ogr2ogr', '-f', 'GPKG', path, pg_conn, table_name, '-nln', table_name, '-overwrite'],
+        check=True, capture_output=True, timeout=3600,
+    )
+
+
+def bench_tables(layers):
+    """Layers whose tables exist, for feature-query benchmarks."""
+    return [layer for layer in layers if layer.postgis_table and table_exists(layer.postgis_table)]
+
+
+def feature_tiles(layer, z, count, rng):
+    """
+    XYZ tiles at zoom z around randomly chosen features, so tiles at
+    high zooms are not empty.
+
+    Returns:
+        list of (x, y)
+    """
+    gids = rng.sample(range(1, layer.feature_count + 1), min(count, layer.feature_count))
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT ST_X(p), ST_Y(p)
+            FROM (SELECT ST_PointOnSurface(geom) AS p FROM {quote_ident(layer.postgis_table)} WHERE gid = ANY(%s)) s
+        ''', [gids])
+        points = cursor.fetchall()
+
+    n = 2 ** z
+    tiles = []
+    for lon, lat in points:
+        x = int((lon + 180) / 360 * n)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        tiles.append((min(max(x, 0), n - 1), min(max(y, 0), n - 1)))
+    return tiles
@@ -0,0 +1,314 @@
+"""
+Automatic LayerStyle classification from the data distribution of a field.
+
+Unique values, quantile and equal interval classes are computed in SQL;
+Jenks natural breaks run in NumPy over a random sample of the column.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, connection, transaction
+
+from .import_utils import get_table_column_types, quote_ident
+
+logger = logging.getLogger(__name__)
+
+METHODS = {
+    'unique': 'Уникальные значения',
+    'quantile': 'Квантили',
+    'equal_interval': 'Равные интервалы',
+    'jenks': 'Естественные границы (Дженкс)',
+}
+
+NUMERIC_COLUMN_TYPES = ('smallint', 'integer', 'bigint', 'real', 'double precision', 'numeric')
+
+# Qualitative palette for categories (ColorBrewer Set3 / Paired)
+CATEGORY_COLORS = [
+    '#1f78b4', '#33a02c', '#e31a1c', '#ff7f00', '#6a3d9a',
+    '#a6cee3', '#b2df8a', '#fb9a99', '#fdbf6f', '#cab2d6',
+    '#b15928', '#ffff99', '#8dd3c7', '#bebada', '#80b1d3',
+]
+OTHER_COLOR = '#bdbdbd'
+
+# max_length of LayerStyle.attribute_value and legend_label
+VALUE_MAX_LENGTH = 200
+
+# Sequential ramps for numeric classes: (start, end)
+RAMPS = {
+    'green': ('#edf8e9', '#006d2c'),
+    'blue': ('#eff3ff', '#08519c'),
+    'red': ('#fee5d9', '#a50f15'),
+    'relief': ('#267300', '#a87000'),
+}
+
+
+class ClassificationError(ValueError):
+    """The field cannot be classified with the requested method."""
+
+
+def interpolate_colors(start, end, count):
+    """Evenly spaced hex colours between two hex colours."""
+    a = [int(start[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(end[i:i + 2], 16) for i in (1, 3, 5)]
+    colors = []
+    for k in range(count):
+        t = k / (count - 1) if count > 1 else 0
+        colors.append('#' + ''.join(f'{round(x + (y - x) * t):02x}' for x, y in zip(a, b)))
+    return colors
+
+
+def unique_values(table_name, field, top_n=10):
+    """
+    Most frequent values of a field. Values longer than VALUE_MAX_LENGTH
+    do not fit a rule and are left to 'other'.
+
+    Returns:
+        (values, has_other) — list of (value, count) for the top_n values,
+        and whether less frequent or too long values remain
+    """
+    ident = quote_ident(field)
+    table = quote_ident(table_name)
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT {ident}::text, COUNT(*)
+            FROM {table}
+            WHERE {ident} IS NOT NULL AND {ident}::text <> ''
+              AND length({ident}::text) <= %s
+            GROUP BY 1
+            ORDER BY 2 DESC, 1
+            LIMIT %s
+        ''', [VALUE_MAX_LENGTH, top_n + 1])
+        rows = cursor.fetchall()
+        has_other = len(rows) > top_n
+        if not has_other:
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {table} WHERE length({ident}::text) > %s)',
+                [VALUE_MAX_LENGTH],
+            )
+            has_other = cursor.fetchone()[0]
+    return rows[:top_n], has_other
+
+
+def quantile_breaks(table_name, field, classes):
+    """Class edges at equal-count quantiles (percentile_cont in SQL)."""
+    fractions = [i / classes for i in range(classes + 1)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT percentile_cont(%s::float8[]) WITHIN GROUP (ORDER BY {quote_ident(field)})
+            FROM {quote_ident(table_name)}
+        ''', [fractions])
+        return cursor.fetchone()[0] or []
+
+
+def equal_interval_breaks(table_name, field, classes):
+    """Class edges splitting the value range into equal intervals."""
+    ident = quote_ident(field)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN({ident}), MAX({ident}) FROM {quote_ident(table_name)}')
+        low, high = cursor.fetchone()
+    if low is None:
+        return []
+    step = (float(high) - float(low)) / classes
+    return [float(low) + i * step for i in range(classes)] + [float(high)]
+
+
+def sample_values(table_name, field, limit):
+    """Up to `limit` non-null values of a field, randomly sampled."""
+    ident = quote_ident(field)
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT {ident}::float8 FROM {quote_ident(table_name)}
+            WHERE {ident} IS NOT NULL
+            ORDER BY random()
+            LIMIT %s
+        ''', [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def jenks_breaks(values, classes):
+    """
+    Jenks natural breaks: class edges minimising the within-class sum of
+    squared deviations, by dynamic programming over sorted values.
+
+    Returns:
+        list of classes + 1 edges
+    """
+    import numpy as np
+
+    x = np.sort(np.asarray(values, dtype=np.float64))
+    n = len(x)
+    if n == 0:
+        return []
+    classes = min(classes, len(np.unique(x)))
+
+    # Prefix sums give the squared deviation of any run x[j..i] in O(1)
+    s1 = np.concatenate([[0.0], np.cumsum(x)])
+    s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    def ssd(j, i):
+        """Squared deviation of x[j..i] for a vector of starts j."""
+        count = i + 1 - j
+        total = s1[i + 1] - s1[j]
+        return (s2[i + 1] - s2[j]) - total * total / count
+
+    cost = np.full((classes, n), np.inf)
+    start = np.zeros((classes, n), dtype=np.int64)
+    cost[0] = ssd(np.zeros(n, dtype=np.int64), np.arange(n))
+    for c in range(1, classes):
+        for i in range(c, n):
+            # Last class runs from j to i; the previous c classes cover 0..j-1
+            j = np.arange(c, i + 1)
+            candidates = cost[c - 1, j - 1] + ssd(j, i)
+            best = int(np.argmin(candidates))
+            cost[c, i] = candidates[best]
+            start[c, i] = j[best]
+
+    edges = [float(x[-1])]
+    i = n - 1
+    for c in range(classes - 1, 0, -1):
+        j = start[c, i]
+        edges.append(float(x[j]))
+        i = j - 1
+    edges.append(float(x[0]))
+    return edges[::-1]
+
+
+def format_edge(value, digits=6):
+    """Short label for a class edge."""
+    return f'{value:.{digits}g}'
+
+
+def edge_labels(edges):
+    """
+    Labels for sorted distinct class edges, with just enough significant
+    digits to tell close edges apart.
+    """
+    for digits in range(6, 18):
+        labels = [format_edge(value, digits) for value in edges]
+        if len(set(labels)) == len(labels):
+            return labels
+    return labels
+
+
+def build_rules(layer, field, method, classes=5, top_n=10, ramp='green'):
+    """
+    Compute classification rules for a field of a layer.
+
+    Returns:
+        list of dicts with LayerStyle field values
+    """
+    columns = dict(get_table_column_types(layer.postgis_table))
+    if field not in columns:
+        raise ClassificationError(f"Field '{field}' not found in '{layer.postgis_table}'")
+
+    if method == 'unique':
+        values, has_other = unique_values(layer.postgis_table, field, top_n)
+        colors = CATEGORY_COLORS * (len(values) // len(CATEGORY_COLORS) + 1)
+        rules = [
+            {'attribute_value': value, 'fill_color': color, 'legend_label': value, 'feature_count': count}
+            for (value, count), color in zip(values, colors)
+        ]
+        if has_other:
+            rules.append({
+                'attribute_value': '', 'is_default': True,
+                'fill_color': OTHER_COLOR, 'legend_label': 'Прочие',
+            })
+        return rules
+
+    if columns[field] not in NUMERIC_COLUMN_TYPES:
+        raise ClassificationError(f"Field '{field}' is not numeric ({columns[field]})")
+
+    if method == 'quantile':
+        edges = quantile_breaks(layer.postgis_table, field, classes)
+    elif method == 'equal_interval':
+        edges = equal_interval_breaks(layer.postgis_table, field, classes)
+    elif method == 'jenks':
+        sample = sample_values(
+            layer.postgis_table, field, getattr(settings, 'LAYER_CLASSIFY_SAMPLE', 3000)
+        )
+        edges = jenks_breaks(sample, classes)
+    else:
+        raise ClassificationError(f"Unknown method '{method}'")
+
+    # Skewed data can produce repeated quantiles
+    edges = sorted(set(edges))
+    if len(edges) < 2:
+        raise ClassificationError(f"Field '{field}' has no value spread")
+
+    colors = interpolate_colors(*RAMPS.get(ramp, RAMPS['green']), len(edges) - 1)
+    labels = edge_labels(edges)
+    rules = []
+    for k, color in enumerate(colors):
+        low, high = edges[k], edges[k + 1]
+        label = f'{labels[k]} – {labels[k + 1]}'
+        rules.append({
+            'attribute_value': label,
+            # Outer classes are open-ended so values outside the sample still match
+            'value_min': low if k > 0 else None,
+            'value_max': high if k < len(colors) - 1 else None,
+            'fill_color': color,
+            'legend_label': label,
+        })
+    return rules
+
+
+def classify_layer(layer, field, method, classes=5, top_n=10, ramp='green',
+                   replace=True, push_sld=False):
+    """
+    Generate LayerStyle rules for a layer field and store them with one
+    bulk_create. Existing rules of the field are replaced; with `replace`
+    the rules of all other fields go too.
+
+    Args:
+        layer: Layer with a PostGIS table
+        field: Column to classify
+        method: 'unique', 'quantile', 'equal_interval' or 'jenks'
+        classes: Number of numeric classes
+        top_n: Number of unique values before the rest goes to 'other'
+        ramp: Colour ramp for numeric classes (see RAMPS)
+        replace: Delete all the layer's existing rules first
+        push_sld: Publish the compiled SLD now instead of in the background
+
+    Returns:
+        dict with 'success', 'message', 'styles' and 'sld' (push result or None)
+    """
+    from .models import LayerStyle
+    from .sld import publish_layer_style
+    from .tasks import refresh_legend_counts, schedule_layer_seed, schedule_style_publish
+
+    rules = build_rules(layer, field, method, classes, top_n, ramp)
+    styles = [
+        LayerStyle(layer=layer, attribute_field=field, sort_order=i, **rule)
+        for i, rule in enumerate(rules)
+    ]
+
+    try:
+        with transaction.atomic():
+            if replace:
+                layer.styles.all().delete()
+            else:
+                layer.styles.filter(attribute_field=field).delete()
+            created = LayerStyle.objects.bulk_create(styles)
+    except (IntegrityError, DataError) as e:
+        raise ClassificationError(f"Cannot save rules for '{field}': {e}") from e
+
+    # bulk_create bypasses the post_save signals
+    refresh_legend_counts(layer)
+
+    sld_result = None
+    if layer.geoserver_layer_name:
+        if push_sld:
+            sld_result = publish_layer_style(layer)
+            if sld_result['changed']:
+                schedule_layer_seed(layer.id, 'reseed')
+        else:
+            schedule_style_publish(layer.id)
+
+    logger.info(f"Classified '{layer.slug}' by '{field}' ({method}): {len(created)} rules")
+    return {
+        'success': True,
+        'message': f"Created {len(created)} style rules",
+        'styles': created,
+        'sld': sld_result,
+    }
@@ -0,0 +1,373 @@
+"""
+Bulk FeatureContent import from XLSX/CSV spreadsheets, with gallery
+images from a zip archive.
+
+Rows are streamed in batches: each batch resolves its keys against the
+layer's PostGIS table in one query, upserts FeatureContent with one
+bulk_create(update_conflicts=True) and attaches its images with one more.
+"""
+
+import csv
+import logging
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+
+from .import_utils import get_table_column_types, quote_ident
+from .query_advisor import timed_execute
+
+logger = logging.getLogger(__name__)
+
+# Spreadsheet columns stored in FeatureContent fields; the rest go to extra_data
+CONTENT_FIELDS = (
+    'title', 'subtitle', 'description', 'image_url',
+    'gdrive_folder_id', 'image_caption', 'is_published',
+)
+IMAGES_COLUMN = 'images'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'нет')
+MAX_REPORTED_ERRORS = 200
+
+
+class ContentImportError(ValueError):
+    """The spreadsheet or archive cannot be imported."""
+
+
+def cell_text(value):
+    """Spreadsheet cell as text (Excel stores integers as floats)."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def read_rows(path):
+    """
+    Stream the rows of an XLSX or CSV file as dicts keyed by the
+    lower-cased headers of the first row. Empty rows are skipped.
+
+    Yields:
+        (row_number, dict) tuples
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [cell_text(h).lower() for h in next(rows, ())]
+            for number, values in enumerate(rows, start=2):
+                if any(cell_text(v) for v in values):
+                    yield number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    elif ext in ('.csv', '.txt'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            sample = f.read(8192)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            reader = csv.reader(f, dialect)
+            header = [h.strip().lower() for h in next(reader, [])]
+            for number, values in enumerate(reader, start=2):
+                if any(v.strip() for v in values):
+                    yield number, dict(zip(header, values))
+    else:
+        raise ContentImportError(f"Unsupported spreadsheet type '{ext}' (XLSX or CSV expected)")
+
+
+def resolve_features(table_name, key_field, keys):
+    """
+    Match spreadsheet keys to gids of a layer table in one query.
+
+    Args:
+        table_name: PostGIS table
+        key_field: Attribute compared with the keys, or '' if keys are gids
+        keys: Iterable of key strings
+
+    Returns:
+        dict of key -> list of matching gids
+    """
+    with connection.cursor() as cursor:
+        if key_field:
+            ident = quote_ident(key_field)
+            timed_execute(
+                cursor, table_name,
+                f'SELECT {ident}::text, gid FROM {quote_ident(table_name)} WHERE {ident}::text = ANY(%s)',
+                [list(keys)], [(key_field, 'text')], 'content_import'
+            )
+        else:
+            cursor.execute(
+                f'SELECT gid::text, gid FROM {quote_ident(table_name)} WHERE gid = ANY(%s)',
+                [[int(key) for key in keys if key.isdigit()]]
+            )
+        matches = {}
+        for key, gid in cursor.fetchall():
+            matches.setdefault(key, []).append(gid)
+        return matches
+
+
+def archive_index(archive):
+    """
+    Index the images of a zip archive by lower-cased file name and by
+    the name of their folder (a folder named after a row key holds that
+    row's images).
+
+    Returns:
+        (by_name, by_folder) dicts of ZipInfo
+    """
+    by_name = {}
+    by_folder = {}
+    for info in sorted(archive.infolist(), key=lambda i: i.filename):
+        name = info.filename
+        base = os.path.basename(name)
+        if info.is_dir() or '__MACOSX' in name or base.startswith('.'):
+            continue
+        if not base.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        by_name[base.lower()] = info
+        folder = os.path.basename(os.path.dirname(name))
+        if folder:
+            by_folder.setdefault(folder, []).append(info)
+    return by_name, by_folder
+
+
+def update_fields_for(header, key_column):
+    """
+    FeatureContent fields a spreadsheet sets: its known columns, plus
+    extra_data when it has other columns. Fields without a column keep
+    their stored values on update.
+    """
+    fields = [name for name in CONTENT_FIELDS if name in header]
+    if set(header) - set(CONTENT_FIELDS) - {key_column, IMAGES_COLUMN, ''}:
+        fields.append('extra_data')
+    return fields + ['updated_at']
+
+
+def row_content(row, key_column):
+    """
+    FeatureContent field values and extra_data of a spreadsheet row.
+
+    Raises:
+        ContentImportError: if a value is too long for its field
+    """
+    from .models import FeatureContent
+
+    values = {}
+    extra = {}
+    for column, value in row.items():
+        if column in (key_column, IMAGES_COLUMN, ''):
+            continue
+        if column == 'is_published':
+            values[column] = cell_text(value).lower() not in FALSE_VALUES
+        elif column in CONTENT_FIELDS:
+            text = cell_text(value)
+            max_length = FeatureContent._meta.get_field(column).max_length
+            if max_length and len(text) > max_length:
+                raise ContentImportError(f"'{column}' is longer than {max_length} characters")
+            values[column] = text
+        elif value is not None and cell_text(value):
+            extra[column] = value if isinstance(value, (int, float, bool)) else cell_text(value)
+    return values, extra
+
+
+def row_images(row, key, index):
+    """
+    Archive members for a row: files listed in its images column
+    (separated by ';' or ','), or else the folder named after its key.
+
+    Returns:
+        (list of ZipInfo, list of missing file names)
+    """
+    by_name, by_folder = index
+    names = [n.strip() for n in cell_text(row.get(IMAGES_COLUMN)).replace(',', ';').split(';') if n.strip()]
+    if not names:
+        return by_folder.get(key, []), []
+    found = [by_name[n.lower()] for n in names if n.lower() in by_name]
+    missing = [n for n in names if n.lower() not in by_name]
+    return found, missing
+
+
+def fail(report, number, message, row_failed=True):
+    """Record an error in the report (a failed row unless row_failed=False)."""
+    if row_failed:
+        report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'row': number, 'message': message})
+
+
+def import_batch(job, batch, update_fields, archive, index, report):
+    """
+    Upsert one batch of rows and attach their images.
+
+    Args:
+        job: FeatureContentImport
+        batch: list of (row_number, key, row) tuples
+        update_fields: FeatureContent fields set by the spreadsheet
+        archive: open ZipFile or None
+        index: archive_index() of the archive
+        report: report dict, updated in place
+    """
+    from .models import FeatureContent
+
+    layer = job.layer
+    matches = resolve_features(layer.postgis_table, job.key_field, {key for _, key, _ in batch})
+
+    pending = {}
+    for number, key, row in batch:
+        gids = matches.get(key, [])
+        if not gids:
+            fail(report, number, f"Объект '{key}' не найден в слое")
+            continue
+        if len(gids) > 1:
+            fail(report, number, f"Значению '{key}' соответствует {len(gids)} объектов")
+            continue
+        if gids[0] in pending:
+            fail(report, number, f"Объект '{key}' уже есть в строке {pending[gids[0]][0]}")
+            continue
+        try:
+            values, extra = row_content(row, job.key_column)
+        except ContentImportError as e:
+            fail(report, number, str(e))
+            continue
+        images, missing = row_images(row, key, index) if archive else ([], [])
+        for name in missing:
+            fail(report, number, f"Изображение '{name}' не найдено в архиве", row_failed=False)
+        content = FeatureContent(layer=layer, feature_id=gids[0], extra_data=extra, **values)
+        pending[gids[0]] = (number, content, images)
+
+    if not pending:
+        return
+
+    existing = set(
+        FeatureContent.objects.filter(layer=layer, feature_id__in=pending)
+        .values_list('feature_id', flat=True)
+    )
+    try:
+        with transaction.atomic():
+            # PostgreSQL returns the primary keys of inserted and updated rows
+            FeatureContent.objects.bulk_create(
+                [content for _, content, _ in pending.values()],
+                update_conflicts=True,
+                unique_fields=['layer', 'feature_id'],
+                update_fields=update_fields,
+            )
+            image_count = attach_images(job, pending.values(), archive)
+    except DatabaseError as e:
+        logger.error(f"Content import {job.pk}: batch failed: {e}")
+        for number, _, _ in pending.values():
+            fail(report, number, f'Ошибка базы данных: {e}')
+        return
+
+    # bulk_create bypasses the signals that track has_content flags
+    layer.bump_version('content_version')
+    report['created'] += len(pending.keys() - existing)
+    report['updated'] += len(pending.keys() & existing)
+    report['images'] += image_count
+
+
+def attach_images(job, rows, archive):
+    """
+    Stream a batch's images from the archive into storage and create
+    their FeatureImage rows with one bulk_create.
+
+    Returns:
+        number of images attached
+    """
+    from .models import FeatureImage
+
+    rows = [(content, images) for _, content, images in rows if images]
+    if not rows:
+        return 0
+
+    content_ids = [content.pk for content, _ in rows]
+    if job.replace_gallery:
+        FeatureImage.objects.filter(feature_content_id__in=content_ids).delete()
+        offsets = {}
+    else:
+        offsets = dict(
+            FeatureImage.objects.filter(feature_content_id__in=content_ids)
+            .values_list('feature_content_id')
+            .annotate(count=Count('id'))
+        )
+
+    gallery = []
+    for content, images in rows:
+        for position, info in enumerate(images, start=offsets.get(content.pk, 0)):
+            image = FeatureImage(feature_content=content, sort_order=position)
+            with archive.open(info) as member:
+                image.image.save(os.path.basename(info.filename), File(member), save=False)
+            gallery.append(image)
+    FeatureImage.objects.bulk_create(gallery)
+    return len(gallery)
+
+
+def run_content_import(job):
+    """
+    Run a FeatureContentImport, saving the report after every batch so
+    the admin shows progress.
+
+    Args:
+        job: FeatureContentImport with its layer
+
+    Returns:
+        report dict with 'rows', 'created', 'updated', 'failed',
+        'images' and 'errors' keys
+
+    Raises:
+        ContentImportError: if the layer, key or files are unusable
+    """
+    layer = job.layer
+    if not layer.postgis_table:
+        raise ContentImportError(f"Layer '{layer.slug}' has no PostGIS table")
+    if job.key_field and job.key_field not in dict(get_table_column_types(layer.postgis_table)):
+        raise ContentImportError(f"Field '{job.key_field}' not found in '{layer.postgis_table}'")
+
+    report = {'rows': 0, 'created': 0, 'updated': 0, 'failed': 0, 'images': 0, 'errors': []}
+    batch_size = getattr(settings, 'CONTENT_IMPORT_BATCH_SIZE', 500)
+    key_column = job.key_column.strip().lower()
+
+    try:
+        archive = zipfile.ZipFile(job.images_zip.path) if job.images_zip else None
+    except zipfile.BadZipFile:
+        raise ContentImportError('Image archive is not a valid zip file')
+
+    try:
+        index = archive_index(archive) if archive else ({}, {})
+        update_fields = None
+        batch = []
+        for number, row in read_rows(job.data_file.path):
+            if update_fields is None:
+                if key_column not in row:
+                    raise ContentImportError(f"Key column '{key_column}' not found in the spreadsheet")
+                update_fields = update_fields_for(row.keys(), key_column)
+            report['rows'] += 1
+            key = cell_text(row.get(key_column))
+            if not key:
+                fail(report, number, 'Пустой ключ')
+                continue
+            batch.append((number, key, row))
+            if len(batch) >= batch_size:
+                import_batch(job, batch, update_fields, archive, index, report)
+                batch = []
+                job.report = report
+                job.save(update_fields=['report'])
+        if batch:
+            import_batch(job, batch, update_fields, archive, index, report)
+    finally:
+        if archive:
+            archive.close()
+
+    logger.info(
+        f"Content import {job.pk} for '{layer.slug}': {report['created']} created, "
+        f"{report['updated']} updated, {report['failed']} failed, {report['images']} images"
+    )
+    return report
@@ -4,6 +4,8 @@ Google Drive API utilities for fetching images from public folders.
 import requests
 from django.conf import settings
 
+from .metrics import external_call
+
 
 def get_gdrive_images(folder_id):
     """
@@ -27,7 +29,9 @@ def get_gdrive_images(folder_id):
             'pageSize': 100
         }
         
-        resp = requests.get(url, params=params, timeout=10)
+        with external_call('gdrive') as call:
+            resp = requests.get(url, params=params, timeout=10)
+            call['status'] = resp.status_code
         resp.raise_for_status()
         data = resp.json()
         
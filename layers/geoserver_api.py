@@ -1,9 +1,18 @@
 """
 GeoServer REST API helper functions.
+
+All calls go through a shared GeoServerClient: one pooled requests.Session
+with timeouts, backoff retries and memoized workspace/datastore checks.
+The module-level functions are thin wrappers around the default client.
 """
 
+import math
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 from django.conf import settings
 import logging
 
@@ -20,168 +29,672 @@ def get_base_url():
     return f"{settings.GEOSERVER_URL}/rest"
 
 
-def ensure_workspace_exists(workspace=None):
-    """
-    Ensure the workspace exists in GeoServer.
-    """
-    workspace = workspace or settings.GEOSERVER_WORKSPACE
-    url = f"{get_base_url()}/workspaces/{workspace}.json"
-    
-    resp = requests.get(url, auth=get_auth())
-    if resp.status_code == 200:
-        logger.info(f"Workspace '{workspace}' exists")
-        return True
-    
-    # Create workspace
-    create_url = f"{get_base_url()}/workspaces"
-    data = {"workspace": {"name": workspace}}
-    resp = requests.post(create_url, json=data, auth=get_auth())
-    
-    if resp.status_code in (200, 201):
-        logger.info(f"Workspace '{workspace}' created")
-        return True
-    else:
-        logger.error(f"Failed to create workspace: {resp.text}")
-        return False
+def get_gwc_url():
+    """Get GeoWebCache REST API base URL."""
+    return f"{settings.GEOSERVER_URL}/gwc/rest"
 
 
-def ensure_datastore_exists(store_name='postgis', workspace=None):
+def response_text(resp):
+    """Error text of a response, or a placeholder if there was none."""
+    return resp.text if resp is not None else 'no response'
+
+
+def lonlat_to_mercator(lon, lat):
+    """Convert WGS84 lon/lat to EPSG:3857 metres."""
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = lon * 20037508.342789244 / 180
+    y = math.log(math.tan((90 + lat) * math.pi / 360)) * 6378137.0
+    return x, y
+
+
+class GeoServerClient:
     """
-    Ensure PostGIS datastore exists in GeoServer.
+    GeoServer REST client with a pooled session.
+
+    - keep-alive connection pool shared by all calls (and threads)
+    - connect/read timeouts on every request
+    - exponential backoff retries on connection errors and 502/503/504
+      for idempotent methods (POST is never retried automatically)
+    - workspace/datastore existence memoized for cache_ttl seconds
     """
-    workspace = workspace or settings.GEOSERVER_WORKSPACE
-    url = f"{get_base_url()}/workspaces/{workspace}/datastores/{store_name}.json"
-    
-    resp = requests.get(url, auth=get_auth())
-    if resp.status_code == 200:
-        logger.info(f"Datastore '{store_name}' exists")
-        return True
-    
-    # Create datastore
-    create_url = f"{get_base_url()}/workspaces/{workspace}/datastores"
-    db = settings.DATABASES['default']
-    
-    data = {
-        "dataStore": {
-            "name": store_name,
-            "type": "PostGIS",
-            "connectionParameters": {
-                "entry": [
-                    {"@key": "host", "$": db['HOST']},
-                    {"@key": "port", "$": db['PORT']},
-                    {"@key": "database", "$": db['NAME']},
-                    {"@key": "user", "$": db['USER']},
-                    {"@key": "passwd", "$": db['PASSWORD']},
-                    {"@key": "dbtype", "$": "postgis"},
-                    {"@key": "schema", "$": "public"},
-                ]
+
+    def __init__(self, url=None, user=None, password=None,
+                 timeout=None, retries=None, cache_ttl=None, pool_size=10):
+        self.url = url or settings.GEOSERVER_URL
+        self.timeout = timeout or getattr(settings, 'GEOSERVER_TIMEOUT', (5, 60))
+        self.cache_ttl = cache_ttl if cache_ttl is not None else getattr(settings, 'GEOSERVER_CACHE_TTL', 300)
+        retries = retries if retries is not None else getattr(settings, 'GEOSERVER_RETRIES', 3)
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(
+            user or settings.GEOSERVER_USER,
+            password or settings.GEOSERVER_PASSWORD
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._exists = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rest_url(self):
+        return f"{self.url}/rest"
+
+    @property
+    def gwc_url(self):
+        return f"{self.url}/gwc/rest"
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the pooled session.
+
+        Returns:
+            requests.Response, or None if the server could not be reached
+        """
+        from .metrics import external_call
+        
+        kwargs.setdefault('timeout', self.timeout)
+        with external_call('geoserver', method) as call:
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                logger.error(f"GeoServer {method} {url} failed: {e}")
+                return None
+            call['status'] = resp.status_code
+            return resp
+
+    # --- Existence cache ---
+
+    def _is_known(self, key):
+        with self._lock:
+            expires = self._exists.get(key)
+            return expires is not None and expires > time.monotonic()
+
+    def _remember(self, key):
+        with self._lock:
+            self._exists[key] = time.monotonic() + self.cache_ttl
+
+    def forget(self, key=None):
+        """Drop memoized existence checks (all of them if key is None)."""
+        with self._lock:
+            if key is None:
+                self._exists.clear()
+            else:
+                self._exists.pop(key, None)
+
+    # --- Workspace / datastore ---
+
+    def ensure_workspace_exists(self, workspace=None):
+        """
+        Ensure the workspace exists in GeoServer.
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        key = ('workspace', workspace)
+        if self._is_known(key):
+            return True
+
+        resp = self.request('GET', f"{self.rest_url}/workspaces/{workspace}.json")
+        if resp is not None and resp.status_code == 200:
+            logger.info(f"Workspace '{workspace}' exists")
+            self._remember(key)
+            return True
+
+        # Create workspace
+        data = {"workspace": {"name": workspace}}
+        resp = self.request('POST', f"{self.rest_url}/workspaces", json=data)
+
+        if resp is not None and resp.status_code in (200, 201):
+            logger.info(f"Workspace '{workspace}' created")
+            self._remember(key)
+            return True
+        else:
+            logger.error(f"Failed to create workspace: {response_text(resp)}")
+            return False
+
+    def ensure_datastore_exists(self, store_name='postgis', workspace=None):
+        """
+        Ensure PostGIS datastore exists in GeoServer.
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        key = ('datastore', workspace, store_name)
+        if self._is_known(key):
+            return True
+
+        url = f"{self.rest_url}/workspaces/{workspace}/datastores/{store_name}.json"
+        resp = self.request('GET', url)
+        if resp is not None and resp.status_code == 200:
+            logger.info(f"Datastore '{store_name}' exists")
+            self._remember(key)
+            return True
+
+        # Create datastore
+        db = settings.DATABASES['default']
+        data = {
+            "dataStore": {
+                "name": store_name,
+                "type": "PostGIS",
+                "connectionParameters": {
+                    "entry": [
+                        {"@key": "host", "$": db['HOST']},
+                        {"@key": "port", "$": db['PORT']},
+                        {"@key": "database", "$": db['NAME']},
+                        {"@key": "user", "$": db['USER']},
+                        {"@key": "passwd", "$": db['PASSWORD']},
+                        {"@key": "dbtype", "$": "postgis"},
+                        {"@key": "schema", "$": "public"},
+                    ]
+                }
             }
         }
-    }
-    
-    resp = requests.post(create_url, json=data, auth=get_auth())
-    
-    if resp.status_code in (200, 201):
-        logger.info(f"Datastore '{store_name}' created")
-        return True
-    else:
-        logger.error(f"Failed to create datastore: {resp.text}")
-        return False
+        resp = self.request('POST', f"{self.rest_url}/workspaces/{workspace}/datastores", json=data)
 
+        if resp is not None and resp.status_code in (200, 201):
+            logger.info(f"Datastore '{store_name}' created")
+            self._remember(key)
+            return True
+        else:
+            logger.error(f"Failed to create datastore: {response_text(resp)}")
+            return False
 
-def publish_postgis_layer(table_name, layer_title=None, workspace=None, store_name='postgis'):
-    """
-    Publish a PostGIS table as a layer in GeoServer.
-    
-    Args:
-        table_name: Name of the table in PostGIS
-        layer_title: Human-readable title (defaults to table_name)
-        workspace: GeoServer workspace
-        store_name: GeoServer datastore name
-    
-    Returns:
-        dict with 'success' and 'message' keys
-    """
-    workspace = workspace or settings.GEOSERVER_WORKSPACE
-    layer_title = layer_title or table_name
-    
-    # Ensure workspace and datastore exist
-    if not ensure_workspace_exists(workspace):
-        return {'success': False, 'message': 'Failed to ensure workspace exists'}
-    
-    if not ensure_datastore_exists(store_name, workspace):
-        return {'success': False, 'message': 'Failed to ensure datastore exists'}
-    
-    # Check if layer already exists
-    layer_url = f"{get_base_url()}/workspaces/{workspace}/datastores/{store_name}/featuretypes/{table_name}.json"
-    resp = requests.get(layer_url, auth=get_auth())
-    
-    if resp.status_code == 200:
-        logger.info(f"Layer '{table_name}' already exists, updating...")
-        # Update existing layer
+    # --- Feature types ---
+
+    def publish_postgis_layer(self, table_name, layer_title=None, workspace=None,
+                              store_name='postgis', check_store=True):
+        """
+        Publish a PostGIS table as a layer in GeoServer.
+
+        Args:
+            table_name: Name of the table in PostGIS
+            layer_title: Human-readable title (defaults to table_name)
+            workspace: GeoServer workspace
+            store_name: GeoServer datastore name
+            check_store: Ensure workspace and datastore exist first
+                (memoized, so repeated calls cost nothing within the TTL)
+
+        Returns:
+            dict with 'success' and 'message' keys
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        layer_title = layer_title or table_name
+
+        # Ensure workspace and datastore exist
+        if check_store:
+            if not self.ensure_workspace_exists(workspace):
+                return {'success': False, 'message': 'Failed to ensure workspace exists'}
+
+            if not self.ensure_datastore_exists(store_name, workspace):
+                return {'success': False, 'message': 'Failed to ensure datastore exists'}
+
+        # Check if layer already exists
+        layer_url = f"{self.rest_url}/workspaces/{workspace}/datastores/{store_name}/featuretypes/{table_name}.json"
+        resp = self.request('GET', layer_url)
+        if resp is None:
+            return {'success': False, 'message': 'GeoServer is unreachable'}
+
+        if resp.status_code == 200:
+            logger.info(f"Layer '{table_name}' already exists, updating...")
+            # Update existing layer
+            data = {
+                "featureType": {
+                    "name": table_name,
+                    "title": layer_title,
+                    "enabled": True,
+                    "srs": "EPSG:4326",
+                }
+            }
+            resp = self.request('PUT', layer_url, json=data)
+            if resp is not None and resp.status_code in (200, 201):
+                return {'success': True, 'message': f'Layer {table_name} updated'}
+            else:
+                return {'success': False, 'message': f'Failed to update layer: {response_text(resp)}'}
+
+        # Create new layer
+        create_url = f"{self.rest_url}/workspaces/{workspace}/datastores/{store_name}/featuretypes"
         data = {
             "featureType": {
                 "name": table_name,
+                "nativeName": table_name,
                 "title": layer_title,
                 "enabled": True,
                 "srs": "EPSG:4326",
             }
         }
-        resp = requests.put(layer_url, json=data, auth=get_auth())
+        resp = self.request('POST', create_url, json=data)
+
+        if resp is not None and resp.status_code in (200, 201):
+            logger.info(f"Layer '{table_name}' published successfully")
+            return {'success': True, 'message': f'Layer {table_name} published'}
+
+        if resp is not None and resp.status_code == 404:
+            # Workspace/datastore vanished since it was memoized
+            self.forget(('workspace', workspace))
+            self.forget(('datastore', workspace, store_name))
+
+        logger.error(f"Failed to publish layer: {response_text(resp)}")
+        return {'success': False, 'message': f'Failed to publish: {response_text(resp)}'}
+
+    def publish_layers(self, layers, workspace=None, store_name='postgis'):
+        """
+        Publish many PostGIS tables, checking workspace and datastore once.
+
+        Args:
+            layers: iterable of (table_name, layer_title) tuples
+
+        Returns:
+            dict mapping table_name to its publish result
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        layers = list(layers)
+
+        if not self.ensure_workspace_exists(workspace) or not self.ensure_datastore_exists(store_name, workspace):
+            failure = {'success': False, 'message': 'Failed to ensure workspace/datastore exists'}
+            return {table_name: failure for table_name, _ in layers}
+
+        return {
+            table_name: self.publish_postgis_layer(
+                table_name, layer_title, workspace, store_name, check_store=False
+            )
+            for table_name, layer_title in layers
+        }
+
+    def delete_layer(self, layer_name, workspace=None, store_name='postgis'):
+        """
+        Delete a layer from GeoServer.
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+
+        # Delete feature type
+        url = f"{self.rest_url}/workspaces/{workspace}/datastores/{store_name}/featuretypes/{layer_name}?recurse=true"
+        resp = self.request('DELETE', url)
+
+        if resp is not None and resp.status_code in (200, 204):
+            logger.info(f"Layer '{layer_name}' deleted")
+            return {'success': True, 'message': f'Layer {layer_name} deleted'}
+        else:
+            logger.error(f"Failed to delete layer: {response_text(resp)}")
+            return {'success': False, 'message': f'Failed to delete: {response_text(resp)}'}
+
+    def get_layer_info(self, layer_name, workspace=None):
+        """
+        Get layer information from GeoServer.
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        resp = self.request('GET', f"{self.rest_url}/workspaces/{workspace}/layers/{layer_name}.json")
+
+        if resp is not None and resp.status_code == 200:
+            return resp.json()
+        return None
+
+    def list_featuretypes(self, workspace=None, store_name='postgis'):
+        """
+        List names of all feature types configured in a datastore.
+
+        Returns:
+            set of names, or None on error
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        resp = self.request(
+            'GET', f"{self.rest_url}/workspaces/{workspace}/datastores/{store_name}/featuretypes.json"
+        )
+        if resp is None or resp.status_code != 200:
+            return None
+        feature_types = (resp.json().get('featureTypes') or {}).get('featureType', [])
+        return {ft['name'] for ft in feature_types}
+
+    def list_coverage_stores(self, workspace=None):
+        """
+        List names of all coverage stores in a workspace.
+
+        Returns:
+            set of names, or None on error
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        resp = self.request('GET', f"{self.rest_url}/workspaces/{workspace}/coveragestores.json")
+        if resp is None or resp.status_code != 200:
+            return None
+        stores = (resp.json().get('coverageStores') or {}).get('coverageStore', [])
+        return {store['name'] for store in stores}
+
+    def list_layers(self, workspace=None):
+        """
+        List names of all published layers in a workspace.
+
+        Returns:
+            set of names, or None on error
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        resp = self.request('GET', f"{self.rest_url}/workspaces/{workspace}/layers.json")
+        if resp is None or resp.status_code != 200:
+            return None
+        layers = (resp.json().get('layers') or {}).get('layer', [])
+        return {layer['name'] for layer in layers}
+
+    # --- Coverages ---
+
+    def publish_geotiff_layer(self, store_name, file_path, layer_title=None, workspace=None):
+        """
+        Publish a GeoTIFF (COG) as a coverage store and layer in GeoServer.
+
+        The file is referenced in place (external.geotiff), not uploaded,
+        so GeoServer reads the same COG blocks and overviews as the site.
+
+        Args:
+            store_name: Coverage store and layer name
+            file_path: Absolute path to the GeoTIFF on the shared filesystem
+            layer_title: Human-readable title (defaults to store_name)
+            workspace: GeoServer workspace
+
+        Returns:
+            dict with 'success' and 'message' keys
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        layer_title = layer_title or store_name
+
+        if not self.ensure_workspace_exists(workspace):
+            return {'success': False, 'message': 'Failed to ensure workspace exists'}
+
+        url = (
+            f"{self.rest_url}/workspaces/{workspace}/coveragestores/{store_name}"
+            f"/external.geotiff?configure=first&coverageName={store_name}"
+        )
+        resp = self.request(
+            'PUT', url, data=f"file://{file_path}",
+            headers={'Content-Type': 'text/plain'}
+        )
+        if resp is None or resp.status_code not in (200, 201):
+            logger.error(f"Failed to publish coverage: {response_text(resp)}")
+            return {'success': False, 'message': f'Failed to publish coverage: {response_text(resp)}'}
+
+        # Set title
+        coverage_url = f"{self.rest_url}/workspaces/{workspace}/coveragestores/{store_name}/coverages/{store_name}.json"
+        data = {"coverage": {"title": layer_title, "enabled": True}}
+        resp = self.request('PUT', coverage_url, json=data)
+        if resp is None or resp.status_code not in (200, 201):
+            logger.warning(f"Failed to set coverage title: {response_text(resp)}")
+
+        logger.info(f"Coverage '{store_name}' published successfully")
+        return {'success': True, 'message': f'Coverage {store_name} published'}
+
+    def delete_coverage_store(self, store_name, workspace=None):
+        """
+        Delete a coverage store (and its layers) from GeoServer.
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+
+        url = f"{self.rest_url}/workspaces/{workspace}/coveragestores/{store_name}?recurse=true"
+        resp = self.request('DELETE', url)
+
+        if resp is not None and resp.status_code in (200, 204):
+            logger.info(f"Coverage store '{store_name}' deleted")
+            return {'success': True, 'message': f'Coverage store {store_name} deleted'}
+        else:
+            logger.error(f"Failed to delete coverage store: {response_text(resp)}")
+            return {'success': False, 'message': f'Failed to delete: {response_text(resp)}'}
+
+    # --- Styles ---
+
+    def upload_style(self, style_name, sld_body, workspace=None):
+        """
+        Create or replace an SLD style in a workspace.
+
+        Args:
+            style_name: GeoServer style name
+            sld_body: SLD 1.0 XML document
+            workspace: GeoServer workspace
+
+        Returns:
+            dict with 'success' and 'message' keys
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        headers = {'Content-Type': 'application/vnd.ogc.sld+xml'}
+        body = sld_body.encode('utf-8')
+
+        # PUT replaces an existing style; a missing one is created with POST
+        url = f"{self.rest_url}/workspaces/{workspace}/styles/{style_name}"
+        resp = self.request('PUT', url, data=body, headers=headers)
+        if resp is not None and resp.status_code == 404:
+            resp = self.request(
+                'POST', f"{self.rest_url}/workspaces/{workspace}/styles",
+                params={'name': style_name}, data=body, headers=headers
+            )
+        if resp is None:
+            return {'success': False, 'message': 'GeoServer is unreachable'}
+
+        if resp.status_code in (200, 201):
+            logger.info(f"Style '{workspace}:{style_name}' uploaded")
+            return {'success': True, 'message': f'Style {style_name} uploaded'}
+        else:
+            logger.error(f"Failed to upload style: {response_text(resp)}")
+            return {'success': False, 'message': f'Failed to upload style: {response_text(resp)}'}
+
+    def assign_style(self, layer_name, style_name, workspace=None):
+        """
+        Make a workspace style the default style of a layer.
+
+        Args:
+            layer_name: Full layer name (workspace:layer)
+            style_name: Style name in the workspace
+        """
+        workspace = workspace or settings.GEOSERVER_WORKSPACE
+        data = {"layer": {"defaultStyle": {"name": f"{workspace}:{style_name}"}}}
+        resp = self.request('PUT', f"{self.rest_url}/layers/{layer_name}", json=data)
+        if resp is None:
+            return {'success': False, 'message': 'GeoServer is unreachable'}
+
         if resp.status_code in (200, 201):
-            return {'success': True, 'message': f'Layer {table_name} updated'}
+            logger.info(f"Style '{style_name}' assigned to '{layer_name}'")
+            return {'success': True, 'message': f'Style {style_name} assigned to {layer_name}'}
         else:
-            return {'success': False, 'message': f'Failed to update layer: {resp.text}'}
-    
-    # Create new layer
-    create_url = f"{get_base_url()}/workspaces/{workspace}/datastores/{store_name}/featuretypes"
-    data = {
-        "featureType": {
-            "name": table_name,
-            "nativeName": table_name,
-            "title": layer_title,
-            "enabled": True,
-            "srs": "EPSG:4326",
+            logger.error(f"Failed to assign style: {response_text(resp)}")
+            return {'success': False, 'message': f'Failed to assign style: {response_text(resp)}'}
+
+    # --- GeoWebCache ---
+
+    def seed_layer(self, layer_name, bbox, zoom_start, zoom_stop, seed_type='seed',
+                   threads=None, gridset=None, image_format=None):
+        """
+        Start a GeoWebCache seed, reseed or truncate job for a layer.
+
+        Args:
+            layer_name: Full layer name (workspace:layer)
+            bbox: dict with west/south/east/north in EPSG:4326, or None for the whole gridset
+            zoom_start, zoom_stop: Zoom level range
+            seed_type: 'seed', 'reseed' or 'truncate'
+            threads: Number of GWC seeding threads (GWC_SEED_THREADS by default)
+            gridset: GWC gridset id (GWC_GRIDSET by default)
+            image_format: Tile MIME type (GWC_SEED_FORMAT by default)
+
+        Returns:
+            dict with 'success' and 'message' keys
+        """
+        gridset = gridset or getattr(settings, 'GWC_GRIDSET', 'EPSG:900913')
+        seed_request = {
+            "name": layer_name,
+            "gridSetId": gridset,
+            "zoomStart": zoom_start,
+            "zoomStop": zoom_stop,
+            "format": image_format or getattr(settings, 'GWC_SEED_FORMAT', 'image/png'),
+            "type": seed_type,
+            "threadCount": threads or getattr(settings, 'GWC_SEED_THREADS', 2),
         }
-    }
-    
-    resp = requests.post(create_url, json=data, auth=get_auth())
-    
-    if resp.status_code in (200, 201):
-        logger.info(f"Layer '{table_name}' published successfully")
-        return {'success': True, 'message': f'Layer {table_name} published'}
-    else:
-        logger.error(f"Failed to publish layer: {resp.text}")
-        return {'success': False, 'message': f'Failed to publish: {resp.text}'}
+        if bbox:
+            if gridset in ('EPSG:900913', 'EPSG:3857'):
+                minx, miny = lonlat_to_mercator(bbox['west'], bbox['south'])
+                maxx, maxy = lonlat_to_mercator(bbox['east'], bbox['north'])
+            else:
+                minx, miny, maxx, maxy = bbox['west'], bbox['south'], bbox['east'], bbox['north']
+            seed_request["bounds"] = {"coords": {"double": [minx, miny, maxx, maxy]}}
+
+        resp = self.request('POST', f"{self.gwc_url}/seed/{layer_name}.json", json={"seedRequest": seed_request})
+        if resp is None:
+            return {'success': False, 'message': 'GeoServer is unreachable'}
+
+        if resp.status_code in (200, 201):
+            logger.info(f"GWC {seed_type} started for '{layer_name}' (z{zoom_start}-{zoom_stop})")
+            return {'success': True, 'message': f'{seed_type} started for {layer_name}'}
+        else:
+            logger.error(f"GWC {seed_type} failed: {resp.text}")
+            return {'success': False, 'message': f'GWC {seed_type} failed: {resp.text}'}
+
+    def get_seed_status(self, layer_name):
+        """
+        Get running GeoWebCache tasks for a layer.
+
+        Returns:
+            list of dicts with 'done', 'total', 'remaining' (seconds), 'task_id'
+            and 'status' (-1 aborted, 0 pending, 1 running, 2 done), or None on error
+        """
+        resp = self.request('GET', f"{self.gwc_url}/seed/{layer_name}.json")
+        if resp is None or resp.status_code != 200:
+            return None
+
+        tasks = []
+        for row in resp.json().get('long-array-array', []):
+            tasks.append({
+                'done': row[0],
+                'total': row[1],
+                'remaining': row[2],
+                'task_id': row[3],
+                'status': row[4],
+            })
+        return tasks
+
+    def truncate_layer_cache(self, layer_name):
+        """
+        Remove all cached tiles of a layer from GeoWebCache.
+        """
+        data = f"<truncateLayer><layerName>{layer_name}</layerName></truncateLayer>"
+        resp = self.request(
+            'POST', f"{self.gwc_url}/masstruncate",
+            data=data.encode('utf-8'), headers={'Content-Type': 'text/xml'}
+        )
+        if resp is None:
+            return {'success': False, 'message': 'GeoServer is unreachable'}
+
+        if resp.status_code in (200, 201):
+            logger.info(f"GWC cache truncated for '{layer_name}'")
+            return {'success': True, 'message': f'Cache truncated for {layer_name}'}
+        else:
+            logger.error(f"GWC truncate failed: {resp.text}")
+            return {'success': False, 'message': f'GWC truncate failed: {resp.text}'}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Get the shared GeoServerClient (one connection pool per process)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeoServerClient()
+    return _client
+
+
+def ensure_workspace_exists(workspace=None):
+    """
+    Ensure the workspace exists in GeoServer.
+    """
+    return get_client().ensure_workspace_exists(workspace)
+
+
+def ensure_datastore_exists(store_name='postgis', workspace=None):
+    """
+    Ensure PostGIS datastore exists in GeoServer.
+    """
+    return get_client().ensure_datastore_exists(store_name, workspace)
+
+
+def publish_postgis_layer(table_name, layer_title=None, workspace=None, store_name='postgis',
+                          check_store=True):
+    """
+    Publish a PostGIS table as a layer in GeoServer.
+    See GeoServerClient.publish_postgis_layer.
+    """
+    return get_client().publish_postgis_layer(table_name, layer_title, workspace, store_name, check_store)
+
+
+def publish_layers(layers, workspace=None, store_name='postgis'):
+    """
+    Publish many PostGIS tables with one workspace/datastore check.
+    See GeoServerClient.publish_layers.
+    """
+    return get_client().publish_layers(layers, workspace, store_name)
 
 
 def delete_layer(layer_name, workspace=None, store_name='postgis'):
     """
     Delete a layer from GeoServer.
     """
-    workspace = workspace or settings.GEOSERVER_WORKSPACE
-    
-    # Delete feature type
-    url = f"{get_base_url()}/workspaces/{workspace}/datastores/{store_name}/featuretypes/{layer_name}?recurse=true"
-    resp = requests.delete(url, auth=get_auth())
-    
-    if resp.status_code in (200, 204):
-        logger.info(f"Layer '{layer_name}' deleted")
-        return {'success': True, 'message': f'Layer {layer_name} deleted'}
-    else:
-        logger.error(f"Failed to delete layer: {resp.text}")
-        return {'success': False, 'message': f'Failed to delete: {resp.text}'}
+    return get_client().delete_layer(layer_name, workspace, store_name)
+
+
+def publish_geotiff_layer(store_name, file_path, layer_title=None, workspace=None):
+    """
+    Publish a GeoTIFF (COG) as a coverage store and layer in GeoServer.
+    """
+    return get_client().publish_geotiff_layer(store_name, file_path, layer_title, workspace)
+
+
+def delete_coverage_store(store_name, workspace=None):
+    """
+    Delete a coverage store (and its layers) from GeoServer.
+    """
+    return get_client().delete_coverage_store(store_name, workspace)
 
 
 def get_layer_info(layer_name, workspace=None):
     """
     Get layer information from GeoServer.
     """
-    workspace = workspace or settings.GEOSERVER_WORKSPACE
-    url = f"{get_base_url()}/workspaces/{workspace}/layers/{layer_name}.json"
-    
-    resp = requests.get(url, auth=get_auth())
-    
-    if resp.status_code == 200:
-        return resp.json()
-    return None
+    return get_client().get_layer_info(layer_name, workspace)
+
+
+def upload_style(style_name, sld_body, workspace=None):
+    """
+    Create or replace an SLD style in a workspace.
+    """
+    return get_client().upload_style(style_name, sld_body, workspace)
+
+
+def assign_style(layer_name, style_name, workspace=None):
+    """
+    Make a workspace style the default style of a layer.
+    """
+    return get_client().assign_style(layer_name, style_name, workspace)
+
+
+def seed_layer(layer_name, bbox, zoom_start, zoom_stop, seed_type='seed',
+               threads=None, gridset=None, image_format=None):
+    """
+    Start a GeoWebCache seed, reseed or truncate job for a layer.
+    """
+    return get_client().seed_layer(
+        layer_name, bbox, zoom_start, zoom_stop, seed_type, threads, gridset, image_format
+    )
+
+
+def get_seed_status(layer_name):
+    """
+    Get running GeoWebCache tasks for a layer.
+    """
+    return get_client().get_seed_status(layer_name)
+
+
+def truncate_layer_cache(layer_name):
+    """
+    Remove all cached tiles of a layer from GeoWebCache.
+    """
+    return get_client().truncate_layer_cache(layer_name)
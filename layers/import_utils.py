@@ -4,32 +4,43 @@ Uses ogr2ogr for importing vector data into PostGIS.
 """
 
 import os
+import hashlib
 import subprocess
 import tempfile
 import zipfile
 import shutil
+import time
 from pathlib import Path
 from django.conf import settings
-from django.db import connection
+from django.db import connection, transaction
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def extract_shapefile(zip_path, extract_dir):
+def extract_shapefiles(zip_path, extract_dir):
     """
-    Extract a zipped shapefile and return path to .shp file.
+    Extract a zipped archive and return paths to all .shp files in it.
     """
     with zipfile.ZipFile(zip_path, 'r') as zf:
         zf.extractall(extract_dir)
     
-    # Find .shp file
+    shp_files = []
     for root, dirs, files in os.walk(extract_dir):
         for f in files:
             if f.lower().endswith('.shp'):
-                return os.path.join(root, f)
+                shp_files.append(os.path.join(root, f))
     
-    raise ValueError("No .shp file found in archive")
+    if not shp_files:
+        raise ValueError("No .shp file found in archive")
+    return sorted(shp_files)
+
+
+def extract_shapefile(zip_path, extract_dir):
+    """
+    Extract a zipped shapefile and return path to .shp file.
+    """
+    return extract_shapefiles(zip_path, extract_dir)[0]
 
 
 def get_file_type(file_path):
@@ -52,17 +63,14 @@ def get_file_type(file_path):
         return 'unknown'
 
 
-def import_vector_to_postgis(source_path, table_name, srid=4326):
+def build_ogr2ogr_command(source_path, table_name, srid=4326, source_layer=None,
+                          mode='-overwrite', extra_args=None):
     """
-    Import vector data into PostGIS using ogr2ogr.
+    Build the ogr2ogr command line for loading a source into PostGIS.
     
     Args:
-        source_path: Path to source file (shapefile, geojson, etc.)
-        table_name: Name for the new PostGIS table
-        srid: Target SRID (default 4326)
-    
-    Returns:
-        dict with 'success', 'message', 'feature_count', 'geom_type'
+        mode: '-overwrite' (replace table) or '-append' (add to existing table)
+        extra_args: additional ogr2ogr arguments (e.g. -where, extra -lco)
     """
     db = settings.DATABASES['default']
     
@@ -81,9 +89,30 @@ def import_vector_to_postgis(source_path, table_name, srid=4326):
         '-lco', 'GEOMETRY_NAME=geom', # Geometry column name
         '-lco', 'FID=gid',            # Feature ID column
         '-lco', 'PRECISION=NO',       # Don't limit precision
-        '-overwrite',                 # Overwrite if exists
+        mode,                         # Overwrite or append
         '--config', 'PG_USE_COPY', 'YES',  # Use COPY for speed
     ]
+    cmd.extend(extra_args or [])
+    if source_layer:
+        cmd.append(source_layer)
+    return cmd
+
+
+def import_vector_to_postgis(source_path, table_name, srid=4326, source_layer=None):
+    """
+    Import vector data into PostGIS using ogr2ogr.
+    
+    Args:
+        source_path: Path to source file (shapefile, geojson, etc.)
+        table_name: Name for the new PostGIS table
+        srid: Target SRID (default 4326)
+        source_layer: Layer name inside a multi-layer source (GeoPackage)
+    
+    Returns:
+        dict with 'success', 'message', 'feature_count', 'geom_type'.
+        Count and geometry type are filled in later by analyze_table().
+    """
+    cmd = build_ogr2ogr_command(source_path, table_name, srid, source_layer)
     
     logger.info(f"Running ogr2ogr: {' '.join(cmd[:6])}...")
     
@@ -104,29 +133,13 @@ def import_vector_to_postgis(source_path, table_name, srid=4326):
                 'geom_type': None
             }
         
-        # Get feature count and geometry type
-        with connection.cursor() as cursor:
-            # Feature count
-            cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"')
-            feature_count = cursor.fetchone()[0]
-            
-            # Geometry type
-            cursor.execute(f'''
-                SELECT GeometryType(geom) 
-                FROM "{table_name}" 
-                WHERE geom IS NOT NULL 
-                LIMIT 1
-            ''')
-            row = cursor.fetchone()
-            geom_type = row[0] if row else 'UNKNOWN'
-        
-        logger.info(f"Imported {feature_count} features, type: {geom_type}")
+        logger.info(f"ogr2ogr finished for table '{table_name}'")
         
         return {
             'success': True,
-            'message': f"Successfully imported {feature_count} features",
-            'feature_count': feature_count,
-            'geom_type': geom_type
+            'message': f"Successfully imported into '{table_name}'",
+            'feature_count': 0,
+            'geom_type': None
         }
         
     except subprocess.TimeoutExpired:
@@ -146,6 +159,196 @@ def import_vector_to_postgis(source_path, table_name, srid=4326):
         }
 
 
+def get_source_feature_count(source_path, source_layer=None):
+    """Feature count of a vector source as reported by its OGR driver."""
+    from osgeo import ogr
+    
+    ds = ogr.Open(source_path)
+    if ds is None:
+        raise ValueError(f"Cannot open {source_path}")
+    layer = ds.GetLayerByName(source_layer) if source_layer else ds.GetLayer(0)
+    count = layer.GetFeatureCount()
+    ds = None
+    return count
+
+
+def get_source_fid_range(source_path, source_layer=None):
+    """
+    Get feature count and FID range of a vector source via OGR.
+    
+    Returns:
+        (feature_count, min_fid, max_fid)
+    """
+    from osgeo import ogr
+    
+    ds = ogr.Open(source_path)
+    if ds is None:
+        raise ValueError(f"Cannot open {source_path}")
+    layer = ds.GetLayerByName(source_layer) if source_layer else ds.GetLayer(0)
+    count = layer.GetFeatureCount()
+    
+    fid_column = layer.GetFIDColumn()
+    if fid_column:
+        # Databases (GeoPackage etc.): FIDs can be sparse, ask for the real range
+        sql = ds.ExecuteSQL(f'SELECT MIN("{fid_column}"), MAX("{fid_column}") FROM "{layer.GetName()}"')
+        feature = sql.GetNextFeature()
+        min_fid, max_fid = feature.GetField(0), feature.GetField(1)
+        ds.ReleaseResultSet(sql)
+    else:
+        # Files: FIDs are not always 0..count-1 (GeoJSON uses an integer
+        # "id" member as the FID), so read them with every field ignored
+        layer_defn = layer.GetLayerDefn()
+        layer.SetIgnoredFields(
+            [layer_defn.GetFieldDefn(i).GetName() for i in range(layer_defn.GetFieldCount())]
+            + ['OGR_GEOMETRY', 'OGR_STYLE']
+        )
+        min_fid = max_fid = None
+        layer.ResetReading()
+        for feature in layer:
+            fid = feature.GetFID()
+            min_fid = fid if min_fid is None else min(min_fid, fid)
+            max_fid = fid if max_fid is None else max(max_fid, fid)
+        if min_fid is None:
+            min_fid, max_fid = 0, -1
+    ds = None
+    return count, min_fid, max_fid
+
+
+def fid_partitions(min_fid, max_fid, parts):
+    """
+    Split an FID range into `parts` contiguous half-open ranges.
+    
+    Returns:
+        list of (start, stop) tuples
+    """
+    total = max_fid - min_fid + 1
+    step = max(1, -(-total // parts))
+    return [
+        (start, min(start + step, max_fid + 1))
+        for start in range(min_fid, max_fid + 1, step)
+    ]
+
+
+def import_vector_partitioned(source_path, table_name, processes=4, srid=4326, source_layer=None):
+    """
+    Import a very large vector source with several parallel ogr2ogr loaders.
+    
+    The source is split into ranges of its real FIDs (OGR -where on FID).
+    An empty UNLOGGED staging table without a spatial index is created
+    first, then every range is COPYed into it by its own ogr2ogr process.
+    If the staging row count matches the source, it is switched to LOGGED
+    and renamed over the target table; otherwise it is dropped. The
+    spatial index is built afterwards by the post-import stage.
+    
+    Args:
+        source_path: Path to source file
+        table_name: Name for the new PostGIS table
+        processes: Number of parallel ogr2ogr processes
+        srid: Target SRID (default 4326)
+        source_layer: Layer name inside a multi-layer source
+    
+    Returns:
+        dict with 'success', 'message', 'feature_count', 'geom_type',
+        'processes' and 'load_seconds'
+    """
+    staging = f'{table_name}__staging'
+    start = time.perf_counter()
+    
+    try:
+        count, min_fid, max_fid = get_source_fid_range(source_path, source_layer)
+        
+        # Step 1: empty unlogged staging table with the target schema
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {quote_ident(staging)}')
+        create_cmd = build_ogr2ogr_command(
+            source_path, staging, srid, source_layer,
+            extra_args=['-lco', 'UNLOGGED=ON', '-lco', 'SPATIAL_INDEX=NONE', '-where', 'FID < -1'],
+        )
+        result = subprocess.run(create_cmd, capture_output=True, text=True, timeout=300)
+        if result.returncode != 0:
+            raise RuntimeError(f"ogr2ogr error: {result.stderr}")
+        
+        # Step 2: parallel COPY loaders, one per FID range
+        ranges = fid_partitions(min_fid, max_fid, processes) if count > 0 else []
+        logger.info(f"Loading {count} features into '{staging}' with {len(ranges)} processes")
+        loaders = [
+            subprocess.Popen(
+                build_ogr2ogr_command(
+                    source_path, staging, srid, source_layer, mode='-append',
+                    extra_args=['-preserve_fid', '-where', f'FID >= {lo} AND FID < {hi}'],
+                ),
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+            )
+            for lo, hi in ranges
+        ]
+        errors = []
+        deadline = time.monotonic() + 300
+        for proc in loaders:
+            try:
+                _, stderr = proc.communicate(timeout=max(1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                for other in loaders:
+                    other.kill()
+                raise RuntimeError("Import timed out (>5 minutes)")
+            if proc.returncode != 0:
+                errors.append(stderr)
+        if errors:
+            raise RuntimeError(f"ogr2ogr error: {errors[0]}")
+        
+        # Never swap in a partial load
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {quote_ident(staging)}')
+            loaded = cursor.fetchone()[0]
+        if loaded != count:
+            raise RuntimeError(f"Loaded {loaded} of {count} features; staging table discarded")
+        
+        # Step 3: merge — make durable and swap in place of the target table
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {quote_ident(staging)} SET LOGGED')
+            cursor.execute(f'DROP TABLE IF EXISTS {quote_ident(table_name)} CASCADE')
+            cursor.execute(f'ALTER TABLE {quote_ident(staging)} RENAME TO {quote_ident(table_name)}')
+            cursor.execute(
+                f'ALTER INDEX IF EXISTS {quote_ident(staging + "_pkey")} '
+                f'RENAME TO {quote_ident(table_name + "_pkey")}'
+            )
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'gid'), COALESCE(MAX(gid), 1)) "
+                f"FROM {quote_ident(table_name)}",
+                [quote_ident(table_name)]
+            )
+    except subprocess.TimeoutExpired:
+        return {
+            'success': False,
+            'message': "Import timed out (>5 minutes)",
+            'feature_count': 0,
+            'geom_type': None
+        }
+    except Exception as e:
+        logger.exception("Partitioned import failed")
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {quote_ident(staging)}')
+        return {
+            'success': False,
+            'message': str(e),
+            'feature_count': 0,
+            'geom_type': None
+        }
+    
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Partitioned load of '{table_name}': {count} features, {len(ranges)} processes, "
+        f"{elapsed:.1f} s ({count / elapsed if elapsed else 0:.0f} features/s)"
+    )
+    return {
+        'success': True,
+        'message': f"Successfully imported into '{table_name}'",
+        'feature_count': 0,
+        'geom_type': None,
+        'processes': len(ranges),
+        'load_seconds': elapsed,
+    }
+
+
 def get_table_bbox(table_name):
     """
     Get bounding box of a PostGIS table.
@@ -206,13 +409,1010 @@ def get_table_columns(table_name):
     return columns
 
 
+def quote_ident(name):
+    """
+    Quote an SQL identifier (table or column name) for PostgreSQL.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Value patterns for type inference; leading zeros mark codes, not numbers
+INT_PATTERN = r'^-?(0|[1-9][0-9]*)$'
+FLOAT_PATTERN = r'^-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?$'
+ISO_DATE_PATTERN = r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$'
+DMY_DATE_PATTERN = r'^[0-9]{2}\.[0-9]{2}\.[0-9]{4}$'
+TRUE_VALUES = ('true', 't', 'yes', 'y', 'да')
+FALSE_VALUES = ('false', 'f', 'no', 'n', 'нет')
+
+# Magnitudes a real holds; casting anything else raises "value out of range"
+REAL_MIN = 1.18e-38
+REAL_MAX = 3.4e38
+
+TEXT_TYPES = ('character varying', 'text', 'character')
+NUMERIC_TYPES = ('integer', 'bigint', 'numeric', 'double precision')
+
+INTEGER_TYPES = [
+    ('smallint', -32768, 32767),
+    ('integer', -2147483648, 2147483647),
+    ('bigint', -9223372036854775808, 9223372036854775807),
+]
+
+# information_schema data_type -> LayerAttribute.data_type
+DATA_TYPE_MAP = {
+    'smallint': 'integer',
+    'integer': 'integer',
+    'bigint': 'integer',
+    'real': 'float',
+    'double precision': 'float',
+    'numeric': 'float',
+    'date': 'date',
+    'boolean': 'boolean',
+    'USER-DEFINED': 'category',
+}
+
+
+def sql_literal_list(values):
+    """Render strings as a comma-separated list of SQL literals."""
+    return ', '.join("'" + value.replace("'", "''") + "'" for value in values)
+
+
+def get_table_column_types(table_name):
+    """
+    List attribute columns of a table with their information_schema type.
+    
+    Returns:
+        list of (column_name, data_type) tuples, without gid and geom
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            AND table_name = %s
+            AND column_name NOT IN ('gid', 'geom')
+            ORDER BY ordinal_position
+        ''', [table_name])
+        return cursor.fetchall()
+
+
+def fits_real(expr):
+    """SQL condition: a float8 or numeric expression casts to real without error."""
+    return f'(abs({expr}) BETWEEN {REAL_MIN} AND {REAL_MAX} OR {expr} = 0)'
+
+
+def profile_columns(table_name):
+    """
+    Profile text and numeric columns of a table in a single scan.
+    
+    Text values are trimmed and empty strings count as NULL. For each
+    column the scan counts how many values look like integers, floats,
+    dates and booleans, along with value range, distinct count and length.
+    
+    Returns:
+        list of dicts with 'name', 'type' and the profile counters
+    """
+    columns = [
+        {'name': name, 'type': data_type}
+        for name, data_type in get_table_column_types(table_name)
+        if data_type in TEXT_TYPES or data_type in NUMERIC_TYPES
+    ]
+    if not columns:
+        return []
+    
+    true_false = sql_literal_list(TRUE_VALUES + FALSE_VALUES)
+    selects = []
+    for col in columns:
+        ident = quote_ident(col['name'])
+        if col['type'] in TEXT_TYPES:
+            v = f"NULLIF(btrim({ident}), '')"
+            col['keys'] = [
+                'non_null', 'ints', 'min', 'max', 'floats', 'lossy_real',
+                'iso_dates', 'dmy_dates', 'bools', 'distinct', 'avg_len', 'max_len',
+            ]
+            selects += [
+                f"COUNT({v})",
+                f"COUNT(*) FILTER (WHERE {v} ~ '{INT_PATTERN}')",
+                f"MIN(CASE WHEN {v} ~ '{INT_PATTERN}' THEN {v}::numeric END)",
+                f"MAX(CASE WHEN {v} ~ '{INT_PATTERN}' THEN {v}::numeric END)",
+                f"COUNT(*) FILTER (WHERE {v} ~ '{FLOAT_PATTERN}')",
+                # real keeps a value if it is in range and its shortest
+                # text form reads back equal
+                f"COUNT(CASE WHEN {v} ~ '{FLOAT_PATTERN}' THEN CASE WHEN {fits_real(f'{v}::numeric')} "
+                f"THEN NULLIF({v}::real::text::float8 = {v}::float8, true) ELSE true END END)",
+                f"COUNT(*) FILTER (WHERE {v} ~ '{ISO_DATE_PATTERN}')",
+                f"COUNT(*) FILTER (WHERE {v} ~ '{DMY_DATE_PATTERN}')",
+                f"COUNT(*) FILTER (WHERE lower({v}) IN ({true_false}))",
+                f"COUNT(DISTINCT {v})",
+                f"AVG(octet_length({v}))",
+                f"MAX(octet_length({v}))",
+            ]
+        else:
+            col['keys'] = ['non_null', 'min', 'max', 'fractional', 'lossy_real', 'distinct']
+            selects += [
+                f"COUNT({ident})",
+                f"MIN({ident})",
+                f"MAX({ident})",
+                f"COUNT(*) FILTER (WHERE {ident} <> trunc({ident}))",
+                f"COUNT(*) FILTER (WHERE CASE WHEN {fits_real(f'{ident}::float8')} "
+                f"THEN {ident}::real::text::float8 <> {ident}::float8 ELSE true END)",
+                f"COUNT(DISTINCT {ident})",
+            ]
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {", ".join(selects)} FROM {quote_ident(table_name)}')
+        row = list(cursor.fetchone())
+    
+    for col in columns:
+        keys = col.pop('keys')
+        col.update(zip(keys, row[:len(keys)]))
+        del row[:len(keys)]
+    return columns
+
+
+def integer_type(low, high):
+    """Narrowest integer type holding the range low..high, or None."""
+    for type_name, type_low, type_high in INTEGER_TYPES:
+        if type_low <= low and high <= type_high:
+            return type_name
+    return None
+
+
+def enum_type_name(table_name, column):
+    """Name of the enum type that dictionary-encodes a column."""
+    name = f'{table_name}__{column}'
+    if len(name.encode()) > 63:
+        digest = hashlib.md5(name.encode()).hexdigest()[:8]
+        name = name.encode()[:54].decode(errors='ignore') + '_' + digest
+    return name
+
+
+def infer_text_type(col):
+    """
+    LayerAttribute.data_type that every non-empty value of a profiled
+    text column reads as ('boolean', 'integer', 'float', 'date'), or None.
+    """
+    non_null = col['non_null']
+    if not non_null:
+        return None
+    if col['bools'] == non_null:
+        return 'boolean'
+    if col['ints'] == non_null:
+        return 'integer'
+    if col['floats'] == non_null:
+        return 'float'
+    if col['iso_dates'] == non_null or col['dmy_dates'] == non_null:
+        return 'date'
+    return None
+
+
+def plan_column_type(col, row_count, max_categories=100, convert_text=False):
+    """
+    Choose the narrowest type for a profiled column.
+    
+    Numeric columns are only narrowed where every value reads back the
+    same. Text columns holding numbers, dates or yes/no values are
+    converted only with convert_text, since that rewrites the values
+    ('да' -> true, '01.02.2020' -> 2020-02-01, '1.50' -> 1.5) that style
+    rules, popups and WFS clients match on.
+    
+    Returns:
+        (new_type, using_expression) or None to keep the column as is;
+        new_type 'enum' means dictionary encoding
+    """
+    ident = quote_ident(col['name'])
+    non_null = col['non_null']
+    if not non_null:
+        return None
+    
+    if col['type'] in NUMERIC_TYPES:
+        if not col['fractional']:
+            new_type = integer_type(col['min'], col['max'])
+            if new_type and new_type != col['type']:
+                return new_type, f'{ident}::{new_type}'
+            return None
+        if not col['lossy_real']:
+            return 'real', f'{ident}::real'
+        if col['type'] == 'numeric':
+            return 'double precision', f'{ident}::float8'
+        return None
+    
+    v = f"NULLIF(btrim({ident}), '')"
+    if convert_text:
+        if col['bools'] == non_null:
+            return 'boolean', f"lower({v}) IN ({sql_literal_list(TRUE_VALUES)})"
+        if col['ints'] == non_null:
+            new_type = integer_type(col['min'], col['max'])
+            return (new_type, f'{v}::{new_type}') if new_type else None
+        if col['floats'] == non_null:
+            if not col['lossy_real']:
+                return 'real', f'{v}::real'
+            return 'double precision', f'{v}::float8'
+        if col['iso_dates'] == non_null:
+            return 'date', f'{v}::date'
+        if col['dmy_dates'] == non_null:
+            return 'date', f"to_date({v}, 'DD.MM.YYYY')"
+    
+    # An enum value takes 4 bytes, so only repetitive strings longer
+    # than that are worth encoding
+    if (
+        row_count >= 1000
+        and col['distinct'] <= max_categories
+        and non_null >= 10 * col['distinct']
+        and col['avg_len'] > 4
+        and col['max_len'] <= 63
+    ):
+        return 'enum', v
+    return None
+
+
+def get_table_size(table_name):
+    """Total size of a table with its indexes and TOAST, in bytes."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_total_relation_size(to_regclass(%s))",
+            [f'public.{quote_ident(table_name)}']
+        )
+        return cursor.fetchone()[0] or 0
+
+
+def create_enum_type(cursor, table_name, column):
+    """
+    (Re)create the enum type for a column from its distinct values,
+    in sort order so ORDER BY on the column stays alphabetical.
+    
+    Returns:
+        quoted type name
+    """
+    type_name = quote_ident(enum_type_name(table_name, column))
+    value = f"NULLIF(btrim({quote_ident(column)}), '')"
+    cursor.execute(f'DROP TYPE IF EXISTS {type_name}')
+    cursor.execute(f'''
+        SELECT array_agg(DISTINCT {value} ORDER BY {value})
+        FROM {quote_ident(table_name)}
+        WHERE {value} IS NOT NULL
+    ''')
+    labels = cursor.fetchone()[0]
+    cursor.execute(f'CREATE TYPE {type_name} AS ENUM ({sql_literal_list(labels)})')
+    return type_name
+
+
+def alter_column_types(table_name, plans):
+    """
+    Convert columns in one ALTER TABLE, i.e. one table rewrite.
+    
+    Args:
+        plans: dict mapping column name to (new_type, using_expression)
+    """
+    clauses = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name, (new_type, using) in plans.items():
+            if new_type == 'enum':
+                new_type = create_enum_type(cursor, table_name, name)
+                using = f'{using}::{new_type}'
+            clauses.append(f'ALTER COLUMN {quote_ident(name)} TYPE {new_type} USING {using}')
+        cursor.execute(f'ALTER TABLE {quote_ident(table_name)} {", ".join(clauses)}')
+
+
+def tighten_column_types(table_name, convert_text=False, dict_encode=False, max_categories=100, keep=()):
+    """
+    Convert imported columns to the narrowest type their values allow.
+    
+    With PRECISION=NO ogr2ogr creates every field as varchar, integer,
+    bigint or float8. Numeric columns become smallint/integer/bigint or
+    real when no value changes; with convert_text, text columns whose
+    every non-empty value casts cleanly become integer, real/double
+    precision, date or boolean; with dict_encode, repetitive text is
+    dictionary-encoded as an enum type. Columns in keep (e.g. those
+    style rules match on) are left alone. All conversions run as one
+    ALTER TABLE; if that fails (e.g. a date-shaped value that is not a
+    valid date), the columns are converted one by one and the failing
+    ones are left as they are.
+    
+    Returns:
+        dict with 'converted' (column -> new type), 'inferred' (text
+        column -> infer_text_type) for all text columns whose values
+        read as another type, 'size_before' and 'size_after' in bytes
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {quote_ident(table_name)}')
+        row_count = cursor.fetchone()[0]
+    
+    plans = {}
+    inferred = {}
+    for col in profile_columns(table_name):
+        if col['type'] in TEXT_TYPES:
+            data_type = infer_text_type(col)
+            if data_type:
+                inferred[col['name']] = data_type
+        if col['name'] in keep:
+            continue
+        plan = plan_column_type(col, row_count, max_categories, convert_text)
+        if plan and (plan[0] != 'enum' or dict_encode):
+            plans[col['name']] = plan
+    
+    if not plans:
+        return {'converted': {}, 'inferred': inferred, 'size_before': None, 'size_after': None}
+    
+    size_before = get_table_size(table_name)
+    try:
+        alter_column_types(table_name, plans)
+        converted = plans
+    except Exception as e:
+        logger.warning(f"Type conversion of '{table_name}' failed, retrying per column: {e}")
+        converted = {}
+        for name, plan in plans.items():
+            try:
+                alter_column_types(table_name, {name: plan})
+                converted[name] = plan
+            except Exception as e:
+                logger.warning(f"Column '{table_name}.{name}' kept as is: {e}")
+    size_after = get_table_size(table_name)
+    
+    converted = {name: new_type for name, (new_type, _) in converted.items()}
+    if converted:
+        logger.info(
+            f"Tightened {len(converted)} columns of '{table_name}' "
+            f"({size_before // 1024} KB -> {size_after // 1024} KB): "
+            + ", ".join(f"{name} -> {new_type}" for name, new_type in converted.items())
+        )
+    return {
+        'converted': converted, 'inferred': inferred,
+        'size_before': size_before, 'size_after': size_after,
+    }
+
+
+def get_table_enum_types(table_name):
+    """Enum types used by the columns of a table."""
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT DISTINCT t.typname
+            FROM pg_attribute a
+            JOIN pg_type t ON t.oid = a.atttypid
+            WHERE a.attrelid = to_regclass(%s) AND t.typtype = 'e'
+        ''', [f'public.{quote_ident(table_name)}'])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def column_data_type(col, max_categories=100):
+    """
+    LayerAttribute.data_type for an analyzed column: the type family of
+    its SQL type, with repetitive text reported as 'category'.
+    """
+    data_type = DATA_TYPE_MAP.get(col['type'])
+    if data_type:
+        return data_type
+    if col['non_null'] and col['distinct'] <= max_categories and col['non_null'] >= 2 * col['distinct']:
+        return 'category'
+    return 'text'
+
+
+def analyze_table(table_name):
+    """
+    Collect layer metadata from an imported table in a single scan.
+    
+    Replaces the separate COUNT(*), GeometryType, ST_Extent and
+    information_schema round trips: the column list is read from the
+    catalog, then one aggregate query returns feature count, extent,
+    distinct geometry types, SRID and per-column profile.
+    
+    Returns:
+        dict with 'feature_count', 'geom_type', 'geom_types', 'srid',
+        'bbox' and 'columns' (name, type, non_null, distinct, data_type),
+        or None
+    """
+    try:
+        columns = [
+            {'name': name, 'type': data_type}
+            for name, data_type in get_table_column_types(table_name)
+        ]
+        with connection.cursor() as cursor:
+            selects = [
+                'COUNT(*)',
+                'ST_XMin(ST_Extent(geom))',
+                'ST_YMin(ST_Extent(geom))',
+                'ST_XMax(ST_Extent(geom))',
+                'ST_YMax(ST_Extent(geom))',
+                'array_remove(array_agg(DISTINCT GeometryType(geom)), NULL)',
+                'MAX(ST_SRID(geom))',
+            ]
+            for col in columns:
+                ident = quote_ident(col['name'])
+                selects.append(f'COUNT({ident})')
+                selects.append(f'COUNT(DISTINCT {ident})')
+            
+            cursor.execute(f'SELECT {", ".join(selects)} FROM {quote_ident(table_name)}')
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.error(f"Failed to analyze table '{table_name}': {e}")
+        return None
+    
+    feature_count, west, south, east, north, geom_types, srid = row[:7]
+    geom_types = sorted(geom_types or [])
+    
+    max_categories = getattr(settings, 'LAYER_CATEGORY_MAX_VALUES', 100)
+    for i, col in enumerate(columns):
+        col['non_null'] = row[7 + 2 * i]
+        col['distinct'] = row[8 + 2 * i]
+        col['data_type'] = column_data_type(col, max_categories)
+    
+    bbox = None
+    if west is not None:
+        bbox = {'west': west, 'south': south, 'east': east, 'north': north}
+    
+    if len(geom_types) == 1:
+        geom_type = geom_types[0]
+    elif geom_types:
+        geom_type = 'GEOMETRY'
+    else:
+        geom_type = 'UNKNOWN'
+    
+    return {
+        'feature_count': feature_count,
+        'geom_type': geom_type,
+        'geom_types': geom_types,
+        'srid': srid,
+        'bbox': bbox,
+        'columns': columns,
+    }
+
+
+def get_spatial_index(table_name, column='geom'):
+    """
+    Return the name of a GiST index on the geometry column, or None.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT i.relname
+            FROM pg_index x
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_am am ON am.oid = i.relam
+            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ANY(x.indkey)
+            WHERE t.relname = %s AND a.attname = %s AND am.amname = 'gist'
+            LIMIT 1
+        ''', [table_name, column])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def optimize_table(table_name):
+    """
+    Physically optimize an imported table for bbox queries.
+    
+    Makes sure a GiST index exists on geom, CLUSTERs the table on it so
+    spatially close features sit on neighbouring pages, then runs ANALYZE
+    to refresh planner statistics.
+    
+    Returns:
+        name of the spatial index, or None on failure
+    """
+    try:
+        index_name = get_spatial_index(table_name)
+        with connection.cursor() as cursor:
+            if not index_name:
+                index_name = f'{table_name}_geom_gist'
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {quote_ident(index_name)} '
+                    f'ON {quote_ident(table_name)} USING GIST (geom)'
+                )
+                logger.info(f"Created spatial index '{index_name}'")
+            cursor.execute(f'CLUSTER {quote_ident(table_name)} USING {quote_ident(index_name)}')
+            cursor.execute(f'ANALYZE {quote_ident(table_name)}')
+        logger.info(f"Table '{table_name}' clustered on '{index_name}' and analyzed")
+        return index_name
+    except Exception as e:
+        logger.error(f"Failed to optimize table '{table_name}': {e}")
+        return None
+
+
+def post_import_stage(table_name):
+    """
+    Post-import stage: single-scan metadata collection followed by
+    index/CLUSTER/ANALYZE.
+    
+    Returns:
+        dict from analyze_table() plus 'spatial_index', or None
+    """
+    info = analyze_table(table_name)
+    if info is None:
+        return None
+    info['spatial_index'] = optimize_table(table_name)
+    return info
+
+
+def subdivided_table_name(table_name):
+    """Name of the ST_Subdivide companion table for a layer table."""
+    return f'{table_name}_subdivided'
+
+
+def table_exists(table_name):
+    """Check whether a table exists in the public schema."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [f'public.{quote_ident(table_name)}'])
+        return cursor.fetchone()[0]
+
+
+def get_vertex_stats(table_name):
+    """
+    Get vertex statistics for the geometries of a table.
+    
+    Returns:
+        dict with 'total', 'max', 'avg' and 'rows'
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT COALESCE(SUM(ST_NPoints(geom)), 0),
+                   COALESCE(MAX(ST_NPoints(geom)), 0),
+                   COALESCE(AVG(ST_NPoints(geom)), 0),
+                   COUNT(*)
+            FROM {quote_ident(table_name)}
+        ''')
+        row = cursor.fetchone()
+    return {'total': int(row[0]), 'max': int(row[1]), 'avg': float(row[2]), 'rows': row[3]}
+
+
+def repair_geometries(table_name, repair=True):
+    """
+    Report and optionally repair invalid geometries with ST_MakeValid.
+    
+    Repaired geometries are reduced back to the dimension of the original
+    (ST_MakeValid may return a collection) and kept as multi-geometries
+    to match the PROMOTE_TO_MULTI column type.
+    
+    Returns:
+        dict with 'invalid', 'repaired' and 'reasons' (up to 10 samples)
+    """
+    table = quote_ident(table_name)
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT gid, ST_IsValidReason(geom)
+            FROM {table}
+            WHERE geom IS NOT NULL AND NOT ST_IsValid(geom)
+        ''')
+        invalid = cursor.fetchall()
+        
+        repaired = 0
+        if invalid and repair:
+            cursor.execute(f'''
+                UPDATE {table}
+                SET geom = ST_Multi(ST_CollectionExtract(ST_MakeValid(geom), ST_Dimension(geom) + 1))
+                WHERE geom IS NOT NULL AND NOT ST_IsValid(geom)
+            ''')
+            repaired = cursor.rowcount
+    
+    for gid, reason in invalid[:10]:
+        logger.warning(f"Invalid geometry in '{table_name}' gid={gid}: {reason}")
+    if invalid:
+        logger.info(f"Table '{table_name}': {len(invalid)} invalid geometries, {repaired} repaired")
+    
+    return {
+        'invalid': len(invalid),
+        'repaired': repaired,
+        'reasons': [reason for _, reason in invalid[:10]],
+    }
+
+
+def drop_subdivided_table(table_name):
+    """Drop the subdivided companion of a layer table, if any."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {quote_ident(subdivided_table_name(table_name))}')
+
+
+def create_subdivided_table(table_name, max_vertices=256):
+    """
+    Create an ST_Subdivide companion table keyed back to gid.
+    
+    Every geometry is split into parts of at most max_vertices vertices,
+    so spatial predicates (subdivided_filter) test small, tightly indexed
+    pieces instead of one huge polygon.
+    
+    Returns:
+        name of the companion table
+    """
+    sub_table = subdivided_table_name(table_name)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {quote_ident(sub_table)}')
+        cursor.execute(f'''
+            CREATE TABLE {quote_ident(sub_table)} AS
+            SELECT gid, ST_Subdivide(geom, %s) AS geom
+            FROM {quote_ident(table_name)}
+            WHERE geom IS NOT NULL
+        ''', [max_vertices])
+        cursor.execute(
+            f'CREATE INDEX {quote_ident(sub_table + "_geom_gist")} '
+            f'ON {quote_ident(sub_table)} USING GIST (geom)'
+        )
+        cursor.execute(
+            f'CREATE INDEX {quote_ident(sub_table + "_gid_idx")} '
+            f'ON {quote_ident(sub_table)} (gid)'
+        )
+        cursor.execute(f'ANALYZE {quote_ident(sub_table)}')
+    return sub_table
+
+
+def get_query_table(table_name):
+    """
+    Table to use for spatial predicates against a layer:
+    the subdivided companion if it exists, otherwise the layer table.
+    """
+    sub_table = subdivided_table_name(table_name)
+    return sub_table if table_exists(sub_table) else table_name
+
+
+def subdivided_filter(table_name, envelope, alias=None, exact=False):
+    """
+    SQL condition keeping the features of a layer table whose subdivided
+    parts overlap (with exact, intersect) an envelope. Huge geometries
+    whose bbox merely overlaps the envelope are dropped by a few index
+    probes on small parts instead of a test on the whole geometry.
+    
+    Args:
+        table_name: Layer table
+        envelope: EPSG:4326 SQL geometry expression
+        alias: Alias of the layer table in the query (default: its name)
+        exact: Use ST_Intersects, not only the bbox overlap
+    
+    Returns:
+        condition string, or None if the layer has no subdivided companion
+    """
+    sub_table = subdivided_table_name(table_name)
+    if not table_exists(sub_table):
+        return None
+    outer = alias or quote_ident(table_name)
+    condition = f's.geom && {envelope}'
+    if exact:
+        condition += f' AND ST_Intersects(s.geom, {envelope})'
+    return f'EXISTS (SELECT 1 FROM {quote_ident(sub_table)} s WHERE s.gid = {outer}.gid AND {condition})'
+
+
+def intersecting_feature_ids(table_name, bbox, srid=4326):
+    """
+    Get gids of features intersecting a bbox (west, south, east, north).
+    
+    Uses the subdivided companion table when available.
+    """
+    from .query_advisor import timed_execute
+    
+    query_table = get_query_table(table_name)
+    with connection.cursor() as cursor:
+        timed_execute(cursor, table_name, f'''
+            SELECT DISTINCT gid
+            FROM {quote_ident(query_table)}
+            WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, %s)
+            AND ST_Intersects(geom, ST_MakeEnvelope(%s, %s, %s, %s, %s))
+        ''', [*bbox, srid, *bbox, srid], [('geom', 'bbox')], 'bbox')
+        return [row[0] for row in cursor.fetchall()]
+
+
+# Attributes preferred as a feature's label in the admin picker
+LABEL_FIELDS = ('name1', 'Name', 'name', 'title')
+
+
+def search_features(table_name, query='', field=None, bbox=None, limit=20):
+    """
+    Find features of a layer table for the admin feature picker.
+    
+    The query matches a gid exactly, or a substring of one attribute
+    (or of every text attribute); the bbox filter keeps features that
+    intersect it, tested on the subdivided parts when the layer has them.
+    Rows are walked in gid order, so LIMIT stops the scan early.
+    
+    Args:
+        table_name: PostGIS table
+        query: Search text
+        field: Attribute to search in (default: all text attributes)
+        bbox: (west, south, east, north) in EPSG:4326, optional
+        limit: Maximum number of results
+    
+    Returns:
+        list of (gid, label) tuples
+    """
+    from .query_advisor import timed_execute
+    
+    columns = dict(get_table_column_types(table_name))
+    text_columns = [
+        name for name, data_type in columns.items()
+        if data_type in TEXT_TYPES or data_type == 'USER-DEFINED'
+    ]
+    label = next((name for name in LABEL_FIELDS if name in columns), None)
+    if label is None and text_columns:
+        label = text_columns[0]
+    label_sql = f'{quote_ident(label)}::text' if label else 'NULL'
+    
+    conditions = []
+    params = []
+    filters = []
+    query = (query or '').strip()
+    if query:
+        if field:
+            if field not in columns:
+                raise ValueError(f"Field '{field}' not found in '{table_name}'")
+            search_columns = [field]
+        else:
+            search_columns = text_columns
+        matches = [f'{quote_ident(name)}::text ILIKE %s' for name in search_columns]
+        params.extend([f'%{query}%'] * len(matches))
+        filters.extend((name, 'like') for name in search_columns)
+        if query.isdigit():
+            matches.append('gid = %s')
+            params.append(int(query))
+        conditions.append(f"({' OR '.join(matches) or 'FALSE'})")
+    if bbox:
+        envelope = 'ST_MakeEnvelope(%s, %s, %s, %s, 4326)'
+        pieces = subdivided_filter(table_name, envelope, exact=True)
+        conditions.append(f'geom && {envelope}')
+        conditions.append(pieces or f'ST_Intersects(geom, {envelope})')
+        params.extend([*bbox, *bbox, *bbox] if pieces else [*bbox, *bbox])
+        filters.append(('geom', 'bbox'))
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    with connection.cursor() as cursor:
+        timed_execute(cursor, table_name, f'''
+            SELECT gid, {label_sql}
+            FROM {quote_ident(table_name)}
+            {where}
+            ORDER BY gid
+            LIMIT %s
+        ''', [*params, limit], filters, 'search')
+        return cursor.fetchall()
+
+
+def time_bbox_query(table_name, bbox, srid=4326):
+    """Time a bbox intersection query against a table, in seconds."""
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT COUNT(DISTINCT gid)
+            FROM {quote_ident(table_name)}
+            WHERE ST_Intersects(geom, ST_MakeEnvelope(%s, %s, %s, %s, %s))
+        ''', [*bbox, srid])
+        cursor.fetchone()
+    return time.perf_counter() - start
+
+
+def reference_bbox(bbox):
+    """
+    Reference bbox for benchmarks: LAYER_REFERENCE_BBOX setting if set,
+    otherwise the central quarter of the layer extent.
+    """
+    ref = getattr(settings, 'LAYER_REFERENCE_BBOX', None)
+    if ref:
+        return tuple(ref)
+    dx = (bbox['east'] - bbox['west']) / 4
+    dy = (bbox['north'] - bbox['south']) / 4
+    return (bbox['west'] + dx, bbox['south'] + dy, bbox['east'] - dx, bbox['north'] - dy)
+
+
+def subdivide_stage(table_name, bbox, max_vertices=256):
+    """
+    Create the subdivided companion table for heavy geometries and log
+    vertex statistics and the bbox query speedup.
+    
+    The companion is only created when some geometry exceeds
+    max_vertices; otherwise any stale companion is dropped.
+    
+    Returns:
+        dict with 'subdivided_table', 'vertices_before', 'vertices_after'
+        and 'speedup', or None if subdivision was not needed
+    """
+    sub_table = subdivided_table_name(table_name)
+    before = get_vertex_stats(table_name)
+    
+    if before['max'] <= max_vertices or not bbox:
+        drop_subdivided_table(table_name)
+        return None
+    
+    create_subdivided_table(table_name, max_vertices)
+    after = get_vertex_stats(sub_table)
+    
+    ref = reference_bbox(bbox)
+    t_full = time_bbox_query(table_name, ref)
+    t_sub = time_bbox_query(sub_table, ref)
+    speedup = t_full / t_sub if t_sub > 0 else None
+    
+    logger.info(
+        f"Subdivided '{table_name}': {before['rows']} rows / max {before['max']} "
+        f"/ avg {before['avg']:.0f} vertices -> {after['rows']} rows / max {after['max']} "
+        f"/ avg {after['avg']:.0f} vertices"
+    )
+    logger.info(
+        f"Reference bbox query: {t_full * 1000:.1f} ms -> {t_sub * 1000:.1f} ms"
+        + (f" ({speedup:.1f}x)" if speedup else "")
+    )
+    
+    return {
+        'subdivided_table': sub_table,
+        'vertices_before': before,
+        'vertices_after': after,
+        'speedup': speedup,
+    }
+
+
+MERCATOR_SRID = 3857
+# Semi-major axis of the Web Mercator sphere, metres
+MERCATOR_RADIUS = 6378137
+# Web Mercator is undefined beyond these latitudes
+MERCATOR_MAX_LAT = 85.05112878
+
+
+def mercator_table_name(table_name):
+    """Name of the EPSG:3857 companion table for a layer table."""
+    return f'{table_name}_3857'
+
+
+def create_mercator_table(table_name):
+    """
+    Create an EPSG:3857 copy of the layer geometries keyed by gid.
+    
+    Tile, clustering and measurement queries read geometries from here
+    and skip the per-feature ST_Transform. A separate table (rather than
+    a second geometry column) keeps the GeoServer feature type and WFS
+    output unchanged. Features outside the Web Mercator latitude range
+    are left out.
+    
+    Returns:
+        name of the companion table
+    """
+    merc_table = quote_ident(mercator_table_name(table_name))
+    index_name = quote_ident(mercator_table_name(table_name) + '_geom_gist')
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {merc_table}')
+        cursor.execute(f'''
+            CREATE TABLE {merc_table} AS
+            SELECT gid, ST_Transform(geom, {MERCATOR_SRID}) AS geom
+            FROM {quote_ident(table_name)}
+            WHERE geom IS NOT NULL
+            AND ST_YMin(geom) > -%s AND ST_YMax(geom) < %s
+        ''', [MERCATOR_MAX_LAT, MERCATOR_MAX_LAT])
+        cursor.execute(f'ALTER TABLE {merc_table} ADD PRIMARY KEY (gid)')
+        cursor.execute(f'CREATE INDEX {index_name} ON {merc_table} USING GIST (geom)')
+        cursor.execute(f'CLUSTER {merc_table} USING {index_name}')
+        cursor.execute(f'ANALYZE {merc_table}')
+    return mercator_table_name(table_name)
+
+
+def mercator_source(table_name, alias='t', use_companion=True):
+    """
+    SQL pieces for reading a layer's geometries in EPSG:3857.
+    
+    Uses the companion table when it exists (and use_companion is set),
+    otherwise transforms on the fly. The bbox filter expects an
+    EPSG:3857 envelope.
+    
+    Returns:
+        dict with 'from' (FROM clause, layer table aliased as alias),
+        'geom' (EPSG:3857 geometry expression), 'filter' (format string
+        with an {envelope} placeholder) and 'native' (bool)
+    """
+    table = f'{quote_ident(table_name)} {alias}'
+    merc_table = mercator_table_name(table_name)
+    if use_companion and table_exists(merc_table):
+        return {
+            'from': f'{table} LEFT JOIN {quote_ident(merc_table)} m ON m.gid = {alias}.gid',
+            'geom': 'm.geom',
+            'filter': 'm.geom && {envelope}',
+            'native': True,
+        }
+    return {
+        'from': table,
+        'geom': f'ST_Transform({alias}.geom, {MERCATOR_SRID})',
+        'filter': f'{alias}.geom && ST_Transform({{envelope}}, 4326)',
+        'native': False,
+    }
+
+
+def mercator_scale_sql(geom_sql):
+    """
+    Web Mercator scale factor at a geometry's centroid, as SQL.
+    
+    Mercator stretches distances by 1/cos(lat); from the projected y,
+    cos(lat) = 1 / cosh(y / R).
+    """
+    return f'cosh(ST_Y(ST_Centroid({geom_sql})) / {MERCATOR_RADIUS})'
+
+
+def area_sql(geom_sql):
+    """Ground area in square metres of an EPSG:3857 geometry, as SQL."""
+    return f'(ST_Area({geom_sql}) / power({mercator_scale_sql(geom_sql)}, 2))'
+
+
+def length_sql(geom_sql):
+    """Ground length in metres of an EPSG:3857 geometry, as SQL."""
+    return f'(ST_Length({geom_sql}) / {mercator_scale_sql(geom_sql)})'
+
+
+def category_stats(table_name, field, values=None, area=False, length=False):
+    """
+    Feature count and optional area/length sums per value of a field,
+    in one GROUP BY query over the EPSG:3857 geometries.
+    
+    Args:
+        table_name: Layer table
+        field: Column to group by (values compared as text)
+        values: Only aggregate these values (all values if None)
+        area: Sum ground area in square metres
+        length: Sum ground length in metres
+    
+    Returns:
+        dict mapping value (text) to (count, area, length)
+    """
+    from .query_advisor import timed_execute
+    
+    source = mercator_source(table_name)
+    key = f't.{quote_ident(field)}::text'
+    selects = [
+        key,
+        'COUNT(*)',
+        f"SUM({area_sql(source['geom'])})" if area else 'NULL',
+        f"SUM({length_sql(source['geom'])})" if length else 'NULL',
+    ]
+    sql = f'SELECT {", ".join(selects)} FROM {source["from"]}'
+    params = []
+    filters = []
+    if values is not None:
+        sql += f' WHERE {key} = ANY(%s)'
+        params.append(list(values))
+        filters.append((field, 'text'))
+    sql += ' GROUP BY 1'
+    
+    with connection.cursor() as cursor:
+        timed_execute(cursor, table_name, sql, params, filters, 'legend')
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+
+def range_stats(table_name, field, ranges, area=False, length=False):
+    """
+    Feature count and optional area/length sums per numeric range
+    (low <= value < high, None for an open end), in one scan.
+    
+    Returns:
+        list of (count, area, length), one per range
+    """
+    source = mercator_source(table_name)
+    value = f't.{quote_ident(field)}'
+    selects = []
+    params = []
+    for low, high in ranges:
+        conditions = []
+        bounds = []
+        if low is not None:
+            conditions.append(f'{value} >= %s')
+            bounds.append(low)
+        if high is not None:
+            conditions.append(f'{value} < %s')
+            bounds.append(high)
+        condition = ' AND '.join(conditions) or 'true'
+        selects.append(f'COUNT(*) FILTER (WHERE {condition})')
+        params += bounds
+        if area:
+            selects.append(f"SUM({area_sql(source['geom'])}) FILTER (WHERE {condition})")
+            params += bounds
+        else:
+            selects.append('NULL')
+        if length:
+            selects.append(f"SUM({length_sql(source['geom'])}) FILTER (WHERE {condition})")
+            params += bounds
+        else:
+            selects.append('NULL')
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {", ".join(selects)} FROM {source["from"]}', params)
+        row = cursor.fetchone()
+    return [tuple(row[i:i + 3]) for i in range(0, len(row), 3)]
+
+
 def drop_table(table_name):
     """
     Drop a PostGIS table.
     """
     try:
+        enum_types = get_table_enum_types(table_name)
         with connection.cursor() as cursor:
             cursor.execute(f'DROP TABLE IF EXISTS "{table_name}" CASCADE')
+            cursor.execute(f'DROP TABLE IF EXISTS "{subdivided_table_name(table_name)}"')
+            cursor.execute(f'DROP TABLE IF EXISTS "{mercator_table_name(table_name)}"')
+            for type_name in enum_types:
+                cursor.execute(f'DROP TYPE IF EXISTS {quote_ident(type_name)}')
         logger.info(f"Table '{table_name}' dropped")
         return True
     except Exception as e:
@@ -220,11 +1420,213 @@ def drop_table(table_name):
         return False
 
 
-def import_layer_file(file_path, table_name):
+def list_source_layers(file_path, work_dir):
+    """
+    Enumerate the vector sublayers of a multi-layer source.
+    
+    A zip is extracted once into work_dir and every .shp becomes a
+    sublayer; a GeoPackage is opened once with OGR and every spatial
+    table becomes a sublayer.
+    
+    Returns:
+        list of dicts with 'name', 'source_path', 'source_layer'
+        (OGR layer name or None) and 'feature_count'
+    """
+    from osgeo import ogr
+    
+    file_type = get_file_type(file_path)
+    
+    if file_type == 'shapefile_zip':
+        # One shapefile per sublayer
+        sources = [(path, False) for path in extract_shapefiles(file_path, work_dir)]
+    elif file_type == 'geopackage':
+        # One GeoPackage table per sublayer
+        sources = [(file_path, True)]
+    else:
+        raise ValueError(f"Unsupported multi-layer source: {Path(file_path).suffix}")
+    
+    sublayers = []
+    for source_path, by_layer_name in sources:
+        ds = ogr.Open(source_path)
+        if ds is None:
+            raise ValueError(f"Cannot open {source_path}")
+        for i in range(ds.GetLayerCount()):
+            ogr_layer = ds.GetLayerByIndex(i)
+            if ogr_layer.GetGeomType() == ogr.wkbNone:
+                continue
+            sublayers.append({
+                'name': ogr_layer.GetName() if by_layer_name else Path(source_path).stem,
+                'source_path': source_path,
+                'source_layer': ogr_layer.GetName() if by_layer_name else None,
+                'feature_count': ogr_layer.GetFeatureCount(),
+            })
+        ds = None
+    
+    logger.info(f"Found {len(sublayers)} sublayers in {Path(file_path).name}")
+    return sublayers
+
+
+def import_source(source_path, table_name, source_layer=None, layer_id=None):
+    """
+    Import one vector source (optionally one layer of it) into PostGIS
+    and run the post-import stages.
+    
+    Args:
+        layer_id: Layer the table belongs to; the columns its style rules
+            match on keep their type
+    
+    Returns:
+        dict with import results
+    """
+    result = None
+    threshold = getattr(settings, 'LAYER_PARTITIONED_THRESHOLD', 500000)
+    processes = getattr(settings, 'LAYER_PARTITIONED_PROCESSES', 4)
+    if threshold and processes > 1:
+        try:
+            count = get_source_feature_count(source_path, source_layer)
+        except Exception as e:
+            logger.warning(f"Cannot count features of {source_path}: {e}")
+            count = 0
+        if count >= threshold:
+            from .locks import extra_import_slots
+            
+            # The caller holds one import slot; every extra loader takes
+            # another, so LAYER_IMPORT_CONCURRENCY bounds loaders, not jobs
+            with extra_import_slots(processes - 1) as extra:
+                if extra:
+                    result = import_vector_partitioned(
+                        source_path, table_name, 1 + extra, source_layer=source_layer
+                    )
+    if result is None:
+        result = import_vector_to_postgis(source_path, table_name, source_layer=source_layer)
+    
+    # Validate and repair geometries
+    if result['success'] and getattr(settings, 'LAYER_IMPORT_REPAIR_GEOMETRY', True):
+        try:
+            result['validation'] = repair_geometries(table_name)
+        except Exception as e:
+            logger.error(f"Geometry validation failed for '{table_name}': {e}")
+    
+    # Narrow column types (before CLUSTER rewrites the table anyway),
+    # keeping the columns that style rules of the layer match on
+    if result['success'] and getattr(settings, 'LAYER_IMPORT_TIGHTEN_TYPES', True):
+        from .models import LayerStyle
+        
+        try:
+            styled = set()
+            if layer_id:
+                styled = set(
+                    LayerStyle.objects.filter(layer_id=layer_id)
+                    .values_list('attribute_field', flat=True)
+                )
+            result['type_tightening'] = tighten_column_types(
+                table_name,
+                convert_text=getattr(settings, 'LAYER_IMPORT_TIGHTEN_TEXT', False),
+                dict_encode=getattr(settings, 'LAYER_IMPORT_DICT_ENCODE', True),
+                max_categories=getattr(settings, 'LAYER_CATEGORY_MAX_VALUES', 100),
+                keep=styled,
+            )
+        except Exception as e:
+            logger.error(f"Type tightening failed for '{table_name}': {e}")
+    
+    # Collect metadata and optimize table layout
+    if result['success']:
+        info = post_import_stage(table_name)
+        if info is None:
+            result['success'] = False
+            result['message'] = f"Failed to analyze imported table '{table_name}'"
+            return result
+        result.update(info)
+        # Text columns left as text still report the type their values read as
+        inferred = result.get('type_tightening', {}).get('inferred', {})
+        for col in result['columns']:
+            if col['data_type'] == 'text' and col['name'] in inferred:
+                col['data_type'] = inferred[col['name']]
+        result['message'] = f"Successfully imported {info['feature_count']} features"
+        logger.info(
+            f"Imported {info['feature_count']} features, "
+            f"types: {', '.join(info['geom_types']) or 'none'}, SRID: {info['srid']}"
+        )
+    
+    # Subdivide heavy geometries into a companion table
+    if result['success'] and getattr(settings, 'LAYER_IMPORT_SUBDIVIDE', True):
+        try:
+            result['subdivision'] = subdivide_stage(
+                table_name, result.get('bbox'),
+                max_vertices=getattr(settings, 'LAYER_SUBDIVIDE_MAX_VERTICES', 256)
+            )
+        except Exception as e:
+            logger.error(f"Subdivision failed for '{table_name}': {e}")
+            drop_subdivided_table(table_name)
+    elif result['success']:
+        # A companion left from an earlier import would no longer match
+        drop_subdivided_table(table_name)
+    
+    # EPSG:3857 companion for tiles and measurements
+    if result['success'] and getattr(settings, 'LAYER_IMPORT_MERCATOR', True):
+        try:
+            result['mercator_table'] = create_mercator_table(table_name)
+        except Exception as e:
+            logger.error(f"Failed to create EPSG:3857 table for '{table_name}': {e}")
+    
+    return result
+
+
+def _import_source_in_thread(source_path, table_name, source_layer=None, layer_id=None):
+    """
+    Run import_source in a worker thread under an import slot, so project
+    imports count against LAYER_IMPORT_CONCURRENCY too, and release the
+    thread's DB connection.
+    """
+    from .locks import wait_for_import_slot
+    
+    try:
+        with wait_for_import_slot():
+            return import_source(source_path, table_name, source_layer, layer_id)
+    except Exception as e:
+        logger.exception(f"Import of '{table_name}' failed")
+        return {'success': False, 'message': str(e), 'feature_count': 0, 'geom_type': None}
+    finally:
+        connection.close()
+
+
+def import_sources_parallel(jobs, max_workers=None):
+    """
+    Import several sources concurrently.
+    
+    Each ogr2ogr runs in its own process; the threads only wait on them
+    and run the per-table SQL stages on their own DB connections. Every
+    load holds an import slot, so at most LAYER_IMPORT_CONCURRENCY run
+    at once across all workers whatever max_workers is.
+    
+    Args:
+        jobs: list of (source_path, table_name, source_layer, layer_id) tuples
+        max_workers: concurrency limit (LAYER_IMPORT_MAX_WORKERS by default)
+    
+    Returns:
+        dict mapping table_name to its import result
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    max_workers = max_workers or getattr(settings, 'LAYER_IMPORT_MAX_WORKERS', 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            table_name: pool.submit(
+                _import_source_in_thread, source_path, table_name, source_layer, layer_id
+            )
+            for source_path, table_name, source_layer, layer_id in jobs
+        }
+        return {table_name: future.result() for table_name, future in futures.items()}
+
+
+def import_layer_file(file_path, table_name, layer_id=None):
     """
     High-level function to import a layer file.
     Handles zipped shapefiles, geojson, etc.
     
+    Args:
+        layer_id: Layer the table belongs to (see import_source)
+    
     Returns:
         dict with import results
     """
@@ -247,15 +1649,7 @@ def import_layer_file(file_path, table_name):
                 'geom_type': None
             }
         
-        # Import to PostGIS
-        result = import_vector_to_postgis(source_path, table_name)
-        
-        # Add bbox if successful
-        if result['success']:
-            result['bbox'] = get_table_bbox(table_name)
-            result['columns'] = get_table_columns(table_name)
-        
-        return result
+        return import_source(source_path, table_name, layer_id=layer_id)
         
     finally:
         # Cleanup temp directory
@@ -0,0 +1,113 @@
+"""
+Cross-process limits for heavy layer jobs, backed by the Celery Redis broker.
+"""
+
+import time
+import uuid
+import logging
+from contextlib import ExitStack, contextmanager
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Delete the key only if it still holds our token
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SlotUnavailable(Exception):
+    """All slots of a semaphore are taken."""
+
+
+_redis = None
+
+
+def get_redis():
+    """Shared Redis client on the Celery broker."""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _redis
+
+
+@contextmanager
+def semaphore_slot(name, limit, timeout):
+    """
+    Hold one of `limit` slots of a named semaphore.
+
+    Each slot is a Redis key with an expiry, so a crashed worker frees
+    its slot after `timeout` seconds.
+
+    Raises:
+        SlotUnavailable: if all slots are taken
+    """
+    client = get_redis()
+    token = uuid.uuid4().hex
+    for i in range(limit):
+        key = f'layers:{name}:{i}'
+        if client.set(key, token, nx=True, ex=timeout):
+            break
+    else:
+        raise SlotUnavailable(name)
+
+    try:
+        yield
+    finally:
+        client.eval(RELEASE_SCRIPT, 1, key, token)
+
+
+def import_slot():
+    """
+    Slot for one ogr2ogr / gdal_translate load (LAYER_IMPORT_CONCURRENCY).
+    """
+    return semaphore_slot(
+        'import-slot',
+        getattr(settings, 'LAYER_IMPORT_CONCURRENCY', 2),
+        getattr(settings, 'LAYER_IMPORT_SLOT_TIMEOUT', 900),
+    )
+
+
+@contextmanager
+def wait_for_import_slot():
+    """
+    Block until an import slot is free and hold it, polling every
+    LAYER_IMPORT_SLOT_POLL seconds. For loads that cannot be retried as
+    a task, e.g. the threads of a multi-layer project import.
+    """
+    poll = getattr(settings, 'LAYER_IMPORT_SLOT_POLL', 2)
+    while True:
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(import_slot())
+            except SlotUnavailable:
+                pass
+            else:
+                yield
+                return
+        time.sleep(poll)
+
+
+@contextmanager
+def extra_import_slots(count):
+    """
+    Take up to `count` more import slots without waiting, for extra
+    loader processes of a load that already holds one.
+
+    Yields:
+        number of slots taken (0..count)
+    """
+    with ExitStack() as stack:
+        taken = 0
+        for _ in range(count):
+            try:
+                stack.enter_context(import_slot())
+            except SlotUnavailable:
+                break
+            taken += 1
+        yield taken
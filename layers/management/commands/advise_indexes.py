@@ -0,0 +1,47 @@
+"""
+Index recommendations for layer tables from the slow query log.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+
+from layers.query_advisor import advise_indexes, recent_slow_queries
+
+
+class Command(BaseCommand):
+    help = 'Рекомендации индексов для таблиц слоёв по журналу медленных запросов (--apply создаёт и удаляет)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply', action='store_true',
+            help='Создать рекомендованные индексы и удалить неиспользуемые индексы советника'
+        )
+        parser.add_argument(
+            '--recent', type=int, default=0,
+            help='Показать столько последних медленных запросов'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        for query in recent_slow_queries(options['recent']) if options['recent'] else []:
+            filters = ', '.join(f'{field} ({kind})' for field, kind in query['filters']) or '-'
+            self.stdout.write(f"{query['ms']:>8.0f} ms  {query['source']:<15} {query['table']}  {filters}")
+            self.stdout.write(f"             {query['plan']}")
+
+        report = advise_indexes(apply=options['apply'])
+        for item in report['recommended']:
+            self.stdout.write(self.style.WARNING(
+                f"{item['layer']}.{item['field']} ({item['kind']}): {item['hits']} slow queries, "
+                f"avg {item['avg_ms']} ms"
+            ))
+            self.stdout.write(f"  {item['sql'] or item['note']}")
+        for name in report['created']:
+            self.stdout.write(self.style.SUCCESS(f"created {name}"))
+        for item in report['dropped']:
+            action = 'dropped' if options['apply'] else 'unused'
+            self.stdout.write(f"{action} {item['index']} on {item['table']} ({item['size']}, {item['unused_days']} days)")
+        for error in report['errors']:
+            self.stdout.write(self.style.ERROR(error))
+
+        self.stdout.write(f"{report['message']} in {time.perf_counter() - start:.2f} s")
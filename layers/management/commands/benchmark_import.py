@@ -0,0 +1,60 @@
+"""
+Benchmark PostGIS load throughput: single ogr2ogr vs. partitioned parallel loaders.
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from layers.import_utils import (
+    get_source_fid_range, import_vector_to_postgis, import_vector_partitioned, drop_table,
+)
+
+
+class Command(BaseCommand):
+    help = 'Замер скорости загрузки в PostGIS в зависимости от числа процессов ogr2ogr'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Путь к исходному файлу (shp, gpkg, geojson)')
+        parser.add_argument('--layer', help='Имя слоя внутри многослойного источника')
+        parser.add_argument(
+            '--processes', nargs='+', type=int, default=[1, 2, 4, 8],
+            help='Числа процессов для партиционированной загрузки'
+        )
+        parser.add_argument('--table', default='bench_import', help='Префикс временных таблиц')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        layer = options['layer']
+        count = get_source_fid_range(source, layer)[0]
+        self.stdout.write(f"{source}: {count} features")
+
+        runs = [('ogr2ogr', None)] + [(f'partitioned x{n}', n) for n in options['processes']]
+        header = f"{'mode':<18}{'seconds':>10}{'features/s':>14}{'speedup':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        baseline = None
+        for label, processes in runs:
+            table = f"{options['table']}_{processes or 0}"
+            start = time.perf_counter()
+            if processes is None:
+                result = import_vector_to_postgis(source, table, source_layer=layer)
+            else:
+                result = import_vector_partitioned(source, table, processes, source_layer=layer)
+            elapsed = time.perf_counter() - start
+            if not result['success']:
+                drop_table(table)
+                raise CommandError(f"{label}: {result['message']}")
+
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+                loaded = cursor.fetchone()[0]
+            drop_table(table)
+            if loaded != count:
+                self.stdout.write(self.style.WARNING(f"{label}: loaded {loaded} of {count} features"))
+
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f"{label:<18}{elapsed:>10.2f}{loaded / elapsed:>14.0f}{baseline / elapsed:>9.2f}x"
+            )
@@ -0,0 +1,203 @@
+"""
+Benchmark the layers API, feature queries and imports on the synthetic
+layers from generate_bench_data, and compare with a stored earlier run.
+"""
+
+import itertools
+import os
+import random
+import tempfile
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from layers.benchmarks import (
+    PROJECT_SLUG, SLUG_PREFIX, bench_tables, compare_results, export_gpkg, feature_tiles,
+    load_results, measure, save_results,
+)
+from layers.import_utils import category_stats, drop_table, import_source, intersecting_feature_ids, search_features
+from layers.models import FeatureContentImport, Layer
+from layers.vector_tiles import render_vector_tile
+
+SUITES = ('api', 'features', 'import')
+IMPORT_TABLE = 'bench_import_tmp'
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк API слоёв, запросов к объектам и импорта: перцентили задержки, число SQL-запросов, сравнение с прошлым запуском'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suites', nargs='+', choices=SUITES, default=['api', 'features'], help='Наборы замеров')
+        parser.add_argument('--layers', nargs='+', help='Slug слоёв (по умолчанию все синтетические)')
+        parser.add_argument('--iterations', type=int, default=30, help='Замеров на случай')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных запусков')
+        parser.add_argument('--import-runs', type=int, default=3, help='Замеров импорта на слой')
+        parser.add_argument('--zooms', nargs='+', type=int, default=[6, 10, 14], help='Зумы векторных тайлов')
+        parser.add_argument('--seed', type=int, default=0, help='Seed для выбора bbox и тайлов')
+        parser.add_argument('--label', default='', help='Подпись запуска')
+        parser.add_argument('--compare', help='Сравнить с запуском: путь к файлу или хеш коммита (по умолчанию последний)')
+        parser.add_argument('--no-save', action='store_true', help='Не сохранять результаты')
+
+    def handle(self, *args, **options):
+        layers = Layer.objects.filter(slug__startswith=SLUG_PREFIX)
+        if options['layers']:
+            layers = Layer.objects.filter(slug__in=options['layers'])
+        layers = bench_tables(layers.order_by('feature_count', 'slug'))
+        if not layers:
+            raise CommandError('No benchmark layers found; run generate_bench_data first')
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.results = {}
+        if 'api' in options['suites']:
+            self.api_suite(layers)
+        if 'features' in options['suites']:
+            self.features_suite(layers)
+        if 'import' in options['suites']:
+            self.import_suite(layers)
+
+        path = None if options['no_save'] else save_results(self.results, options['label'])
+        baseline = load_results(options['compare'], exclude=path)
+        self.report(baseline)
+        if path:
+            self.stdout.write(self.style.SUCCESS(f"Saved to {path}"))
+
+    def run_case(self, name, func, **kwargs):
+        kwargs.setdefault('iterations', self.options['iterations'])
+        kwargs.setdefault('warmup', self.options['warmup'])
+        try:
+            self.results[name] = measure(func, **kwargs)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"{name}: {e}"))
+            return
+        stats = self.results[name]
+        self.stdout.write(f"{name:<48} p50 {stats['p50_ms']:>9.1f} ms  p95 {stats['p95_ms']:>9.1f} ms")
+
+    def api_suite(self, layers):
+        client = Client()
+
+        def get(url):
+            def request():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {url}: HTTP {response.status_code}")
+                return response
+            return request
+
+        self.run_case('api:project-list', get(reverse('project-list')))
+        self.run_case('api:project-detail', get(reverse('project-detail', args=[PROJECT_SLUG])))
+        self.run_case('api:layer-list', get(reverse('layer-list')))
+        for layer in layers:
+            self.run_case(f'api:layer-detail:{layer.slug}', get(reverse('layer-detail', args=[layer.slug])))
+            self.run_case(f'api:features:{layer.slug}', get(reverse('layer-features', args=[layer.slug])))
+            self.run_case(f'api:feature-ids:{layer.slug}', get(reverse('layer-feature-ids', args=[layer.slug])))
+            content = layer.feature_contents.filter(is_published=True).order_by('feature_id').first()
+            if content:
+                self.run_case(
+                    f'api:feature:{layer.slug}',
+                    get(reverse('feature-content', args=[layer.slug, content.feature_id])),
+                )
+
+    def features_suite(self, layers):
+        for layer in layers:
+            table = layer.postgis_table
+            self.run_case(f'features:search:{layer.slug}', lambda: search_features(table, 'Озеро 1'))
+            self.run_case(
+                f'features:search-field:{layer.slug}',
+                lambda: search_features(table, 'терраса', field='landform'),
+            )
+
+            # A different 1° x 1° window on every run
+            def bbox_query():
+                west = self.rng.uniform(layer.bbox_west, max(layer.bbox_east - 1, layer.bbox_west))
+                south = self.rng.uniform(layer.bbox_south, max(layer.bbox_north - 1, layer.bbox_south))
+                return intersecting_feature_ids(table, (west, south, west + 1, south + 1))
+            self.run_case(f'features:bbox:{layer.slug}', bbox_query)
+
+            self.run_case(
+                f'features:legend:{layer.slug}',
+                lambda: category_stats(
+                    table, 'sheet',
+                    area=layer.geom_type in ('polygon', 'multi'),
+                    length=layer.geom_type in ('line', 'multi'),
+                ),
+                iterations=max(self.options['iterations'] // 5, 3),
+            )
+
+            for z in self.options['zooms']:
+                tiles = itertools.cycle(feature_tiles(layer, z, 50, self.rng))
+
+                def tile(z=z, tiles=tiles):
+                    x, y = next(tiles)
+                    return render_vector_tile(layer, z, x, y)
+                self.run_case(f'features:tile-z{z}:{layer.slug}', tile)
+
+    def import_suite(self, layers):
+        runs = self.options['import_runs']
+        with tempfile.TemporaryDirectory() as tmp:
+            for layer in layers:
+                source = os.path.join(tmp, f'{layer.postgis_table}.gpkg')
+                export_gpkg(layer.postgis_table, source)
+
+                def load():
+                    result = import_source(source, IMPORT_TABLE)
+                    if not result['success']:
+                        raise RuntimeError(result['message'])
+                self.run_case(f'import:layer:{layer.slug}', load, iterations=runs, warmup=0)
+                drop_table(IMPORT_TABLE)
+
+                ids = list(layer.feature_contents.values_list('feature_id', flat=True))
+                if not ids:
+                    continue
+                rows = ['feature_id,title,subtitle,description,rank']
+                rows += [
+                    f'{gid},Объект {gid},импорт,"<p>Описание объекта {gid}</p>",{self.rng.randint(1, 5)}'
+                    for gid in ids
+                ]
+                data = ('\n'.join(rows) + '\n').encode('utf-8')
+
+                def content_import():
+                    from layers.content_import import run_content_import
+
+                    job = FeatureContentImport(layer=layer, key_column='feature_id')
+                    job.data_file.save('bench.csv', ContentFile(data))
+                    try:
+                        report = run_content_import(job)
+                        if report['failed']:
+                            raise RuntimeError(f"{report['failed']} rows failed: {report['errors'][:3]}")
+                    finally:
+                        job.data_file.delete(save=False)
+                        job.delete()
+                self.run_case(f'import:content:{layer.slug}', content_import, iterations=runs, warmup=1)
+
+    def report(self, baseline):
+        self.stdout.write('')
+        if baseline:
+            self.stdout.write(
+                f"Baseline: {baseline.get('revision') or '-'} {baseline.get('label') or ''} "
+                f"({baseline.get('created_at')})"
+            )
+        header = (
+            f"{'case':<48}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'queries':>9}"
+            f"{'Δp50':>9}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        changes = {}
+        if baseline:
+            changes = {case: change for case, _, _, change in compare_results(self.results, baseline)}
+        for case, stats in self.results.items():
+            change = changes.get(case)
+            delta = f'{change:+.0%}' if change is not None else '-'
+            line = (
+                f"{case:<48}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+                f"{stats['max_ms']:>10.1f}{stats['queries'] if stats['queries'] is not None else '-':>9}"
+                f"{delta:>9}"
+            )
+            if change is not None and change > 0.1:
+                line = self.style.WARNING(line)
+            elif change is not None and change < -0.1:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
@@ -0,0 +1,97 @@
+"""
+Benchmark vector tile and measurement queries with and without the EPSG:3857 companion table.
+"""
+
+import math
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from layers.import_utils import (
+    area_sql, create_mercator_table, length_sql, mercator_source, mercator_table_name, table_exists,
+)
+from layers.models import Layer
+from layers.vector_tiles import render_vector_tile
+
+
+def lonlat_to_tile(lon, lat, z):
+    """XYZ tile containing a WGS84 point."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+class Command(BaseCommand):
+    help = 'Замер генерации векторных тайлов и измерений с таблицей EPSG:3857 и без неё'
+
+    def add_arguments(self, parser):
+        parser.add_argument('layer', help='Slug векторного слоя')
+        parser.add_argument(
+            '--zooms', nargs='+', type=int, default=[6, 8, 10, 12, 14],
+            help='Уровни масштаба'
+        )
+        parser.add_argument('--tiles', type=int, default=20, help='Число тайлов на уровень')
+        parser.add_argument('--seed', type=int, default=0, help='Seed для выбора тайлов')
+
+    def handle(self, *args, **options):
+        try:
+            layer = Layer.objects.get(slug=options['layer'], layer_type='vector')
+        except Layer.DoesNotExist:
+            raise CommandError(f"Vector layer '{options['layer']}' not found")
+        if not layer.postgis_table or layer.bbox_west is None:
+            raise CommandError('Layer has no imported table or bbox')
+
+        if not table_exists(mercator_table_name(layer.postgis_table)):
+            self.stdout.write(f"Creating {mercator_table_name(layer.postgis_table)}...")
+            create_mercator_table(layer.postgis_table)
+
+        rng = random.Random(options['seed'])
+        header = f"{'zoom':<6}{'transform ms':>14}{'3857 ms':>10}{'speedup':>10}{'KB/tile':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for z in options['zooms']:
+            x0, y0 = lonlat_to_tile(layer.bbox_west, layer.bbox_north, z)
+            x1, y1 = lonlat_to_tile(layer.bbox_east, layer.bbox_south, z)
+            tiles = [
+                (rng.randint(x0, x1), rng.randint(y0, y1))
+                for _ in range(options['tiles'])
+            ]
+
+            timings = {}
+            sizes = []
+            for use_mercator in (False, True):
+                samples = []
+                for x, y in tiles:
+                    start = time.perf_counter()
+                    content = render_vector_tile(layer, z, x, y, use_mercator=use_mercator)
+                    samples.append(time.perf_counter() - start)
+                    sizes.append(len(content))
+                timings[use_mercator] = statistics.median(samples) * 1000
+
+            speedup = timings[False] / timings[True] if timings[True] else 0
+            self.stdout.write(
+                f"{z:<6}{timings[False]:>14.1f}{timings[True]:>10.1f}{speedup:>9.2f}x"
+                f"{statistics.mean(sizes) / 1024:>10.1f}"
+            )
+
+        self.stdout.write('')
+        for use_mercator in (False, True):
+            source = mercator_source(layer.postgis_table, use_companion=use_mercator)
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT SUM({area_sql(source['geom'])}), SUM({length_sql(source['geom'])}) "
+                    f"FROM {source['from']}"
+                )
+                area, length = cursor.fetchone()
+            elapsed = (time.perf_counter() - start) * 1000
+            label = '3857 table' if use_mercator else 'ST_Transform'
+            self.stdout.write(
+                f"Area/length ({label}): {elapsed:.1f} ms, "
+                f"{(area or 0) / 1e6:.2f} km², {(length or 0) / 1e3:.2f} km"
+            )
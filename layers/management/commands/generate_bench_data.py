@@ -0,0 +1,52 @@
+"""
+Generate synthetic West Siberia layers for the benchmark suite.
+"""
+
+import time
+from django.core.management.base import BaseCommand
+
+from layers.benchmarks import bench_project, clear_bench_data, generate_layer
+
+
+class Command(BaseCommand):
+    help = 'Синтетические слои (точки, линии, полигоны) с контентом и стилями для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+            help='Числа объектов в слоях (от 1000 до 1000000)'
+        )
+        parser.add_argument(
+            '--types', nargs='+', choices=['point', 'line', 'polygon'],
+            default=['point', 'line', 'polygon'], help='Типы геометрии'
+        )
+        parser.add_argument('--contents', type=int, default=2000, help='FeatureContent на слой')
+        parser.add_argument('--styles', type=int, default=1000, help='Правил LayerStyle на слой (по листам карты)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed генератора')
+        parser.add_argument('--clear', action='store_true', help='Только удалить синтетические слои')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f"Deleted {clear_bench_data()} synthetic layers")
+            return
+
+        header = f"{'layer':<26}{'features':>10}{'contents':>10}{'styles':>8}{'seconds':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        layers = []
+        for count in options['sizes']:
+            for geom_type in options['types']:
+                start = time.perf_counter()
+                layer = generate_layer(
+                    geom_type, count, seed=options['seed'],
+                    contents=options['contents'], styles=options['styles'],
+                )
+                layers.append(layer)
+                self.stdout.write(
+                    f"{layer.slug:<26}{layer.feature_count:>10}{layer.feature_contents.count():>10}"
+                    f"{layer.styles.count():>8}{time.perf_counter() - start:>10.1f}"
+                )
+
+        project = bench_project(layers)
+        self.stdout.write(self.style.SUCCESS(f"Project '{project.slug}': {len(layers)} layers"))
@@ -0,0 +1,31 @@
+"""
+Report Celery queue depth and task wait latency per queue.
+"""
+
+from django.core.management.base import BaseCommand
+
+from layers.queue_stats import queue_report
+
+
+def fmt(value, unit=''):
+    return '-' if value is None else f'{value:.0f}{unit}'
+
+
+class Command(BaseCommand):
+    help = 'Глубина очередей Celery и задержка задач по очередям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queues', nargs='*', help='Очереди (по умолчанию CELERY_QUEUE_NAMES)')
+
+    def handle(self, *args, **options):
+        header = f"{'queue':<14}{'depth':>8}{'oldest':>10}{'samples':>9}{'p50':>10}{'p95':>10}{'max':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in queue_report(options['queues'] or None):
+            line = (
+                f"{row['queue']:<14}{row['depth']:>8}{fmt(row['oldest_s'], 's'):>10}"
+                f"{row['samples']:>9}{fmt(row['p50_ms'], 'ms'):>10}"
+                f"{fmt(row['p95_ms'], 'ms'):>10}{fmt(row['max_ms'], 'ms'):>10}"
+            )
+            style = self.style.WARNING if row['depth'] else self.style.SUCCESS
+            self.stdout.write(style(line))
@@ -0,0 +1,32 @@
+"""
+Check that every Layer's PostGIS table and GeoServer layer exist.
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from layers.reconcile import reconcile_layers
+
+
+class Command(BaseCommand):
+    help = 'Сверка слоёв с GeoServer и PostGIS (--fix исправляет расхождения)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Переопубликовать отсутствующие в GeoServer слои и очистить ссылки на удалённые таблицы'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        report = reconcile_layers(fix=options['fix'])
+        if not report.pop('success'):
+            raise CommandError(report['message'])
+
+        for key, items in report.items():
+            style = self.style.SUCCESS if key == 'fixed' or not items else self.style.WARNING
+            self.stdout.write(style(f"{key}: {len(items)}"))
+            for item in items:
+                self.stdout.write(f"  {item}")
+
+        self.stdout.write(f"Done in {time.perf_counter() - start:.2f} s")
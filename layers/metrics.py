@@ -0,0 +1,299 @@
+"""
+Prometheus metrics for API views, SQL queries, outbound HTTP calls
+(GeoServer, Google Drive) and Celery tasks, aggregated in the Redis
+broker so every gunicorn and Celery process reports into one set of
+series. Also builds the Server-Timing header of API responses.
+
+Observations of a request or task are collected in memory and written
+with one pipelined round trip when it finishes.
+"""
+
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from .locks import get_redis
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'layers:metrics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Django request latency by view', LATENCY_BUCKETS),
+    'http_request_db_queries': ('SQL queries per request by view', COUNT_BUCKETS),
+    'db_query_duration_seconds': ('SQL query duration by statement type', LATENCY_BUCKETS),
+    'external_request_duration_seconds': ('Outbound HTTP request duration by service', LATENCY_BUCKETS),
+    'celery_task_duration_seconds': ('Celery task run time by task and queue', LATENCY_BUCKETS),
+    'celery_task_db_queries': ('SQL queries per Celery task', COUNT_BUCKETS),
+}
+
+STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'CREATE', 'ALTER', 'DROP', 'COPY')
+
+_collector = contextvars.ContextVar('layers_metrics_collector', default=None)
+_tasks = {}
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def bucket_label(bound):
+    return f'{bound:g}'
+
+
+def format_labels(labels):
+    """Prometheus label set, e.g. view="layer-list",method="GET"."""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in sorted(labels.items()))
+
+
+class Collector:
+    """Buffered observations and Server-Timing totals of one request or task."""
+
+    def __init__(self):
+        self.increments = {}
+        self.durations = {'db': 0.0, 'external': 0.0, 'serialize': 0.0}
+        self.queries = 0
+
+    def observe(self, name, labels, value):
+        """Record one histogram observation."""
+        key = f'{PREFIX}:{name}'
+        series = format_labels(labels)
+        bucket = next((b for b in HISTOGRAMS[name][1] if value <= b), None)
+        # Buckets are stored non-cumulative and summed up when rendered
+        for field, amount in (
+            (f'{series}|{bucket_label(bucket) if bucket is not None else "+Inf"}', 1),
+            (f'{series}|sum', value),
+            (f'{series}|count', 1),
+        ):
+            self.increments[(key, field)] = self.increments.get((key, field), 0) + amount
+
+    def flush(self):
+        """Write buffered observations to Redis in one pipeline."""
+        if not self.increments:
+            return
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for (key, field), amount in self.increments.items():
+                pipe.hincrbyfloat(key, field, amount)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Failed to record metrics: {e}")
+        self.increments = {}
+
+    def server_timing(self, total):
+        """Server-Timing header value (milliseconds)."""
+        app = max(total - sum(self.durations.values()), 0)
+        return ', '.join([
+            f'db;dur={self.durations["db"] * 1000:.1f};desc="{self.queries} queries"',
+            f'external;dur={self.durations["external"] * 1000:.1f}',
+            f'serialize;dur={self.durations["serialize"] * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def observe(name, labels, value):
+    """
+    Record a histogram observation in the current request/task, or
+    write it at once outside of one.
+    """
+    if not enabled():
+        return
+    collector = _collector.get()
+    if collector is not None:
+        collector.observe(name, labels, value)
+    else:
+        collector = Collector()
+        collector.observe(name, labels, value)
+        collector.flush()
+
+
+def add_duration(part, seconds):
+    """Add time to a Server-Timing part of the current request."""
+    collector = _collector.get()
+    if collector is not None:
+        collector.durations[part] += seconds
+
+
+@contextmanager
+def collect():
+    """Collect the observations of a block and flush them at its end."""
+    collector = Collector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+        collector.flush()
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper timing every SQL query."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        collector = _collector.get()
+        if collector is not None:
+            collector.queries += 1
+            collector.durations['db'] += elapsed
+            word = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+            collector.observe(
+                'db_query_duration_seconds', {'statement': word if word in STATEMENTS else 'OTHER'}, elapsed
+            )
+
+
+@contextmanager
+def external_call(service, method='GET'):
+    """
+    Time an outbound HTTP call. The block sets call['status'] to the
+    response status code; calls that raise are recorded as 'error'.
+    """
+    call = {'status': None}
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        elapsed = time.perf_counter() - start
+        add_duration('external', elapsed)
+        status = f'{call["status"] // 100}xx' if call['status'] else 'error'
+        observe('external_request_duration_seconds', {'service': service, 'method': method, 'status': status}, elapsed)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer reporting its time as 'serialize' in Server-Timing."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            add_duration('serialize', time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    Record request latency and SQL query count per view, and add a
+    Server-Timing header (db, external, serialize, app, total).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not enabled():
+            return self.get_response(request)
+
+        with collect() as collector, connection.execute_wrapper(query_wrapper):
+            start = time.perf_counter()
+            response = self.get_response(request)
+            total = time.perf_counter() - start
+
+            match = getattr(request, 'resolver_match', None)
+            view = (match.view_name if match else '') or 'unresolved'
+            collector.observe('http_request_duration_seconds', {
+                'view': view,
+                'method': request.method,
+                'status': f'{response.status_code // 100}xx',
+            }, total)
+            collector.observe('http_request_db_queries', {'view': view}, collector.queries)
+            response['Server-Timing'] = collector.server_timing(total)
+        return response
+
+
+def task_started(task_id):
+    """Start collecting the metrics of a Celery task (task_prerun)."""
+    if not enabled():
+        return
+    collector = Collector()
+    token = _collector.set(collector)
+    connection.execute_wrappers.append(query_wrapper)
+    _tasks[task_id] = (time.perf_counter(), token, collector)
+
+
+def task_finished(task_id, task, state):
+    """Record a Celery task's duration and queries (task_postrun)."""
+    started = _tasks.pop(task_id, None)
+    if started is None:
+        return
+    start, token, collector = started
+    if query_wrapper in connection.execute_wrappers:
+        connection.execute_wrappers.remove(query_wrapper)
+    try:
+        _collector.reset(token)
+    except ValueError:
+        _collector.set(None)
+
+    queue = (task.request.delivery_info or {}).get('routing_key') or 'celery'
+    labels = {'task': task.name, 'queue': queue}
+    collector.observe('celery_task_duration_seconds', {**labels, 'state': state or 'UNKNOWN'}, time.perf_counter() - start)
+    collector.observe('celery_task_db_queries', labels, collector.queries)
+    collector.flush()
+
+
+def render_histograms(client):
+    """Exposition lines of the stored histograms."""
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        series = {}
+        for field, value in client.hgetall(f'{PREFIX}:{name}').items():
+            labels, part = field.decode().rsplit('|', 1)
+            series.setdefault(labels, {})[part] = float(value)
+
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, parts in sorted(series.items()):
+            prefix = f'{labels},' if labels else ''
+            cumulative = 0
+            for bound in buckets:
+                cumulative += parts.get(bucket_label(bound), 0)
+                lines.append(f'{name}_bucket{{{prefix}le="{bucket_label(bound)}"}} {cumulative:g}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {parts.get("count", 0):g}')
+            lines.append(f'{name}_sum{{{labels}}} {parts.get("sum", 0):.6f}')
+            lines.append(f'{name}_count{{{labels}}} {parts.get("count", 0):g}')
+    return lines
+
+
+def render_queue_gauges():
+    """Exposition lines of Celery queue depth and wait time."""
+    from .queue_stats import queue_report
+
+    depth = ['# HELP celery_queue_depth Messages waiting per Celery queue', '# TYPE celery_queue_depth gauge']
+    oldest = [
+        '# HELP celery_queue_oldest_seconds Age of the oldest waiting message',
+        '# TYPE celery_queue_oldest_seconds gauge',
+    ]
+    for row in queue_report():
+        labels = format_labels({'queue': row['queue']})
+        depth.append(f'celery_queue_depth{{{labels}}} {row["depth"]}')
+        oldest.append(f'celery_queue_oldest_seconds{{{labels}}} {row["oldest_s"] or 0:.1f}')
+    return depth + oldest
+
+
+def render_metrics():
+    """
+    All metrics in the Prometheus text exposition format.
+
+    Returns:
+        str
+    """
+    client = get_redis()
+    lines = render_histograms(client)
+    try:
+        lines += render_queue_gauges()
+    except Exception as e:
+        logger.warning(f"Failed to read Celery queue stats: {e}")
+    return '\n'.join(lines) + '\n'
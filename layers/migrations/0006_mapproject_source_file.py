@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:00
+
+import layers.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0005_layerstyle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mapproject',
+            name='source_file',
+            field=models.FileField(blank=True, help_text='GeoPackage или zip с несколькими shapefile — каждый слой станет отдельным слоем проекта', null=True, upload_to=layers.models.project_source_upload_path, verbose_name='Многослойный файл'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0006_mapproject_source_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='raster_stats',
+            field=models.JSONField(blank=True, default=dict, help_text='Размер, обзорные уровни и min/max/mean по каналам', verbose_name='Статистика растра'),
+        ),
+    ]
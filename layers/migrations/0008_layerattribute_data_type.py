@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0007_layer_raster_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layerattribute',
+            name='data_type',
+            field=models.CharField(choices=[('text', 'Текст'), ('category', 'Категория'), ('integer', 'Целое число'), ('float', 'Дробное число'), ('date', 'Дата'), ('boolean', 'Логический')], default='text', help_text='Определяется при импорте по значениям столбца', max_length=20, verbose_name='Тип данных'),
+        ),
+        migrations.AddField(
+            model_name='layerattribute',
+            name='distinct_count',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Уникальных значений'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0008_layerattribute_data_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layerstyle',
+            name='feature_count',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Объектов'),
+        ),
+        migrations.AddField(
+            model_name='layerstyle',
+            name='total_area',
+            field=models.FloatField(blank=True, null=True, verbose_name='Площадь, м²'),
+        ),
+        migrations.AddField(
+            model_name='layerstyle',
+            name='total_length',
+            field=models.FloatField(blank=True, null=True, verbose_name='Длина, м'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0009_layerstyle_legend_counts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='layerstyle',
+            name='attribute_value',
+            field=models.CharField(blank=True, help_text='Значение поля для этого стиля', max_length=200, verbose_name='Значение'),
+        ),
+        migrations.AddField(
+            model_name='layerstyle',
+            name='value_min',
+            field=models.FloatField(blank=True, null=True, verbose_name='От (включительно)'),
+        ),
+        migrations.AddField(
+            model_name='layerstyle',
+            name='value_max',
+            field=models.FloatField(blank=True, null=True, verbose_name='До'),
+        ),
+        migrations.AddField(
+            model_name='layerstyle',
+            name='is_default',
+            field=models.BooleanField(default=False, help_text='Применяется к объектам, не попавшим в другие правила', verbose_name='Прочие значения'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0010_layerstyle_ranges'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='layer',
+            name='sld_style',
+            field=models.TextField(blank=True, help_text='XML-содержимое SLD стиля. Если пусто — SLD собирается из правил стиля слоя', verbose_name='SLD стиль'),
+        ),
+        migrations.AddField(
+            model_name='layer',
+            name='sld_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хеш опубликованного SLD'),
+        ),
+    ]
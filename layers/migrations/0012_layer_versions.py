@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0011_layer_sld_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='data_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Увеличивается при импорте и удалении данных слоя', verbose_name='Версия данных'),
+        ),
+        migrations.AddField(
+            model_name='layer',
+            name='style_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Увеличивается при изменении SLD и правил стиля', verbose_name='Версия стиля'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:45
+
+import django.db.models.deletion
+import layers.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0012_layer_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureContentImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_file', models.FileField(help_text='XLSX или CSV, первая строка — заголовки колонок', upload_to=layers.models.content_import_upload_path, verbose_name='Таблица')),
+                ('images_zip', models.FileField(blank=True, help_text='Zip с фотографиями: по именам из колонки images или в папках с именем ключа', null=True, upload_to=layers.models.content_import_upload_path, verbose_name='Архив изображений')),
+                ('key_column', models.CharField(default='feature_id', help_text='Колонка таблицы, по которой строка связывается с объектом', max_length=100, verbose_name='Колонка ключа')),
+                ('key_field', models.CharField(blank=True, help_text='Атрибут таблицы PostGIS, с которым сравнивается ключ. Если пусто — ключ это gid', max_length=100, verbose_name='Атрибут слоя')),
+                ('replace_gallery', models.BooleanField(default=False, help_text='Удалить прежние изображения галереи у объектов с новыми фото', verbose_name='Заменить галерею')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Завершён'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('report', models.JSONField(blank=True, default=dict, verbose_name='Отчёт')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершён')),
+                ('layer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='content_imports', to='layers.layer', verbose_name='Слой')),
+            ],
+            options={
+                'verbose_name': 'Импорт контента',
+                'verbose_name_plural': 'Импорт контента',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('layers', '0013_featurecontentimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='layer',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Увеличивается при изменении контента объектов (признак has_content)', verbose_name='Версия контента'),
+        ),
+    ]
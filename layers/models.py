@@ -4,8 +4,10 @@ Models for the geoportal layers app.
 
 import os
 import uuid
+from django.conf import settings
 from django.contrib.gis.db import models as gis_models
 from django.db import models
+from django.db.models import F
 
 
 def layer_upload_path(instance, filename):
@@ -14,6 +16,12 @@ def layer_upload_path(instance, filename):
     return f'layers/sources/{instance.slug}/{uuid.uuid4().hex[:8]}{ext}'
 
 
+def project_source_upload_path(instance, filename):
+    """Upload path for multi-layer project source files."""
+    ext = os.path.splitext(filename)[1]
+    return f'projects/sources/{instance.slug}/{uuid.uuid4().hex[:8]}{ext}'
+
+
 def preview_upload_path(instance, filename):
     """Upload path for layer preview images."""
     ext = os.path.splitext(filename)[1]
@@ -26,6 +34,12 @@ def raster_upload_path(instance, filename):
     return f'layers/rasters/{instance.slug}/{uuid.uuid4().hex[:8]}{ext}'
 
 
+def content_import_upload_path(instance, filename):
+    """Upload path for bulk FeatureContent import files."""
+    ext = os.path.splitext(filename)[1]
+    return f'features/imports/{instance.layer.slug}/{uuid.uuid4().hex[:8]}{ext}'
+
+
 def feature_image_path(instance, filename):
     """Upload path for feature content images."""
     ext = os.path.splitext(filename)[1]
@@ -58,6 +72,12 @@ class MapProject(models.Model):
         'Базовая карта', max_length=20,
         choices=BASEMAP_CHOICES, default='osm'
     )
+    # Multi-layer source (GeoPackage or zip of shapefiles)
+    source_file = models.FileField(
+        'Многослойный файл', upload_to=project_source_upload_path,
+        blank=True, null=True,
+        help_text='GeoPackage или zip с несколькими shapefile — каждый слой станет отдельным слоем проекта'
+    )
     is_published = models.BooleanField('Опубликован', default=False)
     sort_order = models.IntegerField('Порядок сортировки', default=0)
     created_at = models.DateTimeField('Создан', auto_now_add=True)
@@ -86,6 +106,8 @@ class Layer(models.Model):
         ('polygon', 'Полигоны'),
         ('multi', 'Смешанный'),
     ]
+    # Changed only through bump_version
+    VERSION_FIELDS = ('data_version', 'style_version', 'content_version')
 
     title = models.CharField('Название', max_length=300)
     slug = models.SlugField('Slug', max_length=100, unique=True)
@@ -134,7 +156,10 @@ class Layer(models.Model):
     # Style (SLD)
     sld_style = models.TextField(
         'SLD стиль', blank=True,
-        help_text='XML-содержимое SLD стиля'
+        help_text='XML-содержимое SLD стиля. Если пусто — SLD собирается из правил стиля слоя'
+    )
+    sld_hash = models.CharField(
+        'Хеш опубликованного SLD', max_length=64, blank=True, editable=False
     )
     # Quick style settings (used if SLD is empty)
     stroke_color = models.CharField('Цвет линии', max_length=7, default='#3388ff')
@@ -145,6 +170,26 @@ class Layer(models.Model):
     # Feature count (auto-calculated)
     feature_count = models.IntegerField('Количество объектов', default=0)
 
+    # Cache-busting versions, embedded in tile/WMS/WFS URLs
+    data_version = models.PositiveIntegerField(
+        'Версия данных', default=1, editable=False,
+        help_text='Увеличивается при импорте и удалении данных слоя'
+    )
+    style_version = models.PositiveIntegerField(
+        'Версия стиля', default=1, editable=False,
+        help_text='Увеличивается при изменении SLD и правил стиля'
+    )
+    content_version = models.PositiveIntegerField(
+        'Версия контента', default=1, editable=False,
+        help_text='Увеличивается при изменении контента объектов (признак has_content)'
+    )
+
+    # Raster statistics (auto-calculated for COGs)
+    raster_stats = models.JSONField(
+        'Статистика растра', default=dict, blank=True,
+        help_text='Размер, обзорные уровни и min/max/mean по каналам'
+    )
+
     # Bounding box (auto-calculated)
     bbox_west = models.FloatField('Bbox West', null=True, blank=True)
     bbox_south = models.FloatField('Bbox South', null=True, blank=True)
@@ -169,11 +214,68 @@ class Layer(models.Model):
     def __str__(self):
         return f'{self.title} ({self.get_layer_type_display()})'
 
+    def save(self, *args, **kwargs):
+        """
+        Save without writing back the version counters: only bump_version
+        changes them, so an instance loaded before a bump cannot move them
+        backwards. Versions listed in update_fields are still written.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.VERSION_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def bump_version(self, *fields):
+        """
+        Increment data_version and/or style_version atomically in the
+        database (without touching updated_at or sending signals) and
+        reload them on this instance.
+        """
+        Layer.objects.filter(pk=self.pk).update(**{field: F(field) + 1 for field in fields})
+        self.refresh_from_db(fields=fields)
+
     @property
     def wms_url(self):
-        """WMS URL for this layer."""
+        """WMS URL for this layer, versioned by its data and style."""
         if self.geoserver_layer_name:
-            return f'/geoserver/wms'
+            return f'/geoserver/wms?v={self.data_version}.{self.style_version}'
+        return ''
+
+    @property
+    def feature_version(self):
+        """
+        Version of the layer's feature stream (vector tiles, GeoJSON):
+        its data plus the has_content flags joined into it.
+        """
+        return f'{self.data_version}.{self.content_version}'
+
+    @property
+    def wfs_url(self):
+        """GeoJSON GetFeature URL (cached WFS proxy), versioned by its features."""
+        if self.layer_type == 'vector' and self.geoserver_layer_name:
+            return (
+                f'/api/wfs?service=WFS&version=1.1.0&request=GetFeature'
+                f'&typeName={self.geoserver_layer_name}&outputFormat=application/json'
+                f'&srsName=EPSG:4326&v={self.feature_version}'
+            )
+        return ''
+
+    @property
+    def content_ids_url(self):
+        """Ranges of feature ids with published content, versioned by the contents."""
+        if self.layer_type == 'vector':
+            return f'/api/features/{self.slug}/ids/?v={self.content_version}'
+        return ''
+
+    @property
+    def tile_url(self):
+        """XYZ tile URL template (COG tiles or vector tiles), versioned by its data."""
+        if self.layer_type == 'raster' and self.raster_file:
+            return f'/api/tiles/{self.slug}/{{z}}/{{x}}/{{y}}.png?v={self.data_version}'
+        if self.layer_type == 'vector' and self.postgis_table:
+            return f'/api/vtiles/{self.slug}/{{z}}/{{x}}/{{y}}.pbf?v={self.feature_version}'
         return ''
 
 
@@ -181,6 +283,15 @@ class LayerAttribute(models.Model):
     """
     Metadata about layer attributes/fields for display in popups.
     """
+    DATA_TYPE_CHOICES = [
+        ('text', 'Текст'),
+        ('category', 'Категория'),
+        ('integer', 'Целое число'),
+        ('float', 'Дробное число'),
+        ('date', 'Дата'),
+        ('boolean', 'Логический'),
+    ]
+
     layer = models.ForeignKey(
         Layer, on_delete=models.CASCADE,
         related_name='attributes', verbose_name='Слой'
@@ -189,6 +300,11 @@ class LayerAttribute(models.Model):
     display_name = models.CharField('Отображаемое имя', max_length=200)
     show_in_popup = models.BooleanField('Показывать в попапе', default=True)
     sort_order = models.IntegerField('Порядок', default=0)
+    data_type = models.CharField(
+        'Тип данных', max_length=20, choices=DATA_TYPE_CHOICES, default='text',
+        help_text='Определяется при импорте по значениям столбца'
+    )
+    distinct_count = models.IntegerField('Уникальных значений', null=True, blank=True)
 
     class Meta:
         verbose_name = 'Атрибут слоя'
@@ -289,9 +405,16 @@ class LayerStyle(models.Model):
         help_text='Имя поля из атрибутов (например: mis, age_type)'
     )
     attribute_value = models.CharField(
-        'Значение', max_length=200,
+        'Значение', max_length=200, blank=True,
         help_text='Значение поля для этого стиля'
     )
+    # Numeric class: value_min <= value < value_max (empty bound = open)
+    value_min = models.FloatField('От (включительно)', null=True, blank=True)
+    value_max = models.FloatField('До', null=True, blank=True)
+    is_default = models.BooleanField(
+        'Прочие значения', default=False,
+        help_text='Применяется к объектам, не попавшим в другие правила'
+    )
     # Style settings
     fill_color = models.CharField('Цвет заливки', max_length=7, default='#3388ff')
     stroke_color = models.CharField('Цвет обводки', max_length=7, default='#ffffff')
@@ -304,6 +427,10 @@ class LayerStyle(models.Model):
         help_text='Если пусто — используется значение атрибута'
     )
     sort_order = models.IntegerField('Порядок в легенде', default=0)
+    # Legend statistics, refreshed on import and on rule changes
+    feature_count = models.IntegerField('Объектов', null=True, blank=True)
+    total_area = models.FloatField('Площадь, м²', null=True, blank=True)
+    total_length = models.FloatField('Длина, м', null=True, blank=True)
 
     class Meta:
         verbose_name = 'Стиль слоя'
@@ -313,3 +440,89 @@ class LayerStyle(models.Model):
 
     def __str__(self):
         return f'{self.layer.title}: {self.attribute_field}={self.attribute_value}'
+
+    @property
+    def is_range(self):
+        return self.value_min is not None or self.value_max is not None
+
+
+class FeatureContentImport(models.Model):
+    """
+    Bulk import of FeatureContent rows from a spreadsheet (XLSX/CSV),
+    with gallery images from a zip archive. Runs as a background job
+    and keeps a report of created, updated and failed rows.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('running', 'Выполняется'),
+        ('done', 'Завершён'),
+        ('failed', 'Ошибка'),
+    ]
+
+    layer = models.ForeignKey(
+        Layer, on_delete=models.CASCADE,
+        related_name='content_imports', verbose_name='Слой'
+    )
+    data_file = models.FileField(
+        'Таблица', upload_to=content_import_upload_path,
+        help_text='XLSX или CSV, первая строка — заголовки колонок'
+    )
+    images_zip = models.FileField(
+        'Архив изображений', upload_to=content_import_upload_path,
+        blank=True, null=True,
+        help_text='Zip с фотографиями: по именам из колонки images или в папках с именем ключа'
+    )
+    key_column = models.CharField(
+        'Колонка ключа', max_length=100, default='feature_id',
+        help_text='Колонка таблицы, по которой строка связывается с объектом'
+    )
+    key_field = models.CharField(
+        'Атрибут слоя', max_length=100, blank=True,
+        help_text='Атрибут таблицы PostGIS, с которым сравнивается ключ. Если пусто — ключ это gid'
+    )
+    replace_gallery = models.BooleanField(
+        'Заменить галерею', default=False,
+        help_text='Удалить прежние изображения галереи у объектов с новыми фото'
+    )
+
+    status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default='pending')
+    report = models.JSONField('Отчёт', default=dict, blank=True)
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+    finished_at = models.DateTimeField('Завершён', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Импорт контента'
+        verbose_name_plural = 'Импорт контента'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.layer.title}: импорт от {self.created_at:%d.%m.%Y %H:%M}'
+
+
+class RequestProfile(models.Model):
+    """
+    Profile of one request made by a staff user with ?_profile=1:
+    cProfile statistics and every SQL statement, with EXPLAIN (ANALYZE,
+    BUFFERS) plans of the slowest ones.
+    """
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Адрес', max_length=500)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        null=True, blank=True, verbose_name='Пользователь'
+    )
+    status_code = models.PositiveSmallIntegerField('Код ответа')
+    duration_ms = models.FloatField('Время, мс')
+    query_count = models.PositiveIntegerField('SQL-запросов')
+    sql_ms = models.FloatField('Время SQL, мс')
+    stats = models.TextField('cProfile', blank=True)
+    queries = models.JSONField('SQL-запросы', default=list, blank=True)
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} мс)'
@@ -0,0 +1,183 @@
+"""
+Opt-in request profiler for staff: adding ?_profile=1 to any URL (API
+or Wagtail page) runs the request under cProfile, records every SQL
+statement with its timing and EXPLAIN (ANALYZE, BUFFERS) of the slowest
+SELECTs, and stores the report as a RequestProfile viewable in the admin.
+
+Requests without the parameter only pay for one substring check.
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = '_profile'
+
+# Tables whose query parameters (session keys, password hashes, tokens) are
+# never stored in a report; their statements are not EXPLAINed either, as
+# the plan would show the values
+REDACTED_TABLES = ('django_session', 'auth_user', 'authtoken_token')
+REDACTED = '<скрыто>'
+
+
+class QueryLog:
+    """connection.execute_wrapper recording every SQL statement."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': params,
+                'many': many,
+                'duration': time.perf_counter() - start,
+            })
+
+
+def wants_profile(request):
+    """Whether a staff user asked for a profile of this request."""
+    if PROFILE_PARAM not in request.META.get('QUERY_STRING', ''):
+        return False
+    if request.GET.get(PROFILE_PARAM) in (None, '', '0'):
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+def explain(sql, params):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) of a SELECT, under a statement timeout
+    and rolled back.
+
+    Returns:
+        plan text, or an error message
+    """
+    timeout = getattr(settings, 'PROFILE_EXPLAIN_TIMEOUT', 10000)
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+                cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            transaction.set_rollback(True)
+        return plan
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+
+
+def format_stats(profiler):
+    """cProfile statistics sorted by cumulative time, as text."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(getattr(settings, 'PROFILE_STATS_LIMIT', 60))
+    return stream.getvalue()
+
+
+def is_sensitive(sql):
+    """Whether a statement touches a table from PROFILE_REDACTED_TABLES."""
+    sql = sql.lower()
+    return any(table in sql for table in getattr(settings, 'PROFILE_REDACTED_TABLES', REDACTED_TABLES))
+
+
+def build_queries(queries):
+    """
+    Query list for the report: every statement with its duration, and the
+    plans of the slowest SELECTs (PROFILE_EXPLAIN_LIMIT). Parameters of
+    statements on session and auth tables are redacted.
+    """
+    limit = getattr(settings, 'PROFILE_EXPLAIN_LIMIT', 5)
+    selects = [
+        q for q in queries
+        if not q['many'] and q['sql'].lstrip().upper().startswith('SELECT') and not is_sensitive(q['sql'])
+    ]
+    slowest = {id(q) for q in sorted(selects, key=lambda q: q['duration'], reverse=True)[:limit]}
+
+    report = []
+    for q in queries:
+        report.append({
+            'sql': q['sql'],
+            'params': REDACTED if is_sensitive(q['sql']) else repr(q['params'])[:1000],
+            'duration_ms': round(q['duration'] * 1000, 2),
+            'explain': explain(q['sql'], q['params']) if id(q) in slowest else '',
+        })
+    return report
+
+
+def save_profile(request, response, duration, profiler, queries):
+    """
+    Store a RequestProfile, keeping the newest PROFILE_KEEP reports.
+
+    Returns:
+        RequestProfile
+    """
+    from .models import RequestProfile
+
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        user=request.user,
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 2),
+        query_count=len(queries),
+        sql_ms=round(sum(q['duration'] for q in queries) * 1000, 2),
+        stats=format_stats(profiler),
+        queries=build_queries(queries),
+    )
+
+    keep = getattr(settings, 'PROFILE_KEEP', 200)
+    stale = RequestProfile.objects.order_by('-created_at').values_list('pk', flat=True)[keep:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+    return profile
+
+
+class ProfilerMiddleware:
+    """
+    Profile requests of staff users carrying ?_profile=1 and return the
+    report's admin URL in the X-Profile-URL header. Must come after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not wants_profile(request):
+            return self.get_response(request)
+
+        log = QueryLog()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with connection.execute_wrapper(log):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+
+        try:
+            profile = save_profile(request, response, duration, profiler, log.queries)
+        except Exception as e:
+            logger.error(f"Failed to store profile of {request.path}: {e}")
+            return response
+
+        from django.urls import reverse
+
+        response['X-Profile-URL'] = reverse('admin:layers_requestprofile_change', args=[profile.pk])
+        logger.info(
+            f"Profiled {request.method} {request.path}: {profile.duration_ms} ms, "
+            f"{profile.query_count} queries ({profile.sql_ms} ms)"
+        )
+        return response
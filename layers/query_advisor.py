@@ -0,0 +1,372 @@
+"""
+Slow query log and index advisor for the per-layer PostGIS tables.
+
+Feature search, bbox, legend, tile and content-import queries against
+layer tables run through timed_execute(): queries slower than
+SLOW_QUERY_THRESHOLD_MS are logged with their table, filter fields and
+plan summary, and their filters are counted in the Redis broker.
+
+advise_indexes() (a periodic task) turns the counters into B-tree or
+expression indexes on frequently filtered LayerAttribute columns, and
+drops indexes it created that pg_stat_user_indexes shows as unused.
+"""
+
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from .import_utils import TEXT_TYPES, get_table_column_types, quote_ident
+from .locks import get_redis
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'layers:slow-queries'
+SCANS_KEY = 'layers:index-advisor:idx-scan'
+RECENT = 200
+
+# Prefix of indexes created by the advisor; only these are ever dropped
+INDEX_PREFIX = 'adv_'
+
+# Filter kinds: 'eq' compares the column itself (=, ANY, ranges), 'text'
+# compares column::text, 'like' is an ILIKE substring search, 'bbox' a
+# spatial filter on geom (covered by the GiST index of every layer table)
+INDEXABLE_KINDS = ('eq', 'text', 'like')
+
+
+def timed_execute(cursor, table_name, sql, params, filters=(), source=''):
+    """
+    Execute a query against a layer table, logging it if it is slow.
+
+    Args:
+        cursor: Database cursor
+        table_name: Layer table the query filters
+        sql: Query
+        params: Query parameters
+        filters: (field, kind) tuples of the WHERE clause
+        source: Code path, e.g. 'search' or 'tile'
+    """
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms >= getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 200):
+        record_slow_query(table_name, sql, params, filters, source, elapsed_ms)
+
+
+def plan_nodes(node):
+    """Scan nodes of an EXPLAIN (FORMAT JSON) plan tree."""
+    if 'Relation Name' in node or 'Index Name' in node:
+        label = node['Node Type']
+        if 'Index Name' in node:
+            label += f" using {node['Index Name']}"
+        if 'Relation Name' in node:
+            label += f" on {node['Relation Name']}"
+        yield label
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def plan_summary(sql, params):
+    """
+    Scans and estimated cost of a query, from EXPLAIN without ANALYZE.
+
+    Returns:
+        str such as 'Seq Scan on roads; cost=1234'
+    """
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    scans = list(dict.fromkeys(plan_nodes(root)))
+    return '; '.join(scans + [f"cost={root['Total Cost']:.0f}"])
+
+
+def record_slow_query(table_name, sql, params, filters, source, elapsed_ms):
+    """Log a slow query and count its filters for the index advisor."""
+    plan = plan_summary(sql, params)
+    fields = ', '.join(f'{field} ({kind})' for field, kind in filters) or '-'
+    logger.warning(
+        f"Slow {source or 'layer'} query on '{table_name}': {elapsed_ms:.0f} ms, "
+        f"filters: {fields}, plan: {plan}"
+    )
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        key = f'{PREFIX}:{table_name}'
+        for field, kind in set(filters):
+            pipe.hincrby(key, f'{field}|{kind}|count', 1)
+            pipe.hincrbyfloat(key, f'{field}|{kind}|ms', elapsed_ms)
+        pipe.sadd(f'{PREFIX}:tables', table_name)
+        pipe.lpush(f'{PREFIX}:recent', json.dumps({
+            'table': table_name,
+            'source': source,
+            'ms': round(elapsed_ms, 1),
+            'filters': [list(f) for f in filters],
+            'plan': plan,
+            'at': time.time(),
+        }))
+        pipe.ltrim(f'{PREFIX}:recent', 0, RECENT - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Failed to record slow query: {e}")
+
+
+def recent_slow_queries(limit=50):
+    """Most recent slow queries, newest first."""
+    return [json.loads(raw) for raw in get_redis().lrange(f'{PREFIX}:recent', 0, limit - 1)]
+
+
+def take_filter_stats(client):
+    """
+    Read and reset the filter counters collected since the last run.
+
+    Returns:
+        dict of table -> {(field, kind): {'count': int, 'ms': float}}
+    """
+    stats = {}
+    for raw in client.smembers(f'{PREFIX}:tables'):
+        table_name = raw.decode()
+        pipe = client.pipeline()
+        pipe.hgetall(f'{PREFIX}:{table_name}')
+        pipe.delete(f'{PREFIX}:{table_name}')
+        pipe.srem(f'{PREFIX}:tables', raw)
+        values = pipe.execute()[0]
+        for name, value in values.items():
+            field, kind, part = name.decode().rsplit('|', 2)
+            entry = stats.setdefault(table_name, {}).setdefault((field, kind), {'count': 0, 'ms': 0.0})
+            entry[part] = float(value) if part == 'ms' else int(value)
+    return stats
+
+
+def index_name(table_name, field, kind):
+    """Advisor index name, shortened with a hash to PostgreSQL's 63 bytes."""
+    name = f'{INDEX_PREFIX}{table_name}_{field}_{kind}'.lower()
+    if len(name.encode('utf-8')) > 63:
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+        name = f"{name.encode('utf-8')[:50].decode('utf-8', 'ignore')}_{digest}"
+    return name
+
+
+def table_indexes(table_name):
+    """
+    Indexes of a table with their leading column (None for expressions).
+
+    Returns:
+        dict of index name -> leading column
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT i.relname, a.attname
+            FROM pg_index x
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_class i ON i.oid = x.indexrelid
+            LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = x.indkey[0]
+            WHERE t.oid = to_regclass(%s)
+        ''', [f'public.{quote_ident(table_name)}'])
+        return dict(cursor.fetchall())
+
+
+def has_trigram():
+    """Whether the pg_trgm extension is installed."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        return cursor.fetchone()[0]
+
+
+def index_sql(table_name, field, kind, column_type, trigram):
+    """
+    CREATE INDEX statement for a filter, or None if none applies.
+
+    Returns:
+        (name, sql or None, note)
+    """
+    name = index_name(table_name, field, kind)
+    table, column = quote_ident(table_name), quote_ident(field)
+    if kind == 'eq' or kind == 'text' and column_type in TEXT_TYPES:
+        # A text column compared as ::text still uses a plain B-tree
+        name = index_name(table_name, field, 'eq')
+        return name, f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_ident(name)} ON {table} ({column})', 'B-tree'
+    if kind == 'text':
+        return name, (
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_ident(name)} ON {table} (({column}::text))'
+        ), 'B-tree on the ::text expression'
+    if kind == 'like':
+        if not trigram:
+            return name, None, 'substring search needs a trigram index: CREATE EXTENSION pg_trgm'
+        return name, (
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_ident(name)} ON {table} '
+            f'USING gin (({column}::text) gin_trgm_ops)'
+        ), 'GIN trigram on the ::text expression'
+    return name, None, ''
+
+
+def recommend_indexes(stats):
+    """
+    Index recommendations for frequently filtered LayerAttribute columns
+    (at least INDEX_ADVISOR_MIN_HITS slow queries) without an index.
+
+    Returns:
+        list of dicts with 'layer', 'table', 'field', 'kind', 'hits',
+        'avg_ms', 'index', 'sql' and 'note'
+    """
+    from .models import LayerAttribute
+
+    min_hits = getattr(settings, 'INDEX_ADVISOR_MIN_HITS', 20)
+    attributes = {}
+    for table_name, slug, field_name in LayerAttribute.objects.filter(
+        layer__postgis_table__in=list(stats)
+    ).values_list('layer__postgis_table', 'layer__slug', 'field_name'):
+        attributes.setdefault(table_name, {})[field_name] = slug
+
+    trigram = None
+    recommendations = []
+    for table_name, filters in stats.items():
+        layer_fields = attributes.get(table_name, {})
+        candidates = [
+            (field, kind, entry) for (field, kind), entry in filters.items()
+            if kind in INDEXABLE_KINDS and field in layer_fields and entry['count'] >= min_hits
+        ]
+        if not candidates:
+            continue
+        indexes = table_indexes(table_name)
+        columns = dict(get_table_column_types(table_name))
+        for field, kind, entry in sorted(candidates, key=lambda c: -c[2]['count']):
+            if trigram is None and kind == 'like':
+                trigram = has_trigram()
+            name, sql, note = index_sql(table_name, field, kind, columns.get(field), trigram)
+            # A plain column index is redundant if any index leads with the column
+            if name in indexes or note == 'B-tree' and field in indexes.values():
+                continue
+            recommendations.append({
+                'layer': layer_fields[field],
+                'table': table_name,
+                'field': field,
+                'kind': kind,
+                'hits': entry['count'],
+                'avg_ms': round(entry['ms'] / entry['count'], 1),
+                'index': name,
+                'sql': sql,
+                'note': note,
+            })
+    return recommendations
+
+
+def create_index(name, sql):
+    """
+    Run a CREATE INDEX CONCURRENTLY (outside any transaction), dropping
+    the invalid index a failed build leaves behind.
+
+    Returns:
+        error message, or None on success
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+        return None
+    except DatabaseError as e:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {quote_ident(name)}')
+        return str(e)
+
+
+def drop_unused_indexes(client, apply):
+    """
+    Drop advisor indexes whose idx_scan in pg_stat_user_indexes has not
+    changed for INDEX_ADVISOR_UNUSED_DAYS. idx_scan is cumulative, so
+    the last value seen is kept per index with the time it was first
+    seen; any new scan (or a stats reset) restarts the clock.
+
+    Returns:
+        list of dicts with 'index', 'table', 'size' and 'unused_days'
+    """
+    days = getattr(settings, 'INDEX_ADVISOR_UNUSED_DAYS', 14)
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT indexrelname, relname, idx_scan, pg_size_pretty(pg_relation_size(indexrelid))
+            FROM pg_stat_user_indexes
+            WHERE schemaname = 'public' AND indexrelname LIKE %s
+        ''', [f'{INDEX_PREFIX}%'])
+        rows = cursor.fetchall()
+
+    # index name -> (idx_scan, time that value was first seen)
+    last_seen = {}
+    for name, value in client.hgetall(SCANS_KEY).items():
+        scans, _, since = value.decode().partition(':')
+        last_seen[name.decode()] = (int(scans or 0), float(since or 0))
+    now = time.time()
+    dropped = []
+    for name, table_name, scans, size in rows:
+        scans = scans or 0
+        seen = last_seen.get(name)
+        if seen is None or seen[0] != scans:
+            client.hset(SCANS_KEY, name, f'{scans}:{now}')
+            continue
+        unused_days = (now - seen[1]) / 86400
+        if unused_days < days:
+            continue
+        if apply:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {quote_ident(name)}')
+            client.hdel(SCANS_KEY, name)
+            logger.info(f"Dropped unused index {name} on '{table_name}' ({size})")
+        dropped.append({'index': name, 'table': table_name, 'size': size, 'unused_days': round(unused_days)})
+
+    # Forget indexes that no longer exist
+    stale = set(last_seen) - {row[0] for row in rows}
+    if stale:
+        client.hdel(SCANS_KEY, *stale)
+    return dropped
+
+
+def advise_indexes(apply=False):
+    """
+    Aggregate the slow query counters since the last run into index
+    recommendations, and find unused advisor indexes.
+
+    Args:
+        apply: Create the recommended indexes and drop the unused ones
+
+    Returns:
+        dict with 'success', 'message', 'recommended', 'created',
+        'dropped' and 'errors' keys
+    """
+    client = get_redis()
+    stats = take_filter_stats(client)
+    recommended = recommend_indexes(stats)
+    created = []
+    errors = []
+    if apply:
+        for item in recommended:
+            if not item['sql']:
+                continue
+            error = create_index(item['index'], item['sql'])
+            if error:
+                errors.append(f"{item['index']}: {error}")
+                logger.error(f"Failed to create index {item['index']}: {error}")
+            else:
+                created.append(item['index'])
+                logger.info(
+                    f"Created index {item['index']} on '{item['table']}' "
+                    f"({item['hits']} slow queries filtering '{item['field']}')"
+                )
+    dropped = drop_unused_indexes(client, apply)
+
+    return {
+        'success': not errors,
+        'message': (
+            f"{len(recommended)} recommended, {len(created)} created, "
+            f"{len(dropped)} unused{' dropped' if apply else ''}"
+        ),
+        'recommended': recommended,
+        'created': created,
+        'dropped': dropped,
+        'errors': errors,
+    }
@@ -0,0 +1,92 @@
+"""
+Celery queue depth and task latency statistics, stored in the Redis broker.
+"""
+
+import json
+import time
+import logging
+
+from django.conf import settings
+
+from .locks import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Keep this many recent latency samples per queue for percentiles
+SAMPLES = 500
+
+# kombu's Redis transport stores priority levels as extra lists
+PRIORITY_SEP = '\x06\x16'
+PRIORITY_STEPS = (3, 6, 9)
+
+
+def record_latency(queue, sent_at):
+    """
+    Record the time a task spent waiting in its queue.
+    """
+    latency_ms = (time.time() - sent_at) * 1000
+    key = f'layers:queue-latency:{queue}'
+    try:
+        pipe = get_redis().pipeline()
+        pipe.lpush(key, round(latency_ms, 1))
+        pipe.ltrim(key, 0, SAMPLES - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Failed to record queue latency: {e}")
+
+
+def queue_keys(queue):
+    """Redis list keys holding messages of a queue."""
+    return [queue] + [f'{queue}{PRIORITY_SEP}{p}' for p in PRIORITY_STEPS]
+
+
+def oldest_message_age(client, queue):
+    """
+    Age in seconds of the oldest waiting message, from its sent_at header.
+    """
+    ages = []
+    for key in queue_keys(queue):
+        raw = client.lindex(key, -1)  # kombu pushes left, pops right
+        if not raw:
+            continue
+        try:
+            sent_at = json.loads(raw).get('headers', {}).get('sent_at')
+        except ValueError:
+            continue
+        if sent_at:
+            ages.append(time.time() - sent_at)
+    return max(ages) if ages else None
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def queue_report(queues=None):
+    """
+    Depth and latency statistics per queue.
+
+    Returns:
+        list of dicts with 'queue', 'depth', 'oldest_s', 'samples',
+        'p50_ms', 'p95_ms' and 'max_ms'
+    """
+    client = get_redis()
+    queues = queues or getattr(settings, 'CELERY_QUEUE_NAMES', ['celery'])
+    report = []
+    for queue in queues:
+        depth = sum(client.llen(key) for key in queue_keys(queue))
+        samples = sorted(float(v) for v in client.lrange(f'layers:queue-latency:{queue}', 0, -1))
+        report.append({
+            'queue': queue,
+            'depth': depth,
+            'oldest_s': oldest_message_age(client, queue),
+            'samples': len(samples),
+            'p50_ms': percentile(samples, 0.5),
+            'p95_ms': percentile(samples, 0.95),
+            'max_ms': samples[-1] if samples else None,
+        })
+    return report
@@ -0,0 +1,156 @@
+"""
+Raster import utilities.
+Uses GDAL command line tools to convert uploads into Cloud-Optimized GeoTIFFs.
+"""
+
+import json
+import os
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def convert_to_cog(source_path, output_path, compress='DEFLATE', blocksize=512):
+    """
+    Convert a raster into a tiled, compressed Cloud-Optimized GeoTIFF
+    with internal overviews.
+
+    Readers (GeoServer, the tile endpoint) then fetch only the blocks and
+    overview level they need instead of decoding the full image.
+
+    Args:
+        source_path: Path to source raster (GeoTIFF or anything GDAL reads)
+        output_path: Path for the resulting COG
+        compress: Compression codec (DEFLATE, LZW, ZSTD)
+        blocksize: Internal tile size in pixels
+
+    Returns:
+        dict with 'success' and 'message'
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    cmd = [
+        '/usr/bin/gdal_translate',
+        '-of', 'COG',
+        '-co', f'COMPRESS={compress}',
+        '-co', 'PREDICTOR=YES',         # Better compression for DEMs
+        '-co', f'BLOCKSIZE={blocksize}',
+        '-co', 'OVERVIEWS=IGNORE_EXISTING',
+        '-co', 'RESAMPLING=AVERAGE',
+        '-co', 'NUM_THREADS=ALL_CPUS',
+        '-co', 'BIGTIFF=IF_SAFER',
+        source_path,
+        output_path,
+    ]
+
+    logger.info(f"Running gdal_translate: {source_path} -> {output_path}")
+
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=600  # 10 minute timeout
+        )
+        if result.returncode != 0:
+            logger.error(f"gdal_translate failed: {result.stderr}")
+            return {'success': False, 'message': f"gdal_translate error: {result.stderr}"}
+        return {'success': True, 'message': f"Converted to COG: {output_path}"}
+
+    except subprocess.TimeoutExpired:
+        return {'success': False, 'message': "Conversion timed out (>10 minutes)"}
+    except Exception as e:
+        logger.exception("COG conversion failed")
+        return {'success': False, 'message': str(e)}
+
+
+def get_raster_info(path):
+    """
+    Get raster metadata and band statistics via gdalinfo.
+
+    Returns:
+        dict with 'bbox' (WGS84 west/south/east/north), 'width', 'height',
+        'srs', 'overviews' (list of [width, height]) and 'bands'
+        (list of dicts with 'min', 'max', 'mean', 'std', 'nodata'), or None
+    """
+    try:
+        result = subprocess.run(
+            ['/usr/bin/gdalinfo', '-json', '-stats', path],
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+        if result.returncode != 0:
+            logger.error(f"gdalinfo failed: {result.stderr}")
+            return None
+        info = json.loads(result.stdout)
+    except Exception as e:
+        logger.error(f"Failed to read raster info: {e}")
+        return None
+
+    bbox = None
+    extent = info.get('wgs84Extent', {}).get('coordinates')
+    if extent:
+        xs = [pt[0] for pt in extent[0]]
+        ys = [pt[1] for pt in extent[0]]
+        bbox = {'west': min(xs), 'south': min(ys), 'east': max(xs), 'north': max(ys)}
+
+    bands = []
+    for band in info.get('bands', []):
+        bands.append({
+            'min': band.get('minimum'),
+            'max': band.get('maximum'),
+            'mean': band.get('mean'),
+            'std': band.get('stdDev'),
+            'nodata': band.get('noDataValue'),
+        })
+
+    overviews = []
+    if info.get('bands'):
+        overviews = [ov['size'] for ov in info['bands'][0].get('overviews', [])]
+
+    width, height = info.get('size', [None, None])
+    return {
+        'bbox': bbox,
+        'width': width,
+        'height': height,
+        'srs': info.get('coordinateSystem', {}).get('wkt', ''),
+        'overviews': overviews,
+        'bands': bands,
+    }
+
+
+def import_raster_file(source_path, output_path):
+    """
+    High-level function to import a raster: convert to COG and read
+    its bbox and statistics.
+
+    Returns:
+        dict with 'success', 'message', 'path', 'bbox' and 'stats'
+    """
+    result = convert_to_cog(source_path, output_path)
+    if not result['success']:
+        return result
+
+    info = get_raster_info(output_path)
+    if info is None:
+        return {'success': False, 'message': f"Cannot read converted raster {output_path}"}
+
+    logger.info(
+        f"COG ready: {info['width']}x{info['height']}, "
+        f"{len(info['overviews'])} overviews, {len(info['bands'])} bands"
+    )
+
+    return {
+        'success': True,
+        'message': f"Converted {info['width']}x{info['height']} raster to COG",
+        'path': output_path,
+        'bbox': info['bbox'],
+        'stats': {
+            'width': info['width'],
+            'height': info['height'],
+            'overviews': info['overviews'],
+            'bands': info['bands'],
+        },
+    }
@@ -0,0 +1,181 @@
+"""
+Reconciliation of Layer records against GeoServer and PostGIS.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+from .geoserver_api import get_client
+from .import_utils import subdivided_table_name, mercator_table_name
+
+logger = logging.getLogger(__name__)
+
+
+def list_postgis_layer_tables():
+    """
+    List all tables with a geometry column in the public schema.
+
+    Returns:
+        set of table names
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT DISTINCT f_table_name
+            FROM geometry_columns
+            WHERE f_table_schema = 'public'
+        ''')
+        return {row[0] for row in cursor.fetchall()}
+
+
+def fetch_geoserver_state(workspaces, store_name='postgis'):
+    """
+    List feature types, coverage stores and layers of all workspaces
+    concurrently over the pooled GeoServer client.
+
+    Returns:
+        dict mapping 'workspace:name' to kind ('featuretype' or 'coverage'),
+        plus a set of 'workspace:name' layers; None if GeoServer failed
+    """
+    client = get_client()
+    with ThreadPoolExecutor(max_workers=min(8, 3 * len(workspaces))) as pool:
+        futures = {
+            ws: (
+                pool.submit(client.list_featuretypes, ws, store_name),
+                pool.submit(client.list_coverage_stores, ws),
+                pool.submit(client.list_layers, ws),
+            )
+            for ws in workspaces
+        }
+
+    resources = {}
+    published = set()
+    for ws, (ft_future, cov_future, layer_future) in futures.items():
+        feature_types, coverages, layers = ft_future.result(), cov_future.result(), layer_future.result()
+        if feature_types is None or coverages is None or layers is None:
+            return None, None
+        resources.update({f"{ws}:{name}": 'featuretype' for name in feature_types})
+        resources.update({f"{ws}:{name}": 'coverage' for name in coverages})
+        published.update(f"{ws}:{name}" for name in layers)
+    return resources, published
+
+
+def reconcile_layers(fix=False):
+    """
+    Diff Layer rows against GeoServer and PostGIS.
+
+    Drift categories:
+        missing_table      — Layer.postgis_table does not exist in the DB
+        missing_geoserver  — Layer.geoserver_layer_name is not published
+        unpublished        — table exists but the layer has no GeoServer name
+        orphan_tables      — spatial tables no Layer refers to
+        orphan_geoserver   — GeoServer resources no Layer refers to
+
+    Args:
+        fix: Republish layers missing in GeoServer (when their table exists)
+            and clear references to tables that no longer exist
+
+    Returns:
+        dict with one list per drift category plus 'fixed', or
+        {'success': False, 'message': ...} if GeoServer is unreachable
+    """
+    from .models import Layer
+
+    layers = list(Layer.objects.only(
+        'id', 'slug', 'title', 'layer_type', 'postgis_table', 'geoserver_layer_name'
+    ))
+    default_ws = settings.GEOSERVER_WORKSPACE
+    workspaces = {default_ws} | {
+        layer.geoserver_layer_name.split(':', 1)[0]
+        for layer in layers if ':' in layer.geoserver_layer_name
+    }
+
+    tables = list_postgis_layer_tables()
+    resources, published = fetch_geoserver_state(sorted(workspaces))
+    if resources is None:
+        return {'success': False, 'message': 'Failed to list GeoServer resources'}
+
+    report = {
+        'missing_table': [],
+        'missing_geoserver': [],
+        'unpublished': [],
+        'orphan_tables': [],
+        'orphan_geoserver': [],
+        'fixed': [],
+    }
+
+    known_tables = set()
+    known_resources = set()
+    to_republish = []
+    to_clear = []
+
+    for layer in layers:
+        gs_name = layer.geoserver_layer_name
+        if gs_name:
+            known_resources.add(gs_name)
+        if layer.postgis_table:
+            known_tables.add(layer.postgis_table)
+            known_tables.add(subdivided_table_name(layer.postgis_table))
+            known_tables.add(mercator_table_name(layer.postgis_table))
+
+        if layer.layer_type == 'vector' and layer.postgis_table and layer.postgis_table not in tables:
+            report['missing_table'].append(layer.slug)
+            to_clear.append(layer)
+            continue
+
+        if gs_name and (gs_name not in resources or gs_name not in published):
+            report['missing_geoserver'].append(layer.slug)
+            if layer.layer_type == 'vector' and layer.postgis_table:
+                to_republish.append(layer)
+        elif not gs_name and layer.postgis_table:
+            report['unpublished'].append(layer.slug)
+            to_republish.append(layer)
+
+    report['orphan_tables'] = sorted(tables - known_tables)
+    report['orphan_geoserver'] = sorted(set(resources) - known_resources)
+
+    if fix:
+        report['fixed'] = fix_drift(to_republish, to_clear, default_ws)
+
+    logger.info(
+        "Reconcile: " + ", ".join(f"{key}={len(value)}" for key, value in report.items())
+    )
+    report['success'] = True
+    return report
+
+
+def fix_drift(to_republish, to_clear, default_workspace):
+    """
+    Republish layers missing in GeoServer and clear references to
+    dropped tables.
+
+    Returns:
+        list of fixed layer slugs
+    """
+    from .geoserver_api import publish_layers
+
+    fixed = []
+
+    for layer in to_clear:
+        layer.postgis_table = ''
+        layer.geoserver_layer_name = ''
+        layer.feature_count = 0
+        layer.save(update_fields=['postgis_table', 'geoserver_layer_name', 'feature_count'])
+        fixed.append(layer.slug)
+
+    by_workspace = {}
+    for layer in to_republish:
+        ws = layer.geoserver_layer_name.split(':', 1)[0] if ':' in layer.geoserver_layer_name else default_workspace
+        by_workspace.setdefault(ws, []).append(layer)
+
+    for ws, ws_layers in by_workspace.items():
+        results = publish_layers([(layer.postgis_table, layer.title) for layer in ws_layers], workspace=ws)
+        for layer in ws_layers:
+            if results[layer.postgis_table]['success']:
+                layer.geoserver_layer_name = f"{ws}:{layer.postgis_table}"
+                layer.save(update_fields=['geoserver_layer_name'])
+                fixed.append(layer.slug)
+
+    return fixed
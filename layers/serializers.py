@@ -3,6 +3,7 @@ REST API serializers for geoportal layers.
 """
 
 from rest_framework import serializers
+from .classify import METHODS, RAMPS
 from .gdrive_utils import get_gdrive_images
 from .models import MapProject, Layer, LayerAttribute, FeatureContent, FeatureImage, LayerStyle
 
@@ -10,7 +11,7 @@ from .models import MapProject, Layer, LayerAttribute, FeatureContent, FeatureIm
 class LayerAttributeSerializer(serializers.ModelSerializer):
     class Meta:
         model = LayerAttribute
-        fields = ['field_name', 'display_name', 'show_in_popup', 'sort_order']
+        fields = ['field_name', 'display_name', 'show_in_popup', 'sort_order', 'data_type', 'distinct_count']
 
 
 class FeatureImageSerializer(serializers.ModelSerializer):
@@ -63,33 +64,15 @@ class FeatureContentSerializer(serializers.ModelSerializer):
         return None
 
 
-class FeatureContentBriefSerializer(serializers.ModelSerializer):
-    """Brief version for listing."""
-    main_image_url = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = FeatureContent
-        fields = ['feature_id', 'title', 'main_image_url']
-    
-    def get_main_image_url(self, obj):
-        # Приоритет: внешняя ссылка, затем загруженный файл
-        if obj.image_url:
-            return obj.image_url
-        if obj.main_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.main_image.url)
-            return obj.main_image.url
-        return None
-
-
 class LayerStyleSerializer(serializers.ModelSerializer):
     class Meta:
         model = LayerStyle
         fields = [
             'id', 'attribute_field', 'attribute_value',
+            'value_min', 'value_max', 'is_default',
             'fill_color', 'stroke_color', 'stroke_width',
-            'fill_opacity', 'radius', 'legend_label', 'sort_order'
+            'fill_opacity', 'radius', 'legend_label', 'sort_order',
+            'feature_count', 'total_area', 'total_length',
         ]
 
 class LayerSerializer(serializers.ModelSerializer):
@@ -97,7 +80,7 @@ class LayerSerializer(serializers.ModelSerializer):
     layer_type_display = serializers.CharField(
         source='get_layer_type_display', read_only=True
     )
-    feature_contents = FeatureContentBriefSerializer(many=True, read_only=True)
+    content_count = serializers.IntegerField(read_only=True)
     styles = LayerStyleSerializer(many=True, read_only=True)
 
     class Meta:
@@ -110,12 +93,16 @@ class LayerSerializer(serializers.ModelSerializer):
             'sort_order', 'stroke_color', 'stroke_width',
             'fill_color', 'fill_opacity', 'feature_count',
             'bbox_west', 'bbox_south', 'bbox_east', 'bbox_north',
-            'attributes', 'feature_contents', 'styles', 'created_at', 'updated_at',
+            'data_version', 'style_version', 'content_version',
+            'wfs_url', 'tile_url', 'content_ids_url', 'content_count',
+            'attributes', 'styles', 'created_at', 'updated_at',
         ]
 
 
 class LayerBriefSerializer(serializers.ModelSerializer):
     """Short version for project listings."""
+    content_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Layer
         fields = [
@@ -123,6 +110,8 @@ class LayerBriefSerializer(serializers.ModelSerializer):
             'geoserver_layer_name', 'default_visible', 'opacity',
             'sort_order', 'feature_count',
             'stroke_color', 'stroke_width', 'fill_color', 'fill_opacity',
+            'data_version', 'style_version', 'content_version',
+            'wms_url', 'wfs_url', 'tile_url', 'content_ids_url', 'content_count',
         ]
 
 
@@ -158,3 +147,13 @@ class MapProjectListSerializer(serializers.ModelSerializer):
         return obj.layers.count()
 
 
+class ClassifyRequestSerializer(serializers.Serializer):
+    """Input of the style classification endpoint."""
+    field = serializers.CharField(max_length=100)
+    method = serializers.ChoiceField(choices=list(METHODS))
+    classes = serializers.IntegerField(min_value=2, max_value=15, default=5)
+    top_n = serializers.IntegerField(min_value=1, max_value=50, default=10)
+    ramp = serializers.ChoiceField(choices=list(RAMPS), default='green')
+    replace = serializers.BooleanField(default=True)
+    push_sld = serializers.BooleanField(default=False)
+
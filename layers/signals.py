@@ -0,0 +1,107 @@
+"""
+Signal handlers for the layers app.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import FeatureContent, Layer, LayerStyle
+
+
+# Layer fields that end up in the compiled SLD
+STYLE_FIELDS = ('sld_style', 'stroke_color', 'stroke_width', 'fill_color', 'fill_opacity', 'geom_type')
+
+
+@receiver(pre_save, sender=Layer)
+def remember_layer_style(sender, instance, **kwargs):
+    """Keep the stored style fields to detect changes in post_save."""
+    if instance.pk:
+        instance._old_style = (
+            Layer.objects.filter(pk=instance.pk).values_list(*STYLE_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Layer)
+def publish_on_style_change(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Republish the SLD (and reseed tiles) when a layer's style fields
+    change; style_version is bumped once GeoServer has the new style.
+    """
+    from .tasks import schedule_style_publish
+    
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(STYLE_FIELDS):
+        return
+    style = tuple(getattr(instance, field) for field in STYLE_FIELDS)
+    if getattr(instance, '_old_style', style) == style:
+        return
+    if instance.geoserver_layer_name:
+        transaction.on_commit(lambda: schedule_style_publish(instance.pk))
+
+
+@receiver(post_save, sender=LayerStyle)
+@receiver(post_delete, sender=LayerStyle)
+def publish_on_layer_style_change(sender, instance, **kwargs):
+    """
+    Republish the layer's SLD (and reseed tiles) when a category style
+    rule changes.
+    """
+    from .tasks import schedule_style_publish
+    
+    layer_id = instance.layer_id
+    transaction.on_commit(lambda: schedule_style_publish(layer_id))
+
+
+@receiver(pre_save, sender=LayerStyle)
+def remember_style_rule(sender, instance, **kwargs):
+    """Keep the stored rule to detect rule changes in post_save."""
+    if instance.pk:
+        instance._old_rule = (
+            LayerStyle.objects.filter(pk=instance.pk)
+            .values_list('attribute_field', 'attribute_value', 'value_min', 'value_max', 'is_default')
+            .first()
+        )
+
+
+@receiver(post_save, sender=LayerStyle)
+def refresh_legend_on_rule_change(sender, instance, created, **kwargs):
+    """Recount the features of a style rule whose match condition changed."""
+    from .tasks import refresh_legend_counts_task
+    
+    rule = (
+        instance.attribute_field, instance.attribute_value,
+        instance.value_min, instance.value_max, instance.is_default,
+    )
+    if created or getattr(instance, '_old_rule', rule) != rule:
+        layer_id, style_id = instance.layer_id, instance.pk
+        transaction.on_commit(lambda: refresh_legend_counts_task.delay(layer_id, [style_id]))
+
+
+@receiver(pre_save, sender=FeatureContent)
+def remember_content_flag(sender, instance, **kwargs):
+    """Keep the stored feature key and publish flag to detect changes in post_save."""
+    if instance.pk:
+        instance._old_flag = (
+            FeatureContent.objects.filter(pk=instance.pk)
+            .values_list('layer_id', 'feature_id', 'is_published')
+            .first()
+        )
+
+
+@receiver(post_save, sender=FeatureContent)
+@receiver(post_delete, sender=FeatureContent)
+def bump_content_version(sender, instance, signal, created=False, **kwargs):
+    """
+    Bump content_version of the layers whose has_content flags changed,
+    so cached tiles and GeoJSON with those flags get new URLs. Edits of
+    the text or images alone leave the flags, and the caches, intact.
+    """
+    flag = (instance.layer_id, instance.feature_id, instance.is_published)
+    old = getattr(instance, '_old_flag', None)
+    if signal is post_save and not created and old == flag:
+        return
+    layer_ids = {instance.layer_id} | ({old[0]} if old else set())
+    Layer.objects.filter(pk__in=layer_ids).update(content_version=F('content_version') + 1)
@@ -0,0 +1,254 @@
+"""
+SLD generation from LayerStyle rules and Layer quick-style fields, for
+server-side rendering in GeoServer.
+"""
+
+import hashlib
+import logging
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+SLD_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<StyledLayerDescriptor version="1.0.0"
+    xmlns="http://www.opengis.net/sld"
+    xmlns:ogc="http://www.opengis.net/ogc"
+    xmlns:xlink="http://www.w3.org/1999/xlink"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xsi:schemaLocation="http://www.opengis.net/sld http://schemas.opengis.net/sld/1.0.0/StyledLayerDescriptor.xsd">
+  <NamedLayer>
+    <Name>{name}</Name>
+    <UserStyle>
+      <Title>{title}</Title>
+      <FeatureTypeStyle>
+{rules}
+      </FeatureTypeStyle>
+    </UserStyle>
+  </NamedLayer>
+</StyledLayerDescriptor>
+'''
+
+
+# Geometry classes of a mixed layer: (geom_type, dimension of the geometry)
+GEOMETRY_CLASSES = [('polygon', 2), ('line', 1), ('point', 0)]
+
+
+def css(name, value):
+    """One SLD CssParameter."""
+    return f'<CssParameter name="{name}">{escape(str(value))}</CssParameter>'
+
+
+def symbolizer(geom_type, fill_color, stroke_color, stroke_width, fill_opacity, radius):
+    """
+    SLD symbolizer for a geometry type ('point', 'line' or 'polygon').
+    """
+    fill = f'<Fill>{css("fill", fill_color)}{css("fill-opacity", fill_opacity)}</Fill>'
+    stroke = f'<Stroke>{css("stroke", stroke_color)}{css("stroke-width", stroke_width)}</Stroke>'
+    if geom_type == 'point':
+        return (
+            f'<PointSymbolizer><Graphic><Mark><WellKnownName>circle</WellKnownName>'
+            f'{fill}{stroke}</Mark><Size>{radius * 2}</Size></Graphic></PointSymbolizer>'
+        )
+    if geom_type == 'line':
+        return f'<LineSymbolizer><Stroke>{css("stroke", fill_color)}{css("stroke-width", stroke_width)}</Stroke></LineSymbolizer>'
+    return f'<PolygonSymbolizer>{fill}{stroke}</PolygonSymbolizer>'
+
+
+def property_filter(operator, field, value):
+    """One OGC comparison on a property."""
+    return (
+        f'<ogc:{operator}><ogc:PropertyName>{escape(field)}</ogc:PropertyName>'
+        f'<ogc:Literal>{escape(str(value))}</ogc:Literal></ogc:{operator}>'
+    )
+
+
+def dimension_filter(dimension):
+    """OGC condition on the dimension of the geometry (0 point, 1 line, 2 polygon)."""
+    return (
+        '<ogc:PropertyIsEqualTo><ogc:Function name="dimension">'
+        '<ogc:PropertyName>geom</ogc:PropertyName></ogc:Function>'
+        f'<ogc:Literal>{dimension}</ogc:Literal></ogc:PropertyIsEqualTo>'
+    )
+
+
+def combine(operator, conditions):
+    """Join OGC conditions with ogc:And / ogc:Or; a single one is returned as is."""
+    if len(conditions) == 1:
+        return conditions[0]
+    return f'<ogc:{operator}>{"".join(conditions)}</ogc:{operator}>'
+
+
+def style_condition(style):
+    """
+    OGC condition of a value or range LayerStyle rule: equality, or a
+    [min, max) range with open ends.
+    """
+    if style.is_range:
+        parts = []
+        if style.value_min is not None:
+            parts.append(property_filter('PropertyIsGreaterThanOrEqualTo', style.attribute_field, style.value_min))
+        if style.value_max is not None:
+            parts.append(property_filter('PropertyIsLessThan', style.attribute_field, style.value_max))
+        return combine('And', parts)
+    return property_filter('PropertyIsEqualTo', style.attribute_field, style.attribute_value)
+
+
+def paint_rules(layer, name, title, paint, condition=None, else_of=None):
+    """
+    SLD Rules painting the features matching an OGC condition, or with
+    else_of (the conditions of all other rules) those no other rule
+    matched; neither means every feature.
+
+    A mixed ('multi') layer gets one rule per geometry class, filtered on
+    the dimension of the geometry, so polygons and lines are not marked
+    with circles and closed lines are not filled. An ElseFilter cannot be
+    combined with that filter, so there it is spelled out as Not(Or(...)).
+
+    Args:
+        paint: (fill_color, stroke_color, stroke_width, fill_opacity, radius)
+
+    Returns:
+        list of Rule XML strings
+    """
+    head = f'        <Rule><Name>{escape(name)}</Name><Title>{escape(title)}</Title>'
+    if layer.geom_type != 'multi':
+        if else_of is not None:
+            rule_filter = '<ElseFilter/>'
+        elif condition:
+            rule_filter = f'<ogc:Filter>{condition}</ogc:Filter>'
+        else:
+            rule_filter = ''
+        return [f'{head}{rule_filter}{symbolizer(layer.geom_type, *paint)}</Rule>']
+
+    if else_of:
+        condition = f'<ogc:Not>{combine("Or", else_of)}</ogc:Not>'
+    return [
+        f'{head}<ogc:Filter>{combine("And", [c for c in (condition, dimension_filter(dimension)) if c])}</ogc:Filter>'
+        f'{symbolizer(geom_type, *paint)}</Rule>'
+        for geom_type, dimension in GEOMETRY_CLASSES
+    ]
+
+
+def style_rules(layer, style, others):
+    """
+    SLD Rules for one LayerStyle; the 'other' rule gets the features that
+    match none of `others` (the conditions of the value and range rules).
+    """
+    title = style.legend_label or style.attribute_value or 'Прочие'
+    paint = (style.fill_color, style.stroke_color, style.stroke_width, style.fill_opacity, style.radius)
+    if style.is_default:
+        return paint_rules(layer, title, title, paint, else_of=others)
+    return paint_rules(layer, title, title, paint, style_condition(style))
+
+
+def base_rules(layer, others=None):
+    """
+    SLD Rules from the layer's quick-style fields; with `others` they
+    only apply to features no category rule matched.
+    """
+    paint = (layer.fill_color, layer.stroke_color, layer.stroke_width, layer.fill_opacity, 8)
+    return paint_rules(layer, 'default', layer.title, paint, else_of=others)
+
+
+def build_sld(layer, styles):
+    """
+    Build an SLD document with one rule per LayerStyle (per geometry
+    class on mixed layers).
+
+    Features matched by no rule fall back to the layer's quick style,
+    as on the client, unless an 'other' rule exists.
+
+    Returns:
+        SLD 1.0 XML string
+    """
+    # ElseFilter rules must come last
+    styles = sorted(styles, key=lambda s: (s.is_default, s.sort_order))
+    others = [style_condition(style) for style in styles if not style.is_default]
+    rules = []
+    for style in styles:
+        rules += style_rules(layer, style, others)
+    if not any(style.is_default for style in styles):
+        rules += base_rules(layer, others if styles else None)
+    return SLD_TEMPLATE.format(
+        name=escape(layer.postgis_table or layer.slug),
+        title=escape(layer.title),
+        rules='\n'.join(rules),
+    )
+
+
+def compile_layer_sld(layer):
+    """
+    SLD for a layer: the hand-written sld_style if set, otherwise
+    compiled from the LayerStyle rules and quick-style fields (vector
+    layers only).
+
+    Returns:
+        SLD XML string, or None if the layer has nothing to compile
+    """
+    if layer.sld_style.strip():
+        return layer.sld_style
+    if layer.layer_type != 'vector':
+        return None
+    return build_sld(layer, layer.styles.all())
+
+
+def sld_digest(sld_body):
+    """Hash identifying a compiled SLD."""
+    return hashlib.sha256(sld_body.encode('utf-8')).hexdigest()
+
+
+def style_name(layer):
+    """GeoServer style name for a layer."""
+    return f'{layer.slug.replace("-", "_")}_style'
+
+
+def publish_layer_style(layer, force=False):
+    """
+    Compile the layer's SLD and upload/assign it in GeoServer, unless
+    the same SLD (by hash) was already published. style_version is
+    bumped only once GeoServer has the new style.
+
+    Args:
+        layer: Layer instance
+        force: Upload even if the hash is unchanged (e.g. after the
+            layer was re-created in GeoServer)
+
+    Returns:
+        dict with 'success', 'message' and 'changed' keys
+    """
+    sld_body = compile_layer_sld(layer)
+    if sld_body is None:
+        return {'success': True, 'message': 'Nothing to publish', 'changed': False}
+
+    digest = sld_digest(sld_body)
+    if digest == layer.sld_hash and not force:
+        return {'success': True, 'message': 'Style unchanged', 'changed': False}
+
+    result = push_layer_sld(layer, sld_body)
+    result['changed'] = result['success']
+    if result['success']:
+        layer.sld_hash = digest
+        layer.save(update_fields=['sld_hash'])
+        # GeoServer serves the new style from now on
+        layer.bump_version('style_version')
+    return result
+
+
+def push_layer_sld(layer, sld_body):
+    """
+    Upload an SLD as the layer's style and make it the default style.
+
+    Returns:
+        dict with 'success' and 'message' keys
+    """
+    from .geoserver_api import assign_style, upload_style
+
+    if not layer.geoserver_layer_name:
+        return {'success': False, 'message': 'Layer is not published'}
+
+    workspace = layer.geoserver_layer_name.split(':', 1)[0]
+    name = style_name(layer)
+    result = upload_style(name, sld_body, workspace)
+    if result['success']:
+        result = assign_style(layer.geoserver_layer_name, name, workspace)
+    return result
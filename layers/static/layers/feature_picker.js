@@ -0,0 +1,60 @@
+// Feature picker for FeatureContent.feature_id: searches the selected
+// layer's PostGIS table on the server and fills in the chosen gid.
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('.feature-picker').forEach((picker) => {
+        const input = document.getElementById(picker.dataset.input);
+        const results = picker.querySelector('.feature-picker-results');
+
+        const search = async () => {
+            const layer = document.getElementById('id_layer');
+            if (!layer || !layer.value) {
+                results.textContent = 'Сначала выберите слой';
+                return;
+            }
+            const params = new URLSearchParams({
+                layer: layer.value,
+                q: picker.querySelector('.feature-picker-query').value,
+                field: picker.querySelector('.feature-picker-field').value,
+                bbox: picker.querySelector('.feature-picker-bbox').value,
+            });
+            results.textContent = 'Поиск…';
+            try {
+                const res = await fetch(`${picker.dataset.url}?${params}`, { credentials: 'same-origin' });
+                const data = await res.json();
+                results.textContent = '';
+                if (!res.ok) {
+                    results.textContent = data.error || 'Ошибка поиска';
+                    return;
+                }
+                if (!data.results.length) {
+                    results.textContent = 'Ничего не найдено';
+                    return;
+                }
+                data.results.forEach((item) => {
+                    const li = document.createElement('li');
+                    const link = document.createElement('a');
+                    link.href = '#';
+                    link.textContent = `#${item.id} ${item.label || ''}${item.has_content ? ' (контент уже есть)' : ''}`;
+                    link.addEventListener('click', (e) => {
+                        e.preventDefault();
+                        input.value = item.id;
+                    });
+                    li.appendChild(link);
+                    results.appendChild(li);
+                });
+            } catch (err) {
+                results.textContent = 'Ошибка поиска';
+            }
+        };
+
+        picker.querySelector('.feature-picker-search').addEventListener('click', search);
+        picker.querySelectorAll('input').forEach((el) => {
+            el.addEventListener('keydown', (e) => {
+                if (e.key === 'Enter') {
+                    e.preventDefault();
+                    search();
+                }
+            });
+        });
+    });
+});
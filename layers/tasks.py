@@ -3,30 +3,257 @@ Celery tasks for layer import and publishing.
 """
 
 import os
+import time
+import shutil
 import logging
+import tempfile
 from celery import shared_task
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=2)
-def import_layer_task(self, layer_id):
+GEOM_TYPE_MAP = {
+    'POINT': 'point',
+    'MULTIPOINT': 'point',
+    'LINESTRING': 'line',
+    'MULTILINESTRING': 'line',
+    'POLYGON': 'polygon',
+    'MULTIPOLYGON': 'polygon',
+}
+
+
+def save_import_metadata(layer, table_name, result):
     """
-    Background task to import a layer file into PostGIS and publish to GeoServer.
+    Store import results on a Layer: table name, feature count, geometry
+    type, bbox, and LayerAttribute rows for the table columns.
+    
+    data_version is left alone: record_vector_publish bumps it once the
+    new table is published.
+    """
+    from .models import LayerAttribute
+    
+    layer.postgis_table = table_name
+    layer.feature_count = result['feature_count']
+    
+    # Convert geometry type
+    geom_type = (result.get('geom_type') or '').upper()
+    layer.geom_type = GEOM_TYPE_MAP.get(geom_type, 'multi')
+    
+    # Set bbox
+    bbox = result.get('bbox')
+    if bbox:
+        layer.bbox_west = bbox['west']
+        layer.bbox_south = bbox['south']
+        layer.bbox_east = bbox['east']
+        layer.bbox_north = bbox['north']
+    
+    layer.save()
+    
+    # Create LayerAttribute entries for columns (one bulk upsert)
+    columns = result.get('columns', [])
+    LayerAttribute.objects.bulk_create(
+        [
+            LayerAttribute(
+                layer=layer,
+                field_name=col['name'],
+                display_name=col['name'].replace('_', ' ').title(),
+                show_in_popup=True,
+                sort_order=i,
+                data_type=col.get('data_type', 'text'),
+                distinct_count=col.get('distinct'),
+            )
+            for i, col in enumerate(columns)
+        ],
+        update_conflicts=True,
+        unique_fields=['layer', 'field_name'],
+        update_fields=['display_name', 'show_in_popup', 'sort_order', 'data_type', 'distinct_count'],
+    )
+    
+    refresh_legend_counts(layer)
+
+
+def refresh_legend_counts(layer, styles=None):
+    """
+    Store feature counts (and area/length sums for polygons/lines) on a
+    layer's LayerStyle rules: one GROUP BY query per classification field
+    for value rules, one scan for all range rules of a field. The
+    'other' rule gets whatever the field's value rules do not match.
     
     Args:
-        layer_id: ID of the Layer model instance
+        layer: Layer with a PostGIS table
+        styles: Only refresh these rules (all rules of the layer if None)
+    
+    Returns:
+        number of updated rules
     """
-    from .models import Layer
-    from .import_utils import import_layer_file, get_table_columns
-    from .geoserver_api import publish_postgis_layer
+    from .import_utils import category_stats, get_table_column_types, range_stats
+    from .models import LayerStyle
     
-    try:
-        layer = Layer.objects.get(pk=layer_id)
-    except Layer.DoesNotExist:
-        logger.error(f"Layer {layer_id} not found")
-        return {'success': False, 'message': 'Layer not found'}
+    partial = styles is not None
+    styles = list(styles if partial else layer.styles.all())
+    if not styles or not layer.postgis_table:
+        return 0
+    
+    columns = {name for name, _ in get_table_column_types(layer.postgis_table)}
+    measures = {
+        'area': layer.geom_type in ('polygon', 'multi'),
+        'length': layer.geom_type in ('line', 'multi'),
+    }
+    by_field = {}
+    for style in styles:
+        style.feature_count, style.total_area, style.total_length = 0, None, None
+        by_field.setdefault(style.attribute_field, []).append(style)
+    
+    for field, field_styles in by_field.items():
+        if field not in columns:
+            logger.warning(f"Layer '{layer.slug}' has no field '{field}' used by its styles")
+            continue
+        
+        value_styles = [s for s in field_styles if not s.is_range and not s.is_default]
+        range_styles = [s for s in field_styles if s.is_range]
+        other_styles = [s for s in field_styles if s.is_default]
+        
+        if value_styles or other_styles:
+            # The 'other' rule needs every value of the field
+            values = [s.attribute_value for s in value_styles] if partial and not other_styles else None
+            stats = category_stats(layer.postgis_table, field, values, **measures)
+            for style in value_styles:
+                style.feature_count, style.total_area, style.total_length = stats.get(
+                    style.attribute_value, (0, None, None)
+                )
+        
+        if range_styles:
+            ranges = [(s.value_min, s.value_max) for s in range_styles]
+            for style, row in zip(range_styles, range_stats(layer.postgis_table, field, ranges, **measures)):
+                style.feature_count, style.total_area, style.total_length = row
+        
+        if other_styles:
+            matched = set(
+                layer.styles.filter(
+                    attribute_field=field, is_default=False,
+                    value_min__isnull=True, value_max__isnull=True,
+                ).values_list('attribute_value', flat=True)
+            )
+            rest = [row for value, row in stats.items() if value not in matched]
+            for style in other_styles:
+                style.feature_count = sum(row[0] for row in rest)
+                style.total_area = sum(row[1] or 0 for row in rest) if measures['area'] else None
+                style.total_length = sum(row[2] or 0 for row in rest) if measures['length'] else None
+    
+    LayerStyle.objects.bulk_update(styles, ['feature_count', 'total_area', 'total_length'])
+    return len(styles)
+
+
+def is_raster_layer(layer):
+    """Raster layers: layer_type 'raster' or a GeoTIFF source file."""
+    from .import_utils import get_file_type
+    
+    return layer.layer_type == 'raster' or bool(
+        layer.source_file and get_file_type(layer.source_file.name) == 'geotiff'
+    )
+
+
+def import_raster_layer(layer, publish=True):
+    """
+    Convert a raster layer's upload into a Cloud-Optimized GeoTIFF, store
+    it as Layer.raster_file with bbox and stats, and publish it to
+    GeoServer as a coverage store (unless publish=False).
+    """
+    from .models import raster_upload_path
+    from .raster_utils import import_raster_file
+    
+    source = layer.raster_file or layer.source_file
+    if not source:
+        return {'success': False, 'message': 'No raster file'}
+    
+    source_path = source.path
+    if not os.path.exists(source_path):
+        return {'success': False, 'message': f'File not found: {source_path}'}
+    
+    cog_name = raster_upload_path(layer, 'cog.tif')
+    cog_path = os.path.join(settings.MEDIA_ROOT, cog_name)
+    
+    logger.info(f"Starting raster import for layer '{layer.title}' -> '{cog_name}'")
+    
+    # Step 1: Convert to COG and collect stats
+    result = import_raster_file(source_path, cog_path)
+    if not result['success']:
+        logger.error(f"Raster import failed: {result['message']}")
+        return result
+    
+    # Step 2: Update layer model with metadata
+    old_raster = layer.raster_file.name if layer.raster_file else None
+    layer.layer_type = 'raster'
+    layer.geom_type = ''
+    layer.raster_file.name = cog_name
+    layer.raster_stats = result['stats']
+    layer.feature_count = 0
+    bbox = result.get('bbox')
+    if bbox:
+        layer.bbox_west = bbox['west']
+        layer.bbox_south = bbox['south']
+        layer.bbox_east = bbox['east']
+        layer.bbox_north = bbox['north']
+    layer.save()
+    
+    # The previous raster_file is superseded by the COG
+    if old_raster and old_raster != cog_name:
+        layer.raster_file.storage.delete(old_raster)
+    
+    response = {
+        'success': True,
+        'message': result['message'],
+        'raster_file': cog_name,
+    }
+    
+    # Step 3: Publish to GeoServer
+    if publish:
+        gs_result = publish_raster_layer(layer)
+        response['geoserver'] = gs_result['success']
+        response['geoserver_layer'] = layer.geoserver_layer_name
+    
+    return response
+
+
+def publish_raster_layer(layer):
+    """
+    Publish a raster layer's COG to GeoServer, record the layer name and
+    bump data_version so the new raster gets new tile and WMS URLs.
+    """
+    from .geoserver_api import publish_geotiff_layer
+    
+    workspace = settings.GEOSERVER_WORKSPACE
+    store_name = layer.slug.replace('-', '_')
+    gs_result = publish_geotiff_layer(
+        store_name=store_name,
+        file_path=layer.raster_file.path,
+        layer_title=layer.title,
+        workspace=workspace
+    )
+    
+    # Bumped even if publishing failed: the tile view already serves the COG
+    layer.bump_version('data_version')
+    if gs_result['success']:
+        layer.geoserver_layer_name = f"{workspace}:{store_name}"
+        layer.save()
+        logger.info(f"Raster '{layer.title}' published to GeoServer as {layer.geoserver_layer_name}")
+        schedule_layer_seed(layer.id, 'reseed')
+    else:
+        logger.warning(f"GeoServer publish failed: {gs_result['message']}")
+    
+    return gs_result
+
+
+def load_vector_layer(layer):
+    """
+    Import a vector layer's source file into PostGIS and store the
+    resulting metadata on the Layer (no GeoServer publishing).
+    
+    Returns:
+        dict with import results and 'table_name'
+    """
+    from .import_utils import import_layer_file
     
     # Check if source file exists
     if not layer.source_file:
@@ -42,68 +269,79 @@ def import_layer_task(self, layer_id):
     logger.info(f"Starting import for layer '{layer.title}' -> table '{table_name}'")
     
     # Step 1: Import to PostGIS
-    result = import_layer_file(file_path, table_name)
+    result = import_layer_file(file_path, table_name, layer.id)
     
     if not result['success']:
         logger.error(f"Import failed: {result['message']}")
         return result
     
-    # Step 2: Update layer model with metadata
-    layer.postgis_table = table_name
-    layer.feature_count = result['feature_count']
+    # Steps 2-3: Update layer model and attributes
+    save_import_metadata(layer, table_name, result)
+    result['table_name'] = table_name
+    return result
+
+
+def record_vector_publish(layer, table_name, gs_result, workspace):
+    """
+    Record the outcome of publishing a vector layer to GeoServer and bump
+    data_version: the new table is loaded and, unless publishing failed,
+    served by GeoServer.
+    """
+    # Bumped even if publishing failed: vector tiles and the WFS proxy
+    # already read the new table
+    layer.bump_version('data_version')
+    if gs_result['success']:
+        layer.geoserver_layer_name = f"{workspace}:{table_name}"
+        layer.save()
+        logger.info(f"Layer '{layer.title}' published to GeoServer as {layer.geoserver_layer_name}")
+        schedule_style_publish(layer.id, force=True, reseed=True)
+    else:
+        logger.warning(f"GeoServer publish failed: {gs_result['message']}")
+        # Don't fail the whole task - PostGIS import was successful
+
+
+@shared_task(bind=True, max_retries=2)
+def import_layer_task(self, layer_id):
+    """
+    Background task to import a layer file into PostGIS and publish to GeoServer.
     
-    # Convert geometry type
-    geom_type_map = {
-        'POINT': 'point',
-        'MULTIPOINT': 'point',
-        'LINESTRING': 'line',
-        'MULTILINESTRING': 'line',
-        'POLYGON': 'polygon',
-        'MULTIPOLYGON': 'polygon',
-    }
-    geom_type = result.get('geom_type', '').upper()
-    layer.geom_type = geom_type_map.get(geom_type, 'multi')
+    The load step holds an import slot (LAYER_IMPORT_CONCURRENCY), so
+    concurrent imports never exceed the configured number of loaders.
     
-    # Set bbox
-    bbox = result.get('bbox')
-    if bbox:
-        layer.bbox_west = bbox['west']
-        layer.bbox_south = bbox['south']
-        layer.bbox_east = bbox['east']
-        layer.bbox_north = bbox['north']
+    Args:
+        layer_id: ID of the Layer model instance
+    """
+    from .models import Layer
+    from .geoserver_api import publish_postgis_layer
+    from .locks import import_slot, SlotUnavailable
     
-    layer.save()
+    try:
+        layer = Layer.objects.get(pk=layer_id)
+    except Layer.DoesNotExist:
+        logger.error(f"Layer {layer_id} not found")
+        return {'success': False, 'message': 'Layer not found'}
     
-    # Step 3: Create LayerAttribute entries for columns
-    from .models import LayerAttribute
+    try:
+        with import_slot():
+            # Raster layers go through the COG pipeline
+            if is_raster_layer(layer):
+                return import_raster_layer(layer)
+            result = load_vector_layer(layer)
+    except SlotUnavailable:
+        raise self.retry(countdown=getattr(settings, 'LAYER_IMPORT_SLOT_RETRY', 15), max_retries=None)
     
-    columns = result.get('columns', [])
-    for i, col in enumerate(columns):
-        LayerAttribute.objects.update_or_create(
-            layer=layer,
-            field_name=col['name'],
-            defaults={
-                'display_name': col['name'].replace('_', ' ').title(),
-                'show_in_popup': True,
-                'sort_order': i,
-            }
-        )
+    if not result['success']:
+        return result
     
     # Step 4: Publish to GeoServer
+    table_name = result['table_name']
     workspace = settings.GEOSERVER_WORKSPACE
     gs_result = publish_postgis_layer(
         table_name=table_name,
         layer_title=layer.title,
         workspace=workspace
     )
-    
-    if gs_result['success']:
-        layer.geoserver_layer_name = f"{workspace}:{table_name}"
-        layer.save()
-        logger.info(f"Layer '{layer.title}' published to GeoServer as {layer.geoserver_layer_name}")
-    else:
-        logger.warning(f"GeoServer publish failed: {gs_result['message']}")
-        # Don't fail the whole task - PostGIS import was successful
+    record_vector_publish(layer, table_name, gs_result, workspace)
     
     return {
         'success': True,
@@ -115,24 +353,142 @@ def import_layer_task(self, layer_id):
     }
 
 
+@shared_task(bind=True, max_retries=2)
+def load_layer_task(self, layer_id):
+    """
+    Batch stage 1: load one layer into PostGIS (or convert a raster to
+    COG) under an import slot, without publishing. Errors are returned
+    as a failed result, so the publish callback always runs.
+    
+    Args:
+        layer_id: ID of the Layer model instance
+    """
+    from .models import Layer
+    from .locks import import_slot, SlotUnavailable
+    
+    try:
+        layer = Layer.objects.get(pk=layer_id)
+    except Layer.DoesNotExist:
+        return {'layer_id': layer_id, 'success': False, 'message': 'Layer not found'}
+    
+    kind = 'raster' if is_raster_layer(layer) else 'vector'
+    try:
+        with import_slot():
+            if kind == 'raster':
+                result = import_raster_layer(layer, publish=False)
+            else:
+                result = load_vector_layer(layer)
+    except SlotUnavailable:
+        raise self.retry(countdown=getattr(settings, 'LAYER_IMPORT_SLOT_RETRY', 15), max_retries=None)
+    except Exception as e:
+        # A failed load must not fail the chord: the other layers still get published
+        logger.exception(f"Load of layer '{layer.slug}' failed")
+        result = {'success': False, 'message': str(e)}
+    
+    return {
+        'layer_id': layer_id,
+        'kind': kind,
+        'success': result['success'],
+        'message': result['message'],
+        'feature_count': result.get('feature_count', 0),
+        'table_name': result.get('table_name'),
+    }
+
+
 @shared_task
-def delete_layer_data_task(table_name, geoserver_layer_name=None):
+def publish_batch_task(results):
+    """
+    Batch stage 2 (chord callback): publish every loaded layer to
+    GeoServer one after another and return one aggregated report.
+    
+    Args:
+        results: list of load_layer_task results
+    """
+    from .models import Layer
+    from .geoserver_api import publish_layers
+    
+    workspace = settings.GEOSERVER_WORKSPACE
+    loaded = [r for r in results if r['success']]
+    layers = Layer.objects.in_bulk([r['layer_id'] for r in loaded])
+    
+    vectors = [r for r in loaded if r['kind'] == 'vector']
+    gs_results = publish_layers(
+        [(r['table_name'], layers[r['layer_id']].title) for r in vectors],
+        workspace=workspace,
+    ) if vectors else {}
+    
+    for r in vectors:
+        gs_result = gs_results[r['table_name']]
+        record_vector_publish(layers[r['layer_id']], r['table_name'], gs_result, workspace)
+        r['geoserver'] = gs_result['success']
+    
+    for r in loaded:
+        if r['kind'] == 'raster':
+            r['geoserver'] = publish_raster_layer(layers[r['layer_id']])['success']
+    
+    imported = len(loaded)
+    published = sum(1 for r in loaded if r.get('geoserver'))
+    features = sum(r['feature_count'] for r in loaded)
+    message = f"Imported {imported} of {len(results)} layers ({features} features), published {published}"
+    logger.info(f"Batch import: {message}")
+    
+    return {
+        'success': imported == len(results),
+        'message': message,
+        'layers': results,
+    }
+
+
+def import_layers_batch(layers):
+    """
+    Start an orchestrated batch import: a chord of load_layer_task
+    (smallest source files first, concurrency bounded by import slots)
+    followed by a single serialized publish_batch_task.
+    
+    Args:
+        layers: iterable of Layer instances with source files
+    
+    Returns:
+        AsyncResult of the publish callback (aggregated batch result)
+    """
+    from celery import chord
+    
+    def source_size(layer):
+        source = layer.raster_file if is_raster_layer(layer) and layer.raster_file else layer.source_file
+        try:
+            return source.size
+        except (OSError, ValueError):
+            return 0
+    
+    ordered = sorted(layers, key=source_size)
+    return chord(load_layer_task.s(layer.id) for layer in ordered)(publish_batch_task.s())
+
+
+@shared_task
+def delete_layer_data_task(table_name, geoserver_layer_name=None, layer_type='vector', layer_id=None):
     """
     Background task to delete layer data from PostGIS and GeoServer.
     
     Args:
         table_name: PostGIS table name
         geoserver_layer_name: Full layer name (workspace:layer)
+        layer_type: 'vector' (featuretype) or 'raster' (coverage store)
+        layer_id: Layer whose data_version is bumped (if it still exists)
     """
     from .import_utils import drop_table
-    from .geoserver_api import delete_layer
+    from .geoserver_api import delete_layer, delete_coverage_store, truncate_layer_cache
+    from .models import Layer
     
     results = {}
     
     # Delete from GeoServer
     if geoserver_layer_name and ':' in geoserver_layer_name:
         workspace, layer_name = geoserver_layer_name.split(':', 1)
-        gs_result = delete_layer(layer_name, workspace)
+        results['gwc'] = truncate_layer_cache(geoserver_layer_name)
+        if layer_type == 'raster':
+            gs_result = delete_coverage_store(layer_name, workspace)
+        else:
+            gs_result = delete_layer(layer_name, workspace)
         results['geoserver'] = gs_result
     
     # Drop PostGIS table
@@ -140,4 +496,393 @@ def delete_layer_data_task(table_name, geoserver_layer_name=None):
         pg_result = drop_table(table_name)
         results['postgis'] = pg_result
     
+    if layer_id:
+        layer = Layer.objects.filter(pk=layer_id).first()
+        if layer:
+            layer.bump_version('data_version')
+    
     return results
+
+
+def get_project_sublayer(project, title, base_slug, taken):
+    """
+    Layer of a project sublayer: reuse a Layer of this project with the
+    slug, or create one under the first free slug (base-2, base-3, ...).
+    Layers of other projects are never taken over.
+    
+    Args:
+        project: MapProject instance
+        title: sublayer name
+        base_slug: preferred slug
+        taken: table names already used by this import
+    
+    Returns:
+        (layer, table_name)
+    """
+    from .models import Layer
+    
+    slug, n = base_slug, 1
+    while True:
+        table_name = slug.replace('-', '_')
+        if table_name not in taken:
+            layer = project.layers.filter(slug=slug).first()
+            if layer is not None:
+                return layer, table_name
+            if not (Layer.objects.filter(slug=slug).exists()
+                    or Layer.objects.filter(postgis_table=table_name).exists()):
+                layer = Layer.objects.create(slug=slug, title=title, layer_type='vector')
+                layer.projects.add(project)
+                return layer, table_name
+        n += 1
+        suffix = f"-{n}"
+        slug = f"{base_slug[:50 - len(suffix)].rstrip('-')}{suffix}"
+
+
+@shared_task(bind=True, max_retries=2)
+def import_project_source_task(self, project_id):
+    """
+    Import every sublayer of a project's multi-layer source (GeoPackage or
+    zip of shapefiles) and create or update one Layer per sublayer.
+    
+    The source is extracted/enumerated once, sublayers are loaded into
+    PostGIS in parallel, then published to GeoServer as one batch over
+    the pooled client with a single workspace/datastore check.
+    
+    Args:
+        project_id: ID of the MapProject model instance
+    """
+    from anyascii import anyascii
+    from django.utils.text import slugify
+    from .models import MapProject
+    from .import_utils import list_source_layers, import_sources_parallel
+    from .geoserver_api import publish_layers
+    
+    try:
+        project = MapProject.objects.get(pk=project_id)
+    except MapProject.DoesNotExist:
+        logger.error(f"Project {project_id} not found")
+        return {'success': False, 'message': 'Project not found'}
+    
+    if not project.source_file:
+        return {'success': False, 'message': 'No source file'}
+    
+    file_path = project.source_file.path
+    if not os.path.exists(file_path):
+        return {'success': False, 'message': f'File not found: {file_path}'}
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        # Step 1: Enumerate sublayers (zip is extracted once here)
+        try:
+            sublayers = list_source_layers(file_path, temp_dir)
+        except Exception as e:
+            logger.error(f"Cannot read project source: {e}")
+            return {'success': False, 'message': str(e)}
+        
+        # Step 2: Create or update a Layer per sublayer
+        jobs = []
+        layers = {}
+        for sub in sublayers:
+            name_slug = slugify(anyascii(sub['name'])) or f"layer-{len(jobs) + 1}"
+            base_slug = f"{project.slug}-{name_slug}"[:50].strip('-')
+            layer, table_name = get_project_sublayer(project, sub['name'], base_slug, layers)
+            if layer.slug != base_slug:
+                logger.info(f"Slug '{base_slug}' is taken, sublayer '{sub['name']}' imported as '{layer.slug}'")
+            layers[table_name] = layer
+            jobs.append((sub['source_path'], table_name, sub['source_layer'], layer.id))
+        
+        logger.info(f"Importing {len(jobs)} sublayers for project '{project.title}'")
+        
+        # Step 3: Import into PostGIS in parallel
+        results = import_sources_parallel(jobs)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    # Step 4: Save metadata, then publish the batch (one workspace/datastore check)
+    workspace = settings.GEOSERVER_WORKSPACE
+    imported_tables = []
+    for table_name, result in results.items():
+        if result['success']:
+            save_import_metadata(layers[table_name], table_name, result)
+            imported_tables.append(table_name)
+        else:
+            logger.error(f"Import of sublayer '{table_name}' failed: {result['message']}")
+    
+    gs_results = publish_layers(
+        [(table_name, layers[table_name].title) for table_name in imported_tables],
+        workspace=workspace,
+    )
+    
+    summary = []
+    for table_name, result in results.items():
+        layer = layers[table_name]
+        entry = {'layer': layer.slug, 'success': result['success'], 'message': result['message']}
+        if table_name in gs_results:
+            gs_result = gs_results[table_name]
+            entry['feature_count'] = result['feature_count']
+            entry['geoserver'] = gs_result['success']
+            record_vector_publish(layer, table_name, gs_result, workspace)
+        summary.append(entry)
+    
+    imported = sum(1 for entry in summary if entry['success'])
+    return {
+        'success': imported > 0,
+        'message': f"Imported {imported} of {len(summary)} layers",
+        'layers': summary,
+    }
+
+
+def schedule_layer_seed(layer_id, seed_type='reseed'):
+    """
+    Queue a GeoWebCache seed for a layer, collapsing bursts of changes
+    (e.g. saving many LayerStyle rows) into one job.
+    """
+    from django.core.cache import cache
+    
+    if not getattr(settings, 'GWC_SEED_ENABLED', True):
+        return
+    delay = getattr(settings, 'GWC_SEED_DELAY', 30)
+    if cache.add(f'gwc-seed-pending:{layer_id}', seed_type, delay):
+        seed_layer_cache_task.apply_async((layer_id, seed_type), countdown=delay)
+
+
+def schedule_style_publish(layer_id, force=False, reseed=False):
+    """
+    Queue compiling and uploading a layer's SLD to GeoServer.
+    
+    Plain style edits are debounced like seeds, so saving many LayerStyle
+    rows uploads one SLD; forced publishes (after the layer was
+    (re)published in GeoServer) are queued right away.
+    
+    Args:
+        layer_id: ID of the Layer
+        force: Upload even if the SLD hash is unchanged
+        reseed: Reseed the tile cache even if the style did not change
+    """
+    from django.core.cache import cache
+    
+    if not getattr(settings, 'GEOSERVER_STYLE_SYNC', True):
+        if reseed:
+            schedule_layer_seed(layer_id, 'reseed')
+        return
+    delay = getattr(settings, 'GEOSERVER_STYLE_DELAY', 5)
+    if force or reseed:
+        publish_layer_style_task.apply_async((layer_id, force, reseed), countdown=delay)
+    elif cache.add(f'style-publish-pending:{layer_id}', 1, delay):
+        publish_layer_style_task.apply_async((layer_id,), countdown=delay)
+
+
+@shared_task(bind=True, max_retries=3)
+def publish_layer_style_task(self, layer_id, force=False, reseed=False):
+    """
+    Compile a layer's SLD (sld_style or LayerStyle rules) and publish it
+    to GeoServer if its hash changed, then reseed the tile cache.
+    """
+    from .models import Layer
+    from .sld import publish_layer_style
+    
+    try:
+        layer = Layer.objects.get(pk=layer_id)
+    except Layer.DoesNotExist:
+        return {'success': False, 'message': 'Layer not found'}
+    if not layer.geoserver_layer_name:
+        return {'success': False, 'message': 'Layer is not published'}
+    
+    result = publish_layer_style(layer, force=force)
+    if not result['success']:
+        logger.warning(f"Style publish failed for '{layer.slug}': {result['message']}")
+        raise self.retry(countdown=60)
+    
+    if result['changed'] or reseed:
+        schedule_layer_seed(layer.id, 'reseed')
+    return result
+
+
+@shared_task(bind=True, max_retries=2)
+def seed_layer_cache_task(self, layer_id, seed_type='seed'):
+    """
+    Start a GeoWebCache seed (or reseed) of a layer's bbox between its
+    min_zoom and max_zoom. Progress is tracked by track_layer_seed_task,
+    so the worker is not held while GWC renders tiles.
+    
+    Args:
+        layer_id: ID of the Layer model instance
+        seed_type: 'seed' (fill missing tiles) or 'reseed' (regenerate all)
+    """
+    from django.core.cache import cache
+    from .models import Layer
+    from .geoserver_api import seed_layer
+    
+    cache.delete(f'gwc-seed-pending:{layer_id}')
+    
+    try:
+        layer = Layer.objects.get(pk=layer_id)
+    except Layer.DoesNotExist:
+        logger.error(f"Layer {layer_id} not found")
+        return {'success': False, 'message': 'Layer not found'}
+    
+    if not layer.geoserver_layer_name:
+        return {'success': False, 'message': 'Layer is not published in GeoServer'}
+    
+    bbox = None
+    if layer.bbox_west is not None:
+        bbox = {
+            'west': layer.bbox_west, 'south': layer.bbox_south,
+            'east': layer.bbox_east, 'north': layer.bbox_north,
+        }
+    max_zoom = min(layer.max_zoom, getattr(settings, 'GWC_SEED_MAX_ZOOM', 12))
+    
+    result = seed_layer(layer.geoserver_layer_name, bbox, layer.min_zoom, max_zoom, seed_type)
+    if not result['success']:
+        raise self.retry(countdown=60, exc=RuntimeError(result['message']))
+    
+    deadline = time.time() + getattr(settings, 'GWC_SEED_TIMEOUT', 3600)
+    track_layer_seed_task.apply_async(
+        (layer.geoserver_layer_name, seed_type, deadline),
+        countdown=getattr(settings, 'GWC_SEED_POLL_INTERVAL', 10),
+    )
+    return {
+        'success': True,
+        'message': f"{seed_type} started for {layer.geoserver_layer_name} (z{layer.min_zoom}-{max_zoom})",
+    }
+
+
+@shared_task
+def track_layer_seed_task(layer_name, seed_type, deadline):
+    """
+    Check a GeoWebCache seed once and, while it is running, check again
+    after GWC_SEED_POLL_INTERVAL seconds (until the deadline timestamp).
+    Each check is a short task, so seeds never block the queue.
+    """
+    from .geoserver_api import get_seed_status
+    
+    tasks = get_seed_status(layer_name)
+    if tasks is None:
+        return {'success': False, 'message': f"Cannot read GWC status of {layer_name}"}
+    
+    running = [t for t in tasks if t['status'] in (0, 1)]
+    if not running:
+        logger.info(f"GWC {seed_type} '{layer_name}' finished")
+        return {'success': True, 'message': f"{seed_type} finished for {layer_name}"}
+    
+    done = sum(t['done'] for t in running)
+    total = sum(t['total'] for t in running)
+    logger.info(f"GWC {seed_type} '{layer_name}': {done}/{total} tiles")
+    if time.time() >= deadline:
+        logger.warning(f"Stopped tracking GWC {seed_type} '{layer_name}' at {done}/{total} tiles")
+    else:
+        track_layer_seed_task.apply_async(
+            (layer_name, seed_type, deadline),
+            countdown=getattr(settings, 'GWC_SEED_POLL_INTERVAL', 10),
+        )
+    return {'success': True, 'message': f"{seed_type} running", 'tiles_done': done, 'tiles_total': total}
+
+
+@shared_task
+def refresh_legend_counts_task(layer_id, style_ids=None):
+    """
+    Refresh legend counts of a layer, or only of the given style rules.
+    """
+    from django.db.models import Q
+    from .models import Layer
+    
+    try:
+        layer = Layer.objects.get(pk=layer_id)
+    except Layer.DoesNotExist:
+        return {'success': False, 'message': 'Layer not found'}
+    
+    styles = None
+    if style_ids:
+        # The field's 'other' rule depends on every value rule of that field
+        fields = layer.styles.filter(pk__in=style_ids).values_list('attribute_field', flat=True)
+        styles = layer.styles.filter(
+            Q(pk__in=style_ids) | Q(is_default=True, attribute_field__in=list(fields))
+        )
+    updated = refresh_legend_counts(layer, styles)
+    return {'success': True, 'message': f"Updated {updated} legend entries"}
+
+
+@shared_task
+def reconcile_layers_task(fix=False):
+    """
+    Periodic task: diff Layer rows against GeoServer and PostGIS.
+    
+    Args:
+        fix: Republish missing GeoServer layers and clear dropped tables
+    """
+    from .reconcile import reconcile_layers
+    
+    report = reconcile_layers(fix=fix)
+    drift = sum(
+        len(items) for key, items in report.items()
+        if isinstance(items, list) and key != 'fixed'
+    )
+    if drift:
+        logger.warning(f"Layer drift detected: {report}")
+    return report
+
+
+@shared_task
+def advise_indexes_task(apply=None):
+    """
+    Periodic task: turn the slow layer-query log into index
+    recommendations for frequently filtered attributes, and find
+    unused advisor indexes.
+    
+    Args:
+        apply: Create and drop indexes (default: INDEX_ADVISOR_AUTO)
+    """
+    from .query_advisor import advise_indexes
+    
+    if apply is None:
+        apply = getattr(settings, 'INDEX_ADVISOR_AUTO', False)
+    report = advise_indexes(apply=apply)
+    for item in report['recommended']:
+        logger.info(
+            f"Index advice for '{item['layer']}': {item['field']} ({item['kind']}, "
+            f"{item['hits']} slow queries, avg {item['avg_ms']} ms): {item['sql'] or item['note']}"
+        )
+    logger.info(f"Index advisor: {report['message']}")
+    return report
+
+
+@shared_task
+def import_feature_contents_task(import_id):
+    """
+    Background task running a bulk FeatureContent import (spreadsheet
+    and image archive) and storing its report.
+    
+    Args:
+        import_id: ID of the FeatureContentImport model instance
+    """
+    from django.utils import timezone
+    from .content_import import run_content_import
+    from .models import FeatureContentImport
+    
+    try:
+        job = FeatureContentImport.objects.select_related('layer').get(pk=import_id)
+    except FeatureContentImport.DoesNotExist:
+        logger.error(f"Content import {import_id} not found")
+        return {'success': False, 'message': 'Import not found'}
+    
+    job.status = 'running'
+    job.report = {}
+    job.finished_at = None
+    job.save(update_fields=['status', 'report', 'finished_at'])
+    
+    try:
+        job.report = run_content_import(job)
+        job.status = 'done'
+        message = (
+            f"Created {job.report['created']}, updated {job.report['updated']}, "
+            f"failed {job.report['failed']}, images {job.report['images']}"
+        )
+    except Exception as e:
+        logger.error(f"Content import {import_id} failed: {e}")
+        job.report = {**job.report, 'message': str(e)}
+        job.status = 'failed'
+        message = str(e)
+    
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'report', 'finished_at'])
+    return {'success': job.status == 'done', 'message': message}
@@ -1,3 +1,329 @@
-from django.test import TestCase
+"""
+Tests for the layers app.
 
-# Create your tests here.
+GeoServer and GeoWebCache are replaced by a local stub HTTP server, so
+the REST calls go over real HTTP through the pooled GeoServerClient.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import unquote, urlsplit
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import geoserver_api
+from .classify import edge_labels
+from .import_utils import infer_text_type
+from .models import Layer, LayerStyle, MapProject
+from .sld import build_sld
+from .tasks import (
+    get_project_sublayer, publish_layer_style_task, schedule_layer_seed, seed_layer_cache_task,
+    track_layer_seed_task,
+)
+
+LAYER_NAME = 'geoportal:moraines'
+GWC = '/geoserver/gwc/rest'
+REST = '/geoserver/rest'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Record every request and answer from the server's routes:
+    (method, path) -> list of (status, body, content_type). Responses are
+    used in order, the last one repeats; unknown routes get a 404.
+    """
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        path = unquote(urlsplit(self.path).path)
+        self.server.requests.append({
+            'method': self.command,
+            'path': path,
+            'content_type': self.headers.get('Content-Type', ''),
+            'body': self.rfile.read(length),
+        })
+        responses = self.server.routes.get((self.command, path)) or [(404, b'Not found', 'text/plain')]
+        status, body, content_type = responses.pop(0) if len(responses) > 1 else responses[0]
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GeoServerStubMixin:
+    """Run a stub GeoServer for each test and point the client at it."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.server.routes = {}
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings_override = override_settings(
+            GEOSERVER_URL=f'http://127.0.0.1:{self.server.server_port}/geoserver',
+            GEOSERVER_RETRIES=0,
+            METRICS_ENABLED=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # A fresh pooled client for the stub URL
+        geoserver_api._client = None
+        self.addCleanup(setattr, geoserver_api, '_client', None)
+        cache.clear()
+
+    def route(self, method, path, *responses):
+        self.server.routes[(method, path)] = [
+            (status, body if isinstance(body, bytes) else json.dumps(body).encode('utf-8'), content_type)
+            for status, body, content_type in responses
+        ]
+
+    def requests_to(self, method, path):
+        return [r for r in self.server.requests if r['method'] == method and r['path'] == path]
+
+
+class GWCRestTests(GeoServerStubMixin, SimpleTestCase):
+    """GeoWebCache seed, status and truncate REST calls."""
+
+    def test_seed_posts_seed_request(self):
+        self.route('POST', f'{GWC}/seed/{LAYER_NAME}.json', (200, b'', 'text/plain'))
+
+        bbox = {'west': 60.0, 'south': 55.0, 'east': 90.0, 'north': 75.0}
+        result = geoserver_api.seed_layer(LAYER_NAME, bbox, 2, 8, 'reseed', threads=3)
+
+        self.assertTrue(result['success'])
+        [request] = self.requests_to('POST', f'{GWC}/seed/{LAYER_NAME}.json')
+        seed_request = json.loads(request['body'])['seedRequest']
+        self.assertEqual(seed_request['name'], LAYER_NAME)
+        self.assertEqual(seed_request['type'], 'reseed')
+        self.assertEqual((seed_request['zoomStart'], seed_request['zoomStop']), (2, 8))
+        self.assertEqual(seed_request['threadCount'], 3)
+        # EPSG:900913 gridset: bounds in web mercator metres
+        minx, miny, maxx, maxy = seed_request['bounds']['coords']['double']
+        self.assertAlmostEqual(minx, 6679169.45, places=1)
+        self.assertAlmostEqual(maxx, 10018754.17, places=1)
+        self.assertLess(miny, maxy)
+
+    def test_seed_reports_gwc_error(self):
+        self.route('POST', f'{GWC}/seed/{LAYER_NAME}.json', (500, b'Unknown layer', 'text/plain'))
+
+        result = geoserver_api.seed_layer(LAYER_NAME, None, 0, 4)
+
+        self.assertFalse(result['success'])
+        self.assertIn('Unknown layer', result['message'])
+
+    def test_seed_status_parses_tasks(self):
+        self.route('GET', f'{GWC}/seed/{LAYER_NAME}.json', (
+            200, {'long-array-array': [[120, 4000, 35, 7, 1], [0, 900, -1, 8, 0]]}, 'application/json',
+        ))
+
+        tasks = geoserver_api.get_seed_status(LAYER_NAME)
+
+        self.assertEqual(tasks, [
+            {'done': 120, 'total': 4000, 'remaining': 35, 'task_id': 7, 'status': 1},
+            {'done': 0, 'total': 900, 'remaining': -1, 'task_id': 8, 'status': 0},
+        ])
+
+    def test_seed_status_error_is_none(self):
+        self.route('GET', f'{GWC}/seed/{LAYER_NAME}.json', (500, b'', 'text/plain'))
+
+        self.assertIsNone(geoserver_api.get_seed_status(LAYER_NAME))
+
+    def test_truncate_posts_masstruncate(self):
+        self.route('POST', f'{GWC}/masstruncate', (200, b'', 'text/plain'))
+
+        result = geoserver_api.truncate_layer_cache(LAYER_NAME)
+
+        self.assertTrue(result['success'])
+        [request] = self.requests_to('POST', f'{GWC}/masstruncate')
+        self.assertEqual(request['content_type'], 'text/xml')
+        self.assertIn(f'<layerName>{LAYER_NAME}</layerName>'.encode(), request['body'])
+
+
+@override_settings(
+    GEOSERVER_STYLE_SYNC=True, GEOSERVER_STYLE_DELAY=5,
+    GWC_SEED_ENABLED=True, GWC_SEED_DELAY=30, GWC_SEED_POLL_INTERVAL=10,
+)
+class LayerSeedTests(GeoServerStubMixin, TestCase):
+    """Style change signal -> SLD publish -> debounced seed -> GWC job tracking."""
+
+    def setUp(self):
+        super().setUp()
+        self.layer = Layer.objects.create(
+            title='Морены', slug='moraines', layer_type='vector', geom_type='polygon',
+            geoserver_layer_name=LAYER_NAME, min_zoom=2, max_zoom=10,
+            bbox_west=60.0, bbox_south=55.0, bbox_east=90.0, bbox_north=75.0,
+        )
+
+    def test_style_change_schedules_one_debounced_seed(self):
+        self.route('PUT', f'{REST}/workspaces/geoportal/styles/moraines_style', (200, b'', 'text/plain'))
+        self.route('PUT', f'{REST}/layers/{LAYER_NAME}', (200, b'', 'text/plain'))
+
+        with mock.patch.object(publish_layer_style_task, 'apply_async') as publish, \
+                mock.patch.object(seed_layer_cache_task, 'apply_async') as seed:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.layer.fill_color = '#aa3300'
+                self.layer.save()
+            publish.assert_called_once_with((self.layer.pk,), countdown=5)
+            seed.assert_not_called()
+
+            # The queued publish uploads the SLD, bumps style_version and queues a reseed
+            version = self.layer.style_version
+            publish_layer_style_task.apply(args=(self.layer.pk,))
+            self.layer.refresh_from_db()
+            self.assertEqual(self.layer.style_version, version + 1)
+            [upload] = self.requests_to('PUT', f'{REST}/workspaces/geoportal/styles/moraines_style')
+            self.assertIn(b'#aa3300', upload['body'])
+            seed.assert_called_once_with((self.layer.pk, 'reseed'), countdown=30)
+
+            # Further changes within GWC_SEED_DELAY join the pending seed
+            schedule_layer_seed(self.layer.pk)
+            schedule_layer_seed(self.layer.pk)
+            seed.assert_called_once()
+
+    def test_seed_task_starts_job_and_tracks_until_done(self):
+        self.route('POST', f'{GWC}/seed/{LAYER_NAME}.json', (200, b'', 'text/plain'))
+        self.route(
+            'GET', f'{GWC}/seed/{LAYER_NAME}.json',
+            (200, {'long-array-array': [[50, 200, 12, 3, 1]]}, 'application/json'),
+            (200, {'long-array-array': []}, 'application/json'),
+        )
+
+        with mock.patch.object(track_layer_seed_task, 'apply_async') as track:
+            result = seed_layer_cache_task.apply(args=(self.layer.pk, 'reseed')).get()
+            self.assertTrue(result['success'])
+            [request] = self.requests_to('POST', f'{GWC}/seed/{LAYER_NAME}.json')
+            seed_request = json.loads(request['body'])['seedRequest']
+            self.assertEqual((seed_request['zoomStart'], seed_request['zoomStop']), (2, 10))
+
+            # The worker is released at once; a status check is scheduled instead
+            (args,), kwargs = track.call_args
+            self.assertEqual(args[:2], (LAYER_NAME, 'reseed'))
+            self.assertEqual(kwargs, {'countdown': 10})
+            deadline = args[2]
+
+            running = track_layer_seed_task(LAYER_NAME, 'reseed', deadline)
+            self.assertEqual((running['tiles_done'], running['tiles_total']), (50, 200))
+            self.assertEqual(track.call_count, 2)
+
+            finished = track_layer_seed_task(LAYER_NAME, 'reseed', deadline)
+            self.assertTrue(finished['success'])
+            self.assertEqual(track.call_count, 2)
+
+    def test_tracking_stops_at_deadline(self):
+        self.route('GET', f'{GWC}/seed/{LAYER_NAME}.json', (
+            200, {'long-array-array': [[50, 200, 12, 3, 1]]}, 'application/json',
+        ))
+
+        with mock.patch.object(track_layer_seed_task, 'apply_async') as track:
+            track_layer_seed_task(LAYER_NAME, 'reseed', 0)
+            track.assert_not_called()
+
+
+class ProjectSublayerTests(TestCase):
+    """Layers of a multi-layer project source."""
+
+    def setUp(self):
+        self.project = MapProject.objects.create(title='Оледенения', slug='glaciation')
+
+    def test_reuses_layer_of_the_project(self):
+        layer = Layer.objects.create(title='Морены', slug='glaciation-moraines')
+        layer.projects.add(self.project)
+
+        found, table_name = get_project_sublayer(self.project, 'Морены', 'glaciation-moraines', {})
+
+        self.assertEqual(found, layer)
+        self.assertEqual(table_name, 'glaciation_moraines')
+
+    def test_does_not_take_over_layer_of_another_project(self):
+        other = Layer.objects.create(title='Морены', slug='glaciation-moraines')
+
+        layer, table_name = get_project_sublayer(self.project, 'Морены', 'glaciation-moraines', {})
+
+        self.assertNotEqual(layer, other)
+        self.assertEqual(layer.slug, 'glaciation-moraines-2')
+        self.assertEqual(table_name, 'glaciation_moraines_2')
+        self.assertFalse(other.projects.exists())
+        self.assertEqual(list(layer.projects.all()), [self.project])
+
+    def test_same_name_twice_in_one_source(self):
+        first, table_name = get_project_sublayer(self.project, 'Морены', 'glaciation-moraines', {})
+        second, _ = get_project_sublayer(self.project, 'Морены', 'glaciation-moraines', {table_name: first})
+
+        self.assertEqual(second.slug, 'glaciation-moraines-2')
+
+
+class EdgeLabelTests(SimpleTestCase):
+    """Class edge labels double as LayerStyle.attribute_value."""
+
+    def test_short_labels(self):
+        self.assertEqual(edge_labels([0.0, 12.5, 1000000.0]), ['0', '12.5', '1e+06'])
+
+    def test_close_edges_get_distinct_labels(self):
+        labels = edge_labels([1.0, 1.0000001, 1.0000002])
+        self.assertEqual(len(set(labels)), 3)
+
+
+class InferTextTypeTests(SimpleTestCase):
+    """Type of text columns that are not converted on import."""
+
+    def profile(self, **counts):
+        col = dict.fromkeys(['ints', 'floats', 'iso_dates', 'dmy_dates', 'bools'], 0)
+        col.update(non_null=10, **counts)
+        return col
+
+    def test_numbers(self):
+        self.assertEqual(infer_text_type(self.profile(ints=10, floats=10)), 'integer')
+        self.assertEqual(infer_text_type(self.profile(ints=6, floats=10)), 'float')
+
+    def test_dates_and_flags(self):
+        self.assertEqual(infer_text_type(self.profile(dmy_dates=10)), 'date')
+        self.assertEqual(infer_text_type(self.profile(bools=10)), 'boolean')
+
+    def test_mixed_and_empty(self):
+        self.assertIsNone(infer_text_type(self.profile(ints=9)))
+        self.assertIsNone(infer_text_type(self.profile(non_null=0)))
+
+
+class MixedGeometrySLDTests(SimpleTestCase):
+    """Rules of a mixed layer are split by the dimension of the geometry."""
+
+    def test_one_rule_per_geometry_class(self):
+        layer = Layer(title='Формы рельефа', slug='landforms', geom_type='multi', postgis_table='landforms')
+        styles = [
+            LayerStyle(layer=layer, attribute_field='kind', attribute_value='морена', sort_order=0),
+            LayerStyle(layer=layer, attribute_field='kind', is_default=True, sort_order=1),
+        ]
+
+        sld = build_sld(layer, styles)
+
+        self.assertEqual(sld.count('<Rule>'), 6)
+        self.assertEqual(sld.count('<PolygonSymbolizer>'), 2)
+        self.assertEqual(sld.count('<PointSymbolizer>'), 2)
+        self.assertEqual(sld.count('<ogc:Function name="dimension">'), 6)
+        # ElseFilter cannot be combined with the dimension filter
+        self.assertNotIn('ElseFilter', sld)
+        self.assertEqual(sld.count('<ogc:Not>'), 3)
+
+    def test_single_geometry_layer_keeps_else_filter(self):
+        layer = Layer(title='Морены', slug='moraines', geom_type='polygon', postgis_table='moraines')
+        styles = [LayerStyle(layer=layer, attribute_field='kind', attribute_value='морена')]
+
+        sld = build_sld(layer, styles)
+
+        self.assertEqual(sld.count('<Rule>'), 2)
+        self.assertIn('<ElseFilter/>', sld)
+        self.assertNotIn('dimension', sld)
@@ -0,0 +1,251 @@
+"""
+XYZ tile rendering for raster layers (DEM colour ramp and hillshade).
+Reads windowed blocks from Cloud-Optimized GeoTIFFs via GDAL and renders with NumPy.
+"""
+
+import io
+import math
+import os
+import logging
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Half the width of the Web Mercator world in metres
+MERCATOR_HALF = 20037508.342789244
+
+STYLES = ('color', 'hillshade', 'shaded')
+FORMATS = {'png': 'image/png', 'webp': 'image/webp'}
+
+# Hypsometric ramp for West Siberian lowland relief: (fraction, RGB)
+DEM_RAMP = [
+    (0.00, (38, 115, 0)),
+    (0.15, (112, 168, 0)),
+    (0.30, (205, 205, 102)),
+    (0.50, (230, 190, 120)),
+    (0.70, (168, 112, 0)),
+    (0.85, (130, 90, 70)),
+    (1.00, (255, 255, 255)),
+]
+
+
+def tile_bounds(z, x, y):
+    """
+    Web Mercator bounds of an XYZ tile.
+
+    Returns:
+        (minx, miny, maxx, maxy) in EPSG:3857 metres
+    """
+    size = 2 * MERCATOR_HALF / (2 ** z)
+    minx = -MERCATOR_HALF + x * size
+    maxy = MERCATOR_HALF - y * size
+    return (minx, maxy - size, minx + size, maxy)
+
+
+def tile_center_lat(z, y):
+    """Latitude of the tile centre in degrees."""
+    n = math.pi - 2 * math.pi * (y + 0.5) / (2 ** z)
+    return math.degrees(math.atan(math.sinh(n)))
+
+
+def tile_intersects_bbox(z, x, y, layer):
+    """Check whether a tile overlaps the layer's WGS84 bbox."""
+    if layer.bbox_west is None:
+        return True
+    n = 2 ** z
+    west = x / n * 360 - 180
+    east = (x + 1) / n * 360 - 180
+    north = tile_center_lat(z, y - 0.5)
+    south = tile_center_lat(z, y + 0.5)
+    return not (
+        east < layer.bbox_west or west > layer.bbox_east
+        or north < layer.bbox_south or south > layer.bbox_north
+    )
+
+
+def read_tile(path, z, x, y, size=256, buffer=0):
+    """
+    Read the raster window covering a tile, resampled to Web Mercator.
+
+    GDAL picks the overview level matching the output resolution and
+    only decodes the COG blocks that intersect the window.
+
+    Args:
+        path: Path to the COG
+        z, x, y: Tile coordinates
+        size: Tile size in pixels
+        buffer: Extra pixels on each side (for hillshade edges)
+
+    Returns:
+        (data, valid) — float32 array and boolean mask of valid pixels
+    """
+    from osgeo import gdal
+    gdal.UseExceptions()
+
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    pixel = (maxx - minx) / size
+    bounds = (minx - buffer * pixel, miny - buffer * pixel,
+              maxx + buffer * pixel, maxy + buffer * pixel)
+
+    src = gdal.Open(path)
+    nodata = src.GetRasterBand(1).GetNoDataValue()
+    ds = gdal.Warp(
+        '', src, format='MEM',
+        outputBounds=bounds, dstSRS='EPSG:3857',
+        width=size + 2 * buffer, height=size + 2 * buffer,
+        resampleAlg='bilinear',
+        srcNodata=nodata, dstNodata=nodata if nodata is not None else -9999,
+        outputType=gdal.GDT_Float32,
+    )
+    band = ds.GetRasterBand(1)
+    data = band.ReadAsArray().astype(np.float32)
+    valid = data != band.GetNoDataValue()
+    ds = None
+    src = None
+    return data, valid
+
+
+def colorize(data, vmin, vmax, ramp=DEM_RAMP):
+    """
+    Map values to RGB with a piecewise-linear colour ramp.
+
+    Returns:
+        uint8 array of shape (h, w, 3)
+    """
+    span = (vmax - vmin) or 1.0
+    t = np.clip((data - vmin) / span, 0, 1)
+    stops = [stop for stop, _ in ramp]
+    rgb = np.empty(data.shape + (3,), dtype=np.uint8)
+    for channel in range(3):
+        rgb[..., channel] = np.interp(t, stops, [color[channel] for _, color in ramp])
+    return rgb
+
+
+def hillshade(data, cellsize, azimuth=315.0, altitude=45.0, z_factor=1.0):
+    """
+    Compute hillshade from an elevation array with a one-pixel buffer.
+
+    Returns:
+        float32 array in 0..1, two pixels smaller in each dimension
+    """
+    d0, d1 = np.gradient(data * z_factor, cellsize)
+    slope = math.pi / 2 - np.arctan(np.hypot(d0, d1))
+    aspect = np.arctan2(-d0, d1)
+    az = math.radians(azimuth)
+    alt = math.radians(altitude)
+    shade = (math.sin(alt) * np.sin(slope)
+             + math.cos(alt) * np.cos(slope) * np.cos(az - aspect))
+    return np.clip(shade, 0, 1)[1:-1, 1:-1].astype(np.float32)
+
+
+def encode_image(rgba, fmt='png'):
+    """Encode an RGBA array as PNG or WebP bytes."""
+    buf = io.BytesIO()
+    image = Image.fromarray(rgba, 'RGBA')
+    if fmt == 'webp':
+        image.save(buf, format='WEBP', quality=85, method=4)
+    else:
+        image.save(buf, format='PNG', optimize=False, compress_level=6)
+    return buf.getvalue()
+
+
+def empty_tile(size=256, fmt='png'):
+    """Fully transparent tile."""
+    return encode_image(np.zeros((size, size, 4), dtype=np.uint8), fmt)
+
+
+def render_tile(layer, z, x, y, style='color', fmt='png'):
+    """
+    Render a tile for a raster layer.
+
+    Args:
+        layer: Layer with a COG in raster_file
+        z, x, y: Tile coordinates
+        style: 'color' (ramp), 'hillshade' (grey) or 'shaded' (ramp x hillshade)
+        fmt: 'png' or 'webp'
+
+    Returns:
+        encoded image bytes
+    """
+    size = getattr(settings, 'RASTER_TILE_SIZE', 256)
+    if not tile_intersects_bbox(z, x, y, layer):
+        return empty_tile(size, fmt)
+
+    needs_shade = style in ('hillshade', 'shaded')
+    buffer = 1 if needs_shade else 0
+    data, valid = read_tile(layer.raster_file.path, z, x, y, size, buffer)
+
+    if not valid.any():
+        return empty_tile(size, fmt)
+
+    band_stats = (layer.raster_stats or {}).get('bands') or [{}]
+    vmin = band_stats[0].get('min')
+    vmax = band_stats[0].get('max')
+    if vmin is None or vmax is None:
+        vmin, vmax = float(data[valid].min()), float(data[valid].max())
+
+    if needs_shade:
+        # Mercator metres are stretched by 1/cos(lat); correct to ground metres
+        minx, _, maxx, _ = tile_bounds(z, x, y)
+        cellsize = (maxx - minx) / size * math.cos(math.radians(tile_center_lat(z, y)))
+        filled = np.where(valid, data, vmin)
+        shade = hillshade(filled, cellsize)
+        data = data[1:-1, 1:-1]
+        valid = valid[1:-1, 1:-1]
+
+    if style == 'hillshade':
+        grey = (shade * 255).astype(np.uint8)
+        rgb = np.stack([grey, grey, grey], axis=-1)
+    else:
+        rgb = colorize(data, vmin, vmax)
+        if style == 'shaded':
+            rgb = (rgb * (0.35 + 0.65 * shade[..., None])).astype(np.uint8)
+
+    alpha = np.where(valid, 255, 0).astype(np.uint8)
+    return encode_image(np.dstack([rgb, alpha]), fmt)
+
+
+def tile_cache_path(layer, z, x, y, style, fmt):
+    """
+    Disk cache path for a tile.
+
+    The COG file name is part of the key, so a re-import (new file)
+    never serves stale tiles.
+    """
+    cache_dir = getattr(settings, 'RASTER_TILE_CACHE_DIR',
+                        os.path.join(settings.MEDIA_ROOT, 'tiles'))
+    version = Path(layer.raster_file.name).stem
+    return os.path.join(cache_dir, layer.slug, version, style, str(z), str(x), f'{y}.{fmt}')
+
+
+def get_tile(layer, z, x, y, style='color', fmt='png'):
+    """
+    Get a rendered tile, from the disk cache when available.
+
+    Returns:
+        encoded image bytes
+    """
+    path = tile_cache_path(layer, z, x, y, style, fmt)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    content = render_tile(layer, z, x, y, style, fmt)
+
+    # Write atomically so concurrent workers never read a partial file
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to cache tile {path}: {e}")
+
+    return content
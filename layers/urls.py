@@ -10,6 +10,12 @@ urlpatterns = [
     path('projects/<slug:slug>/', views.MapProjectDetailView.as_view(), name='project-detail'),
     path('layers/', views.LayerListView.as_view(), name='layer-list'),
     path('layers/<slug:slug>/', views.LayerDetailView.as_view(), name='layer-detail'),
+    path('layers/<slug:slug>/classify/', views.LayerClassifyView.as_view(), name='layer-classify'),
     path('features/<slug:layer_slug>/', views.LayerFeaturesContentView.as_view(), name='layer-features'),
+    path('features/<slug:layer_slug>/ids/', views.feature_content_ids, name='layer-feature-ids'),
     path('features/<slug:layer_slug>/<int:feature_id>/', views.FeatureContentView.as_view(), name='feature-content'),
+    path('tiles/<slug:slug>/<int:z>/<int:x>/<int:y>.<str:fmt>', views.raster_tile, name='raster-tile'),
+    path('vtiles/<slug:slug>/<int:z>/<int:x>/<int:y>.pbf', views.vector_tile, name='vector-tile'),
+    path('wfs', views.wfs_proxy, name='wfs-proxy'),
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -0,0 +1,123 @@
+"""
+Mapbox Vector Tiles for vector layers, rendered by PostGIS (ST_AsMVT).
+Geometries are read from the EPSG:3857 companion table when it exists;
+features are picked through the subdivided companion when there is one.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+from .import_utils import mercator_source, quote_ident, subdivided_filter
+from .query_advisor import timed_execute
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+# Attribute types ST_AsMVT encodes natively; the rest are sent as text
+NATIVE_MVT_TYPES = ('integer', 'float', 'boolean')
+
+
+def tile_attributes(layer, alias='t'):
+    """
+    SELECT list of the popup attributes of a layer, cast for ST_AsMVT.
+    """
+    columns = []
+    for attr in layer.attributes.filter(show_in_popup=True):
+        ident = f'{alias}.{quote_ident(attr.field_name)}'
+        if attr.data_type not in NATIVE_MVT_TYPES:
+            ident = f'{ident}::text'
+        columns.append(f'{ident} AS {quote_ident(attr.field_name)}')
+    return columns
+
+
+def has_content_sql(layer, alias='t'):
+    """
+    Boolean expression: the feature has published FeatureContent
+    (probes the (layer, feature_id) unique index).
+    """
+    from .models import FeatureContent
+
+    return (
+        f'EXISTS (SELECT 1 FROM {quote_ident(FeatureContent._meta.db_table)} c '
+        f'WHERE c.layer_id = {int(layer.pk)} AND c.feature_id = {alias}.gid AND c.is_published)'
+    )
+
+
+def vector_tile_sql(layer, clustered=False, use_mercator=True):
+    """
+    Build the ST_AsMVT query for a layer.
+
+    Every feature carries a 'has_content' attribute. Point layers can be
+    clustered on a grid (VECTOR_TILE_CLUSTER_GRID cells per tile side);
+    each cluster becomes one point with 'point_count' and 'has_content'
+    (any of its points) attributes.
+
+    Args:
+        layer: Layer with a PostGIS table
+        clustered: Aggregate points into grid clusters
+        use_mercator: Read the EPSG:3857 companion table if it exists
+
+    Returns:
+        SQL string taking (z, x, y, layer name) parameters
+    """
+    extent = getattr(settings, 'VECTOR_TILE_EXTENT', 4096)
+    buffer = getattr(settings, 'VECTOR_TILE_BUFFER', 64)
+
+    source = mercator_source(layer.postgis_table, use_companion=use_mercator)
+    where = source['filter'].format(envelope='bounds.env')
+
+    if clustered:
+        grid = getattr(settings, 'VECTOR_TILE_CLUSTER_GRID', 64)
+        return f'''
+            WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS env)
+            SELECT ST_AsMVT(tile, %s, {extent}, 'mvt_geom')
+            FROM (
+                SELECT COUNT(*) AS point_count, MIN(p.gid) AS gid, bool_or(p.has_content) AS has_content,
+                       ST_AsMVTGeom(ST_Centroid(ST_Collect(p.geom)), bounds.env, {extent}, {buffer}, true) AS mvt_geom
+                FROM (
+                    SELECT t.gid, {has_content_sql(layer)} AS has_content, ST_Centroid({source['geom']}) AS geom
+                    FROM {source['from']}, bounds
+                    WHERE {where}
+                ) p, bounds
+                GROUP BY ST_SnapToGrid(p.geom, (ST_XMax(bounds.env) - ST_XMin(bounds.env)) / {grid}), bounds.env
+            ) tile
+        '''
+
+    # Heavy geometries only reach ST_AsMVTGeom if one of their parts
+    # touches the tile (plus its buffer)
+    margin = f'(ST_XMax(bounds.env) - ST_XMin(bounds.env)) * {buffer} / {extent}'
+    pieces = subdivided_filter(layer.postgis_table, f'ST_Transform(ST_Expand(bounds.env, {margin}), 4326)', 't')
+    if pieces:
+        where = f'{where} AND {pieces}'
+
+    columns = ''.join(f', {column}' for column in tile_attributes(layer))
+    return f'''
+        WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS env)
+        SELECT ST_AsMVT(tile, %s, {extent}, 'mvt_geom')
+        FROM (
+            SELECT t.gid{columns}, {has_content_sql(layer)} AS has_content,
+                   ST_AsMVTGeom({source['geom']}, bounds.env, {extent}, {buffer}, true) AS mvt_geom
+            FROM {source['from']}, bounds
+            WHERE {where}
+        ) tile
+    '''
+
+
+def render_vector_tile(layer, z, x, y, use_mercator=True):
+    """
+    Render a vector tile for a layer.
+
+    Point layers are clustered below VECTOR_TILE_CLUSTER_MAX_ZOOM.
+
+    Returns:
+        MVT bytes (empty for tiles without features)
+    """
+    clustered = layer.geom_type == 'point' and z < getattr(settings, 'VECTOR_TILE_CLUSTER_MAX_ZOOM', 12)
+    sql = vector_tile_sql(layer, clustered, use_mercator)
+    with connection.cursor() as cursor:
+        timed_execute(cursor, layer.postgis_table, sql, [z, x, y, layer.slug], [('geom', 'bbox')], 'tile')
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b''
@@ -3,13 +3,18 @@ REST API views for geoportal layers.
 """
 
 from rest_framework import generics, status
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Count, Prefetch, Q
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
 from .models import MapProject, Layer, FeatureContent
 from .serializers import (
     MapProjectSerializer, MapProjectListSerializer,
     LayerSerializer, FeatureContentSerializer,
+    LayerStyleSerializer, ClassifyRequestSerializer,
 )
 
 
@@ -27,7 +32,22 @@ class MapProjectDetailView(generics.RetrieveAPIView):
     lookup_field = 'slug'
 
     def get_queryset(self):
-        return MapProject.objects.filter(is_published=True).prefetch_related('layers')
+        # The project's layers as before, only annotated with content_count
+        return MapProject.objects.filter(is_published=True).prefetch_related(
+            Prefetch('layers', queryset=with_content_count(Layer.objects.all()))
+        )
+
+
+def with_content_count(layers):
+    """Annotate a Layer queryset with its published FeatureContent count."""
+    return layers.annotate(
+        content_count=Count('feature_contents', filter=Q(feature_contents__is_published=True))
+    )
+
+
+def published_layers():
+    """Published layers annotated with their published FeatureContent count."""
+    return with_content_count(Layer.objects.filter(is_published=True))
 
 
 class LayerListView(generics.ListAPIView):
@@ -35,7 +55,7 @@ class LayerListView(generics.ListAPIView):
     serializer_class = LayerSerializer
 
     def get_queryset(self):
-        return Layer.objects.filter(is_published=True).prefetch_related('attributes', 'feature_contents')
+        return published_layers().prefetch_related('attributes', 'styles')
 
 
 class LayerDetailView(generics.RetrieveAPIView):
@@ -44,7 +64,34 @@ class LayerDetailView(generics.RetrieveAPIView):
     lookup_field = 'slug'
 
     def get_queryset(self):
-        return Layer.objects.filter(is_published=True).prefetch_related('attributes', 'feature_contents')
+        return published_layers().prefetch_related('attributes', 'styles')
+
+
+class LayerClassifyView(APIView):
+    """
+    POST /api/layers/<slug>/classify/ — generate LayerStyle rules for a
+    field (unique values, quantile, equal interval or Jenks). Staff only.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, slug):
+        from .classify import ClassificationError, classify_layer
+        
+        layer = get_object_or_404(Layer, slug=slug, layer_type='vector')
+        if not layer.postgis_table:
+            return Response({'detail': 'Layer is not imported'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        params = ClassifyRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        try:
+            result = classify_layer(layer, **params.validated_data)
+        except ClassificationError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'styles': LayerStyleSerializer(layer.styles.all(), many=True).data,
+            'sld': result['sld'],
+        }, status=status.HTTP_201_CREATED)
 
 
 class FeatureContentView(APIView):
@@ -83,3 +130,146 @@ class LayerFeaturesContentView(generics.ListAPIView):
             layer__is_published=True,
             is_published=True
         ).select_related('layer').prefetch_related('gallery')
+
+
+def feature_id_ranges(ids):
+    """Collapse ascending ids into [first, last] runs."""
+    ranges = []
+    for feature_id in ids:
+        if ranges and feature_id == ranges[-1][1] + 1:
+            ranges[-1][1] = feature_id
+        else:
+            ranges.append([feature_id, feature_id])
+    return ranges
+
+
+def feature_content_ids(request, layer_slug):
+    """
+    GET /api/features/<layer_slug>/ids/?v=<content_version> — ids of the
+    features with published content, as [first, last] ranges, so the
+    client knows which features are clickable without loading contents.
+    """
+    layer = get_object_or_404(Layer, slug=layer_slug, is_published=True)
+    ids = (
+        FeatureContent.objects.filter(layer=layer, is_published=True)
+        .order_by('feature_id')
+        .values_list('feature_id', flat=True)
+    )
+    ranges = feature_id_ranges(ids.iterator())
+    response = JsonResponse({
+        'layer': layer.slug,
+        'content_version': layer.content_version,
+        'count': sum(last - first + 1 for first, last in ranges),
+        'ranges': ranges,
+    })
+    response['Cache-Control'] = versioned_cache_control(request, layer.content_version, 60)
+    return response
+
+
+def versioned_cache_control(request, version, max_age):
+    """
+    Cache-Control for a versioned URL: cacheable forever when its ?v=
+    matches the layer's current version, since any change produces a
+    new URL; otherwise only for max_age seconds.
+    """
+    if request.GET.get('v') == str(version):
+        return f"public, max-age={getattr(settings, 'VERSIONED_CACHE_MAX_AGE', 31536000)}, immutable"
+    return f'public, max-age={max_age}'
+
+
+def raster_tile(request, slug, z, x, y, fmt):
+    """
+    GET /api/tiles/<slug>/<z>/<x>/<y>.<png|webp>?style=color|hillshade|shaded
+    — XYZ tile rendered from the layer's Cloud-Optimized GeoTIFF.
+    """
+    from .tile_utils import STYLES, FORMATS, get_tile
+    
+    style = request.GET.get('style', 'color')
+    if fmt not in FORMATS or style not in STYLES or not 0 <= z <= 22:
+        raise Http404('Unsupported tile request')
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise Http404('Tile out of range')
+    
+    layer = get_object_or_404(Layer, slug=slug, layer_type='raster', is_published=True)
+    if not layer.raster_file:
+        raise Http404('Layer has no raster file')
+    
+    response = HttpResponse(get_tile(layer, z, x, y, style, fmt), content_type=FORMATS[fmt])
+    response['Cache-Control'] = versioned_cache_control(request, layer.data_version, 86400)
+    return response
+
+
+def vector_tile(request, slug, z, x, y):
+    """
+    GET /api/vtiles/<slug>/<z>/<x>/<y>.pbf — Mapbox Vector Tile of a
+    vector layer (points are clustered at low zooms).
+    """
+    from .vector_tiles import CONTENT_TYPE, render_vector_tile
+    
+    if not 0 <= z <= 22 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise Http404('Tile out of range')
+    
+    layer = get_object_or_404(Layer, slug=slug, layer_type='vector', is_published=True)
+    if not layer.postgis_table:
+        raise Http404('Layer has no PostGIS table')
+    
+    response = HttpResponse(render_vector_tile(layer, z, x, y), content_type=CONTENT_TYPE)
+    response['Cache-Control'] = versioned_cache_control(request, layer.feature_version, 3600)
+    return response
+
+
+def wfs_proxy(request):
+    """
+    GET /api/wfs?service=WFS&request=GetFeature&typeName=...&v=<data_version>
+    — GeoServer WFS GetFeature; the full-layer request is served from a
+    compressed on-disk cache invalidated when the layer's data changes,
+    filtered or paged requests are passed through uncached.
+    """
+    from .wfs_proxy import WFSRequestError, get_feature, normalize_params
+    
+    try:
+        params = normalize_params(request.GET)
+    except WFSRequestError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain')
+    
+    type_name = dict(params).get('typename') or dict(params).get('typenames')
+    layer = get_object_or_404(
+        Layer, geoserver_layer_name=type_name, layer_type='vector', is_published=True
+    )
+    
+    result = get_feature(layer, params, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if result['etag'] and request.META.get('HTTP_IF_NONE_MATCH') == result['etag']:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(result['body'], status=result['status'], content_type=result['content_type'])
+        if result['encoding']:
+            response['Content-Encoding'] = result['encoding']
+    
+    if result['etag']:
+        response['ETag'] = result['etag']
+        response['Cache-Control'] = versioned_cache_control(
+            request, layer.feature_version, getattr(settings, 'WFS_PROXY_MAX_AGE', 60)
+        )
+    else:
+        response['Cache-Control'] = 'no-store'
+    response['Vary'] = 'Accept-Encoding'
+    response['X-Cache'] = 'HIT' if result['cached'] else 'MISS'
+    return response
+
+
+def metrics(request):
+    """
+    GET /api/metrics — Prometheus metrics (latency, SQL, GeoServer and
+    Google Drive calls, Celery tasks and queues). Internal: served to
+    direct requests from METRICS_ALLOWED_IPS (not proxied by nginx) and
+    to staff users.
+    """
+    from .metrics import CONTENT_TYPE, render_metrics
+    
+    internal = (
+        request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+        and 'HTTP_X_REAL_IP' not in request.META
+    )
+    if not (internal or request.user.is_staff):
+        raise Http404
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,263 @@
+"""
+Caching proxy for GeoServer WFS GetFeature requests.
+
+The canonical full-layer request (the layer's wfs_url) is stored
+compressed (gzip, and brotli when available) on disk, keyed by the
+normalized query and the layer's feature version, so every visitor after
+the first is served without touching GeoServer. Filtered or paged
+requests are passed through uncached, which keeps the cache at one
+response per layer and output format. GeoJSON features get a
+'has_content' property.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import time
+import logging
+
+from django.conf import settings
+
+from .locks import SlotUnavailable, semaphore_slot
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# GetFeature parameters that affect the response; everything else is dropped
+ALLOWED_PARAMS = (
+    'service', 'version', 'request', 'typename', 'typenames', 'outputformat',
+    'srsname', 'propertyname', 'bbox', 'cql_filter', 'filter', 'featureid',
+    'maxfeatures', 'count', 'startindex', 'sortby',
+)
+
+# Parameters of the cached full-layer request; any other one bypasses the cache
+CACHED_PARAMS = ('service', 'version', 'request', 'typename', 'typenames', 'outputformat', 'srsname')
+
+ENCODINGS = ('br', 'gzip')
+
+
+class WFSRequestError(ValueError):
+    """The request is not a GetFeature for a published layer."""
+
+
+def normalize_params(query):
+    """
+    Normalize WFS query parameters: lower-case names, drop unknown ones,
+    and sort, so equivalent URLs share one cache entry.
+
+    Returns:
+        list of (name, value) tuples
+    """
+    params = {}
+    for name, value in query.items():
+        name = name.lower()
+        if name in ALLOWED_PARAMS and value != '':
+            params[name] = value
+    if params.get('request', '').lower() != 'getfeature':
+        raise WFSRequestError('Only GetFeature requests are proxied')
+    if not (params.get('typename') or params.get('typenames')):
+        raise WFSRequestError('typeName is required')
+    params['service'] = 'WFS'
+    params['request'] = 'GetFeature'
+    return sorted(params.items())
+
+
+def is_cacheable(params):
+    """Whether normalized parameters request the whole layer (no filter or paging)."""
+    return all(name in CACHED_PARAMS for name, _ in params)
+
+
+def layer_data_version(layer):
+    """Version of a layer's features that cached responses are keyed by."""
+    return layer.feature_version
+
+
+def cache_key(params):
+    """Stable hash of normalized parameters."""
+    return hashlib.sha256('&'.join(f'{k}={v}' for k, v in params).encode('utf-8')).hexdigest()
+
+
+def cache_dir(layer, version):
+    """Directory of cached responses for one data version of a layer."""
+    root = getattr(settings, 'WFS_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'wfs-cache'))
+    return os.path.join(root, layer.slug, version)
+
+
+def write_atomic(path, content):
+    """Write a file so concurrent readers never see a partial body."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def store_response(layer, version, key, body, content_type):
+    """
+    Compress and store an upstream response, removing the cache of older
+    data versions of the layer.
+    """
+    directory = cache_dir(layer, version)
+    os.makedirs(directory, exist_ok=True)
+    layer_root = os.path.dirname(directory)
+    for name in os.listdir(layer_root):
+        if name != version:
+            shutil.rmtree(os.path.join(layer_root, name), ignore_errors=True)
+
+    write_atomic(os.path.join(directory, f'{key}.gz'), gzip.compress(body, compresslevel=6))
+    if brotli is not None:
+        write_atomic(os.path.join(directory, f'{key}.br'), brotli.compress(body, quality=5))
+    write_atomic(os.path.join(directory, f'{key}.type'), content_type.encode('utf-8'))
+
+
+def load_response(layer, version, key, accept_encoding):
+    """
+    Read a cached response in the best encoding the client accepts.
+
+    Returns:
+        (body, content_encoding or None, content_type), or None on a miss
+    """
+    directory = cache_dir(layer, version)
+    try:
+        with open(os.path.join(directory, f'{key}.type'), 'rb') as f:
+            content_type = f.read().decode('utf-8')
+        for encoding in ENCODINGS:
+            path = os.path.join(directory, f'{key}.{"br" if encoding == "br" else "gz"}')
+            if encoding in accept_encoding and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return f.read(), encoding, content_type
+        with open(os.path.join(directory, f'{key}.gz'), 'rb') as f:
+            return gzip.decompress(f.read()), None, content_type
+    except FileNotFoundError:
+        return None
+
+
+def mark_content(layer, body):
+    """
+    Add a 'has_content' property to every feature of a GeoJSON response,
+    from one query for the layer's published FeatureContent ids.
+
+    Returns:
+        GeoJSON bytes (the body unchanged if it is not GeoJSON)
+    """
+    from .models import FeatureContent
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict) or not isinstance(data.get('features'), list):
+        return body
+
+    with_content = set(
+        FeatureContent.objects.filter(layer=layer, is_published=True)
+        .values_list('feature_id', flat=True)
+    )
+    for feature in data['features']:
+        properties = feature.get('properties') or {}
+        # GeoServer exposes the primary key as the feature id: "<table>.<gid>"
+        gid = properties.get('gid', str(feature.get('id', '')).rsplit('.', 1)[-1])
+        try:
+            properties['has_content'] = int(gid) in with_content
+        except (TypeError, ValueError):
+            properties['has_content'] = False
+        feature['properties'] = properties
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def encoded_etag(etag, encoding):
+    """
+    Strong ETag of one encoding of a response: the gzip, brotli and
+    identity bodies differ byte for byte, so they must not share one.
+    """
+    return f'{etag[:-1]}-{encoding or "identity"}"'
+
+
+def fetch_upstream(params):
+    """
+    Run the GetFeature request against GeoServer over the pooled session.
+
+    Returns:
+        requests.Response, or None if GeoServer is unreachable
+    """
+    from .geoserver_api import get_client
+
+    client = get_client()
+    return client.request('GET', f'{client.url}/wfs', params=params)
+
+
+def fetch_features(layer, params):
+    """
+    Fetch a GetFeature response from GeoServer, marking GeoJSON features
+    with 'has_content'.
+
+    Returns:
+        dict like get_feature's, uncached and without an ETag
+    """
+    resp = fetch_upstream(params)
+    if resp is None:
+        return {'status': 502, 'body': b'GeoServer is unreachable', 'encoding': None,
+                'content_type': 'text/plain', 'etag': None, 'cached': False}
+    content_type = resp.headers.get('Content-Type', 'application/json')
+    # Errors (and OGC exception reports) are passed through as they are
+    if resp.status_code != 200 or 'xml' in content_type and 'exception' in resp.text[:500].lower():
+        return {'status': resp.status_code, 'body': resp.content, 'encoding': None,
+                'content_type': content_type, 'etag': None, 'cached': False}
+    body = mark_content(layer, resp.content) if 'json' in content_type else resp.content
+    return {'status': 200, 'body': body, 'encoding': None,
+            'content_type': content_type, 'etag': None, 'cached': False}
+
+
+def get_feature(layer, params, accept_encoding=''):
+    """
+    Serve a full-layer GetFeature request from the cache, fetching it from
+    GeoServer on a miss. Concurrent misses for the same key are collapsed:
+    one request fetches while the others wait for the cached file. Other
+    requests go to GeoServer uncached.
+
+    Returns:
+        dict with 'status', 'body', 'encoding', 'content_type', 'etag' and 'cached'
+    """
+    if not is_cacheable(params):
+        return fetch_features(layer, params)
+
+    version = layer_data_version(layer)
+    key = cache_key(params)
+    etag = f'"{version}-{key[:20]}"'
+    wait = getattr(settings, 'WFS_PROXY_WAIT', 30)
+
+    cached = load_response(layer, version, key, accept_encoding)
+    deadline = time.monotonic() + wait
+    while cached is None:
+        try:
+            with semaphore_slot(f'wfs:{key}', 1, wait):
+                # Another request may have filled the cache meanwhile
+                cached = load_response(layer, version, key, accept_encoding)
+                if cached is not None:
+                    break
+                result = fetch_features(layer, params)
+                # Errors are passed through uncached
+                if result['status'] != 200:
+                    return result
+                try:
+                    store_response(layer, version, key, result['body'], result['content_type'])
+                except OSError as e:
+                    logger.warning(f"Failed to cache WFS response for '{layer.slug}': {e}")
+                    return dict(result, etag=encoded_etag(etag, None))
+                cached = load_response(layer, version, key, accept_encoding)
+                logger.info(f"WFS cache filled for '{layer.slug}' ({len(result['body']) // 1024} KB)")
+        except SlotUnavailable:
+            if time.monotonic() > deadline:
+                return {'status': 503, 'body': b'WFS request is being prepared, retry later', 'encoding': None,
+                        'content_type': 'text/plain', 'etag': None, 'cached': False}
+            time.sleep(0.2)
+            cached = load_response(layer, version, key, accept_encoding)
+
+    body, encoding, content_type = cached
+    return {'status': 200, 'body': body, 'encoding': encoding,
+            'content_type': content_type, 'etag': encoded_etag(etag, encoding), 'cached': True}
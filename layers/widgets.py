@@ -8,3 +8,32 @@ class ColorPickerWidget(forms.TextInput):
         if attrs:
             default_attrs.update(attrs)
         super().__init__(default_attrs)
+
+
+class FeaturePickerWidget(forms.NumberInput):
+    """
+    gid input with a server-side search of the selected layer's PostGIS
+    table (by attribute text or bbox), so large layers never have to be
+    listed in the page.
+    """
+    
+    class Media:
+        js = ('layers/feature_picker.js',)
+    
+    def render(self, name, value, attrs=None, renderer=None):
+        from django.urls import reverse
+        from django.utils.html import format_html
+        
+        field = super().render(name, value, attrs, renderer)
+        return format_html(
+            '{}<div class="feature-picker" data-url="{}" data-input="{}" style="margin-top: 6px;">'
+            '<input type="text" class="feature-picker-query" placeholder="Текст или gid" style="width: 180px;"> '
+            '<input type="text" class="feature-picker-field" placeholder="Поле (необязательно)" style="width: 140px;"> '
+            '<input type="text" class="feature-picker-bbox" placeholder="bbox: west,south,east,north" style="width: 200px;"> '
+            '<button type="button" class="button feature-picker-search">Найти объект</button>'
+            '<ul class="feature-picker-results" style="margin: 6px 0 0; padding: 0; list-style: none;"></ul>'
+            '</div>',
+            field,
+            reverse('admin:layers_featurecontent_feature_search'),
+            (attrs or {}).get('id', f'id_{name}'),
+        )